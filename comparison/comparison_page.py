@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 from shared.supabase_client import supabase
+from shared.virtual_table import render_virtual_table, table_height
 import streamlit.components.v1 as components
 import re
 import uuid
@@ -447,96 +448,12 @@ def show_comparison_page():
         # Only display the number of combinations found
         st.write(f"Found {len(df_view)} matching combinations")
         
-        # Convert dataframe to HTML
-        def generate_html_table(df, height_px):
-            # Start the table with styling
-            html = f"""
-            <style>
-                .race-table {{
-                    width: 100%;
-                    border-collapse: collapse;
-                    font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif;
-                    font-size: 14px;
-                }}
-                .race-table thead {{
-                    position: sticky;
-                    top: 0;
-                    z-index: 1;
-                }}
-                .race-table th {{
-                    background-color: #f2f2f6;
-                    color: #262730;
-                    font-weight: bold;
-                    text-align: center;
-                    padding: 10px 8px;
-                    border: 1px solid #e1e4e8;
-                }}
-                .race-table td {{
-                    text-align: center;
-                    padding: 8px;
-                    border: 1px solid #e1e4e8;
-                    background-color: white;
-                }}
-                .race-table tr:hover {{
-                    background-color: #f0f2f6;
-                }}
-                .race-table tr:hover td {{
-                    background-color: #f0f2f6;
-                }}
-                /* Column width adjustments */
-                .race-table th:nth-child(1), .race-table td:nth-child(1),  /* Race */
-                .race-table th:nth-child(2), .race-table td:nth-child(2) {{ /* Class */
-                    min-width: 110px;
-                }}
-                .race-table th:nth-child(3), .race-table td:nth-child(3) {{ /* Boost */
-                    min-width: 70px;
-                }}
-                .race-table th:nth-child(n+4), .race-table td:nth-child(n+4) {{ /* Stats */
-                    min-width: 65px;
-                }}
-            </style>
-            <div style="height: {height_px}px; overflow-y: auto; margin-bottom: 20px;">
-            <table class="race-table">
-                <thead>
-                    <tr>
-            """
-            
-            # Add headers
-            for col in df.columns:
-                html += f"<th>{col}</th>"
-            
-            html += """
-                    </tr>
-                </thead>
-                <tbody>
-            """
-            
-            # Add data rows
-            for _, row in df.iterrows():
-                html += "<tr>"
-                for col in df.columns:
-                    html += f"<td>{row[col]}</td>"
-                html += "</tr>"
-            
-            html += """
-                </tbody>
-            </table>
-            </div>
-            """
-            return html
-        
-        # Calculate dynamic height based on number of rows (with a maximum)
-        row_height = 40  # Estimate of pixels per row
-        header_height = 60  # Estimated header height
-        min_height = 200  # Minimum height of table
-        max_height = 750  # Maximum height of table
-        
-        # Calculate height based on content, within the min/max bounds
-        table_height = max(min_height, min(len(df_view) * row_height + header_height, max_height))
-        
-        # Generate and display HTML table
-        html_table = generate_html_table(df_view[col_order], table_height)
-        st.markdown(html_table, unsafe_allow_html=True)
+        # Sortable table that only renders the rows in view
+        render_virtual_table(
+            df_view[col_order],
+            height_px=table_height(len(df_view), max_height=750),
+            min_widths=(110, 110, 70, 65)
+        )
 
         # Use the compact format for copying with filter summary
         copy_text = format_copy_text_compact(
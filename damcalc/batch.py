@@ -0,0 +1,275 @@
+"""
+Analyze many damage logs from the command line, without the Streamlit UI.
+
+    python -m damcalc.batch logs/ --player Dinol                 # JSON reports in damage_reports/
+    python -m damcalc.batch a.txt b.txt --format csv --output out
+    python -m damcalc.batch season/ --format parquet --workers 8  # per-event Parquet files
+    python -m damcalc.batch season/ --player Dinol --history      # also store them for the page's trends
+    python -m damcalc.batch invasion.log --top-k 50               # only the 50 biggest sources and targets
+    python -m damcalc.batch archive.zip old.log.gz                # compressed logs, like the page's uploads
+
+Logs are parsed in a process pool, one log per worker, with the same engine
+as the page; a single log is split into chunks instead. Besides one report
+per log, a combined report treats all logs as one session, each log
+starting a new encounter. Prints per-log and overall throughput, so the
+parser can be timed on real logs without the UI.
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from damcalc.damage_analysis import combine_parse_states, event_table, finish_damage_data, parse_damage_stream
+from damcalc.damage_parser import (
+    COMPRESSED_SUFFIXES, DECOMPRESSION_ERRORS, LOG_SUFFIXES, list_log_files, open_log_file
+)
+from damcalc.report_cache import content_digest
+from damcalc.report_export import REPORT_TABLES, export_damage_data, write_event_parquet
+from damcalc.session_history import save_session
+
+# File name patterns picked up from directories given on the command line, plain or compressed
+LOG_PATTERNS = LOG_SUFFIXES + COMPRESSED_SUFFIXES
+# Report file name suffix of each output format
+OUTPUT_SUFFIXES = {"json": ".json", "csv": ".csv", "parquet": ".parquet"}
+# Every report table is written
+EXPORT_OPTIONS = {category: True for category, *_ in REPORT_TABLES}
+COMBINED_NAME = "combined"
+
+# ----------------- Log Discovery -----------------
+
+def find_log_files(paths, recursive=False):
+    """Expand files and directories into a sorted, duplicate-free list of log files."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                found = [os.path.join(root, name) for root, _, names in os.walk(path) for name in names]
+            else:
+                found = [os.path.join(path, name) for name in os.listdir(path)]
+            files.extend(sorted(f for f in found if f.lower().endswith(LOG_PATTERNS) and os.path.isfile(f)))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            raise FileNotFoundError(f"No such log file or directory: {path}")
+    return list(dict.fromkeys(os.path.abspath(f) for f in files))
+
+
+def expand_log_files(files):
+    """
+    Split log files into their logs (see list_log_files) as dicts of path,
+    member and log name: one per plain, .gz or .bz2 file and one per
+    .txt/.log member of a .zip. Unreadable archives raise OSError.
+    """
+    logs = []
+    for path in files:
+        try:
+            with open(path, "rb") as f:
+                members = list_log_files(f, path)
+        except DECOMPRESSION_ERRORS as e:
+            raise OSError(f"{path} could not be read as an archive: {e}") from e
+        logs.extend({"path": path, "member": member, "name": name} for name, member, _ in members)
+    return logs
+
+
+def report_names(logs):
+    """
+    Output base name of each log: its file (or archive member) name without
+    suffix, numbered when names repeat or clash with the combined report.
+    """
+    names, seen = [], {COMBINED_NAME: 1}
+    for log in logs:
+        name = os.path.splitext(os.path.basename(log["name"]))[0]
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name}-{seen[name]}")
+    return names
+
+# ----------------- Analysis -----------------
+
+def analyze_log_file(log, player_name, errors="replace", parallel=False, top_k=None):
+    """
+    Parse one log (process pool worker), decompressed as it is read, and
+    return its parse state, report, uncompressed size and parse time.
+    top_k summarizes the report to its heavy hitters. A damaged or
+    truncated archive raises OSError naming the log.
+    """
+    start = time.perf_counter()
+    with open(log["path"], "rb") as f:
+        try:
+            stream = open_log_file(f, log["path"], log["member"])
+            state = parse_damage_stream(stream, player_name, errors=errors, parallel=parallel)
+            size = stream.tell()
+        except DECOMPRESSION_ERRORS as e:
+            raise OSError(f"{log['path']} is damaged or incomplete: {e}") from e
+    damage_data = finish_damage_data(state, player_name, top_k)
+    return {
+        "log": log,
+        "state": state,
+        "damage_data": damage_data,
+        "bytes": size,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def analyze_log_files(logs, player_name, workers=None, errors="replace", top_k=None):
+    """
+    Analyze logs (see expand_log_files) in a process pool, one log per task,
+    and return the results in the order of logs. A single log is parsed in
+    parallel chunks instead, when it is large enough.
+    """
+    if len(logs) == 1 or workers == 1:
+        parallel = False if workers == 1 else None
+        return [analyze_log_file(log, player_name, errors, parallel, top_k) for log in logs]
+
+    results = [None] * len(logs)
+    # spawn like the parser's own pool, so workers start from a clean interpreter
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {
+            pool.submit(analyze_log_file, log, player_name, errors, False, top_k): index
+            for index, log in enumerate(logs)
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+# ----------------- Report Output -----------------
+
+def report_json(name, player_name, state, damage_data):
+    """Return a report as JSON text: the log's line and event counts and its damage_data."""
+    return json.dumps({
+        "log": name,
+        "player": player_name,
+        "lines": state["line_count"],
+        "events": len(state["events"]["damage"]),
+        "report": damage_data,
+    }, indent=2)
+
+
+def combined_event_table(combined, results, names):
+    """Per-event table of a combined state with a log column naming the file each event came from."""
+    events = event_table(combined)
+    log_ends = np.cumsum([result["state"]["line_count"] for result in results])
+    codes = np.searchsorted(log_ends, events["line"].to_numpy(np.int64), side="left")
+    events.insert(0, "log", pd.Categorical.from_codes(codes, categories=names))
+    return events
+
+
+def write_report(directory, name, output_format, player_name, state, damage_data, events=None):
+    """Write one report in the output format and return the file path."""
+    path = os.path.join(directory, name + OUTPUT_SUFFIXES[output_format])
+    if output_format == "parquet":
+        with open(path, "wb") as f:
+            f.write(write_event_parquet(event_table(state) if events is None else events))
+        return path
+
+    if output_format == "csv":
+        text = export_damage_data(damage_data, "csv", EXPORT_OPTIONS, player_name)
+    else:
+        text = report_json(name, player_name, state, damage_data)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    return path
+
+
+def save_to_history(results, names, player_name):
+    """
+    Store every analyzed log in the session history, dated by its file's
+    modification time. Logs are identified by their decompressed text, as
+    the page's uploads are.
+    """
+    for name, result in zip(names, results):
+        log = result["log"]
+        with open(log["path"], "rb") as f:
+            digest = content_digest(open_log_file(f, log["path"], log["member"]))
+        state = result["state"]
+        save_session(
+            digest, player_name, name, result["damage_data"], event_table(state), state["line_count"],
+            datetime.date.fromtimestamp(os.path.getmtime(log["path"]))
+        )
+
+
+def print_summary(results, names, elapsed):
+    """Print one row per log and the overall throughput."""
+    print(f"{'log':<40} {'lines':>9} {'events':>8} {'MB':>7} {'parse (s)':>10}")
+    for name, result in zip(names, results):
+        state = result["state"]
+        print(
+            f"{name[:40]:<40} {state['line_count']:>9,} {len(state['events']['damage']):>8,} "
+            f"{result['bytes'] / (1024 * 1024):>7.1f} {result['seconds']:>10.2f}"
+        )
+    lines = sum(result["state"]["line_count"] for result in results)
+    megabytes = sum(result["bytes"] for result in results) / (1024 * 1024)
+    print(
+        f"\n{len(results)} logs, {lines:,} lines, {megabytes:.1f} MB in {elapsed:.2f} s "
+        f"({lines / elapsed:,.0f} lines/sec, {megabytes / elapsed:.1f} MB/s)"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze DSL damage logs without the UI.")
+    parser.add_argument("paths", nargs="+",
+                        help="Log files, or directories of .txt/.log files and .gz/.bz2/.zip archives")
+    parser.add_argument("--player", default="Charname", help="Your character name (replaces 'You' in logs)")
+    parser.add_argument("--format", choices=list(OUTPUT_SUFFIXES), default="json", help="Report file format")
+    parser.add_argument("--output", default="damage_reports", help="Directory the reports are written to")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--recursive", action="store_true", help="Also search subdirectories for logs")
+    parser.add_argument("--no-combined", action="store_true", help="Skip the combined report of all logs")
+    parser.add_argument("--no-per-log", action="store_true", help="Only write the combined report")
+    parser.add_argument("--strict", action="store_true", help="Fail on undecodable bytes instead of replacing them")
+    parser.add_argument("--history", action="store_true", help="Also store each log in the session history")
+    parser.add_argument("--top-k", type=int, default=None,
+                        help="Keep only the top K sources, targets and pairs by damage; the rest becomes (other)")
+    args = parser.parse_args(argv)
+    if args.top_k is not None and args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+    if args.top_k and args.history:
+        parser.error("--history stores full reports and can't be combined with --top-k")
+
+    try:
+        logs = expand_log_files(find_log_files(args.paths, args.recursive))
+    except OSError as e:
+        parser.error(str(e))
+    if not logs:
+        parser.error("No log files found")
+    names = report_names(logs)
+
+    start = time.perf_counter()
+    try:
+        results = analyze_log_files(
+            logs, args.player, args.workers, "strict" if args.strict else "replace", args.top_k
+        )
+    except DECOMPRESSION_ERRORS as e:
+        parser.exit(1, f"{parser.prog}: error: {e}\n")
+    print_summary(results, names, time.perf_counter() - start)
+
+    os.makedirs(args.output, exist_ok=True)
+    written = []
+    if not args.no_per_log:
+        for name, result in zip(names, results):
+            written.append(write_report(
+                args.output, name, args.format, args.player, result["state"], result["damage_data"]
+            ))
+    if not args.no_combined and len(results) > 1:
+        combined = combine_parse_states(result["state"] for result in results)
+        events = combined_event_table(combined, results, names) if args.format == "parquet" else None
+        written.append(write_report(
+            args.output, COMBINED_NAME, args.format, args.player, combined,
+            finish_damage_data(combined, args.player, args.top_k), events
+        ))
+    print(f"\n{len(written)} reports written to {args.output}")
+    if args.history:
+        save_to_history(results, names, args.player)
+        print(f"{len(results)} logs stored in the session history")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+Benchmark the damage calculator's parsing path on the bundled AGL log.
+
+    python -m damcalc.benchmark                     # compare against the stored baseline
+    python -m damcalc.benchmark --update-baseline   # record a new baseline
+    python -m damcalc.benchmark --scales 1 10       # skip the 100x log
+
+Scales above 1 replicate the log with perturbed damage verbs and entity
+names, so aggregates grow like a longer session instead of repeating.
+Exits with status 1 when any stage is slower than the baseline by more
+than the tolerance, when peak memory grows by more than the memory
+tolerance or when throughput drops by more than the throughput tolerance.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from damcalc.damage_analysis import analyze_damage_log, finish_damage_data, fold_events, new_report_totals
+from damcalc.damage_parser import (
+    VERB_TABLE, VERB_TOKEN_RE, calculate_percentages, copy_damage_data, iter_log_lines,
+    new_event_table, parse_damage_lines, record_damage
+)
+from damcalc.report_export import export_damage_data
+
+SAMPLE_LOG = os.path.join(os.path.dirname(__file__), "..", "data", "AGL 220419 Dinol Waak 1 0.txt")
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+PLAYER_NAME = "Dinol"
+EXPORT_OPTIONS = {
+    "damage_done": True, "damage_taken": True, "pvp_damage_done": True,
+    "pvp_damage_taken": True, "damage_types": True, "damage_details": True
+}
+
+# Fraction a stage may slow down against the baseline before the run fails
+DEFAULT_TOLERANCE = 0.30
+# Slowdowns smaller than this are timer noise, whatever the percentage
+MIN_REGRESSION_SECONDS = 0.005
+# Fraction peak memory may grow; allocations barely vary between runs or machines
+DEFAULT_MEMORY_TOLERANCE = 0.10
+# Growth smaller than this is allocator noise on the small logs
+MIN_REGRESSION_MB = 0.25
+# Fraction lines/sec of the whole analysis may drop against the baseline
+DEFAULT_THROUGHPUT_TOLERANCE = 0.30
+
+# ----------------- Synthetic Logs -----------------
+
+def perturb_line(line, rnd, verbs, renames):
+    """Swap damage verbs for random ones of the same case and rename entities."""
+    def swap_verb(match):
+        replacement = rnd.choice(verbs)
+        return replacement.upper() if match.group(0).isupper() else replacement
+
+    line = VERB_TOKEN_RE.sub(swap_verb, line)
+    for name, renamed in renames.items():
+        line = line.replace(name, renamed)
+    return line
+
+
+def build_synthetic_log(log, scale, seed=0):
+    """Return the log replicated scale times; every copy after the first is perturbed."""
+    if scale <= 1:
+        return log
+    rnd = random.Random(seed)
+    verbs = list(VERB_TABLE)
+    names = ["Dinol", "Waak", "Silversand", "scorpion", "general", "sergeant"]
+    lines = log.splitlines()
+    copies = [log]
+    for copy in range(1, scale):
+        # A few copies keep the real names so some entities span the whole session
+        renames = {} if copy % 4 == 0 else {name: name + "abcdefghij"[copy % 10] * (1 + copy // 10) for name in names}
+        copies.append("\n".join(perturb_line(line, rnd, verbs, renames) for line in lines))
+    return "\n".join(copies)
+
+# ----------------- Stages -----------------
+
+def best_time(function, repeat):
+    """Best wall time of function() over repeat runs, plus its last result."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def recorded_calls(state):
+    """Rebuild the record_damage arguments of every event in a parsed state."""
+    events = state["events"]
+    names, attack_types = events["names"], events["attack_types"]
+    return [
+        (names[source], names[target], damage, attack_types[attack_type])
+        for source, target, attack_type, damage in zip(
+            events["source"], events["target"], events["attack_type"], events["damage"]
+        )
+    ]
+
+
+def replay_record_damage(calls):
+    """Feed recorded events through record_damage into a fresh event table."""
+    events = new_event_table()
+    for line_no, (source, target, damage, attack_type) in enumerate(calls, 1):
+        record_damage(events, source, target, damage, attack_type, PLAYER_NAME, line_no)
+    return events
+
+
+def run_benchmark(log, repeat):
+    """Time each parsing stage on one log; returns a dict of measurements."""
+    line_count = sum(1 for _ in iter_log_lines(log))
+
+    analyze_time, damage_data = best_time(lambda: analyze_damage_log(log, PLAYER_NAME, parallel=False), repeat)
+    parse_time, state = best_time(lambda: parse_damage_lines(iter_log_lines(log), PLAYER_NAME), repeat)
+    aggregate_time, _ = best_time(lambda: finish_damage_data(state, PLAYER_NAME), repeat)
+
+    calls = recorded_calls(state)
+    record_time, _ = best_time(lambda: replay_record_damage(calls), repeat)
+
+    raw_totals = fold_events(new_report_totals(), state)["damage_data"]
+    percentages_time, _ = best_time(lambda: calculate_percentages(copy_damage_data(raw_totals)), repeat)
+
+    export_time, _ = best_time(
+        lambda: (export_damage_data(damage_data, "text", EXPORT_OPTIONS, PLAYER_NAME),
+                 export_damage_data(damage_data, "csv", EXPORT_OPTIONS, PLAYER_NAME)),
+        repeat
+    )
+
+    # Peak memory is measured on a separate run: tracemalloc slows everything down
+    tracemalloc.start()
+    analyze_damage_log(log, PLAYER_NAME, parallel=False)
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "lines": line_count,
+        "events": len(calls),
+        "lines_per_sec": line_count / analyze_time,
+        "peak_memory_mb": peak_bytes / (1024 * 1024),
+        "stages": {
+            "analyze_damage_log": analyze_time,
+            "parse_lines": parse_time,
+            "record_damage": record_time,
+            "aggregate": aggregate_time,
+            "calculate_percentages": percentages_time,
+            "export_damage_data": export_time,
+        },
+    }
+
+# ----------------- Baseline Comparison -----------------
+
+def compare_to_baseline(results, baseline, tolerance, memory_tolerance=DEFAULT_MEMORY_TOLERANCE,
+                        throughput_tolerance=DEFAULT_THROUGHPUT_TOLERANCE):
+    """
+    Return a list of regression messages for stages slower than
+    baseline * (1 + tolerance), peak memory above baseline * (1 +
+    memory_tolerance) and throughput below baseline * (1 - throughput_tolerance).
+    """
+    regressions = []
+    for scale, result in results.items():
+        expected = baseline.get("results", {}).get(scale)
+        if not expected:
+            continue
+        megabytes, reference = result["peak_memory_mb"], expected.get("peak_memory_mb")
+        if reference and megabytes > reference * (1 + memory_tolerance) and megabytes - reference > MIN_REGRESSION_MB:
+            regressions.append(
+                f"{scale}x peak memory: {megabytes:.1f} MB vs baseline {reference:.1f} MB "
+                f"(+{(megabytes / reference - 1) * 100:.0f}%)"
+            )
+        lines_per_sec, reference = result["lines_per_sec"], expected.get("lines_per_sec")
+        if reference and lines_per_sec < reference * (1 - throughput_tolerance):
+            regressions.append(
+                f"{scale}x throughput: {lines_per_sec:,.0f} lines/sec vs baseline {reference:,.0f} lines/sec "
+                f"({(lines_per_sec / reference - 1) * 100:.0f}%)"
+            )
+        for stage, seconds in result["stages"].items():
+            reference = expected["stages"].get(stage)
+            if reference and seconds > reference * (1 + tolerance) and seconds - reference > MIN_REGRESSION_SECONDS:
+                regressions.append(
+                    f"{scale}x {stage}: {seconds * 1000:.1f} ms vs baseline {reference * 1000:.1f} ms "
+                    f"(+{(seconds / reference - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def print_results(results):
+    """Print one table row per scale and stage."""
+    print(f"{'scale':>6}  {'stage':<22} {'time (ms)':>10}")
+    for scale, result in results.items():
+        for stage, seconds in result["stages"].items():
+            print(f"{scale + 'x':>6}  {stage:<22} {seconds * 1000:>10.1f}")
+        print(
+            f"{'':>6}  {result['lines']:,} lines, {result['events']:,} events, "
+            f"{result['lines_per_sec']:,.0f} lines/sec, peak {result['peak_memory_mb']:.1f} MB"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the damage calculator parsing path.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="Log size multipliers to run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the best time is kept")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown vs baseline (0.3 = 30%%)")
+    parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE,
+                        help="Allowed peak memory growth vs baseline (0.1 = 10%%)")
+    parser.add_argument("--throughput-tolerance", type=float, default=DEFAULT_THROUGHPUT_TOLERANCE,
+                        help="Allowed lines/sec drop vs baseline (0.3 = 30%%)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    with open(SAMPLE_LOG, encoding="utf-8") as f:
+        sample = f.read()
+
+    results = {}
+    for scale in args.scales:
+        log = build_synthetic_log(sample, scale)
+        # Fewer repeats for the big logs keeps the whole run to a few minutes
+        results[str(scale)] = run_benchmark(log, max(1, args.repeat if scale < 100 else 1))
+    print_results(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+    if args.update_baseline:
+        baseline = {"python": sys.version.split()[0], "results": results}
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=4)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline stored yet - run with --update-baseline to record one.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare_to_baseline(
+        results, baseline, args.tolerance, args.memory_tolerance, args.throughput_tolerance
+    )
+    if regressions:
+        print("\n❌ PERFORMANCE REGRESSION against " + args.baseline)
+        for message in regressions:
+            print("   " + message)
+        return 1
+    print(
+        f"\n✅ No stage slower than baseline by more than {args.tolerance:.0%}, peak memory within "
+        f"{args.memory_tolerance:.0%} and throughput within {args.throughput_tolerance:.0%}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
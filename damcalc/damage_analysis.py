@@ -0,0 +1,891 @@
+import bisect
+import heapq
+import itertools
+import math
+import os
+import numpy as np
+import pandas as pd
+from damcalc.damage_parser import (
+    calculate_percentages, copy_damage_data, is_player_character, iter_log_chunks,
+    iter_log_lines, known_players_from_names, merge_parse_states, new_damage_data, new_parse_state,
+    parse_chunks_parallel, parse_damage_lines, parse_logs_parallel, should_parse_in_parallel, stream_size
+)
+
+# Typed-array columns of the parser's event table
+EVENT_COLUMNS = ["source", "target", "attack_type", "damage", "line", "clock"]
+
+# A new encounter starts after this many lines without a damage event...
+ENCOUNTER_GAP_LINES = 300
+# ...or once a whole tick passes without one (game minutes between events)
+ENCOUNTER_GAP_MINUTES = 60
+
+# Hit statistics categories and the event columns of their keys
+HIT_STATS_CATEGORIES = {
+    "source_hit_stats": ["source"],
+    "type_hit_stats": ["source", "attack_type"],
+    "pair_hit_stats": ["source", "target"],
+}
+# Most distinct damage values a hit sketch holds before its closest values merge
+HIT_SKETCH_BINS = 64
+# Percentiles reported from the hit sketches
+HIT_PERCENTILES = (50, 90, 99)
+
+# Name and ID of the entity that sources and targets outside the heavy hitters are folded into
+OTHER_ENTITY = "(other)"
+OTHER_ENTITY_ID = -1
+# Most event rows folded at once, bounding the group-by and sort buffers however long the log is
+FOLD_BATCH_ROWS = 16 * 1024
+
+# ----------------- Analysis Entry Points -----------------
+
+def analyze_damage_log(log_content, player_name="Player", parallel=None, profile=None, top_k=None):
+    """
+    Analyze a log held in memory as a string.
+    parallel=None parses in a process pool once the log reaches
+    PARALLEL_THRESHOLD_BYTES; True/False forces either path.
+    A profile from new_parse_profile() is filled in with per-rule counts
+    and timings; profiled parses always run serially.
+    top_k summarizes the report to its heavy hitters (see new_report_totals).
+    """
+    state = parse_damage_log(log_content, player_name, parallel, profile)
+    return finish_damage_data(state, player_name, top_k)
+
+
+def analyze_damage_stream(stream, player_name="Player", encoding="utf-8", errors="strict", parallel=None,
+                          profile=None, top_k=None):
+    """
+    Analyze a log read line by line from a binary or text stream
+    (e.g. a Streamlit upload), so memory use does not grow with the log size.
+    Large streams are parsed in parallel like analyze_damage_log, holding
+    only the chunks currently queued for the workers.
+    """
+    state = parse_damage_stream(stream, player_name, encoding, errors, parallel, profile)
+    return finish_damage_data(state, player_name, top_k)
+
+
+def analyze_damage_streams(streams, player_name="Player", encoding="utf-8", errors="strict", parallel=None,
+                           top_k=None):
+    """Analyze several logs and return their reports in order (see parse_damage_streams)."""
+    return [
+        finish_damage_data(state, player_name, top_k)
+        for state in parse_damage_streams(streams, player_name, encoding, errors, parallel)
+    ]
+
+
+def parse_damage_log(log_content, player_name="Player", parallel=None, profile=None):
+    """Parse a log held in memory into a parse state, as analyze_damage_log does."""
+    if profile is None and should_parse_in_parallel(len(log_content), parallel):
+        return parse_chunks_parallel(iter_log_chunks(log_content), player_name)
+    return parse_damage_lines(iter_log_lines(log_content), player_name, profile=profile)
+
+
+def parse_damage_stream(stream, player_name="Player", encoding="utf-8", errors="strict", parallel=None,
+                        profile=None):
+    """Parse a log read from a stream into a parse state, as analyze_damage_stream does."""
+    # Chunks are cut after b"\n", which is only safe for ASCII-compatible encodings
+    if (profile is None and "\n".encode(encoding) == b"\n"
+            and should_parse_in_parallel(stream_size(stream), parallel)):
+        return parse_chunks_parallel(iter_log_chunks(stream), player_name, encoding, errors)
+    return parse_damage_lines(iter_log_lines(stream, encoding, errors), player_name, profile=profile)
+
+
+def parse_damage_streams(streams, player_name="Player", encoding="utf-8", errors="strict", parallel=None,
+                         sizes=None):
+    """
+    Parse several logs into parse states, in order. Once the logs together
+    reach PARALLEL_THRESHOLD_BYTES the chunks of all of them (see
+    iter_log_chunks) share one process pool, holding only the chunks in
+    flight; otherwise they are parsed one after the other. sizes gives
+    each log's uncompressed size where the stream can't be measured, e.g.
+    a decompressing stream (see list_log_files); None entries are measured,
+    and logs of unknown size don't count towards the threshold.
+    """
+    sizes = [
+        stream_size(stream) if size is None else size
+        for stream, size in zip(streams, sizes or [None] * len(streams))
+    ]
+    known = [size for size in sizes if size is not None]
+    total = sum(known) if known else None
+    if len(streams) < 2 or "\n".encode(encoding) != b"\n" or not should_parse_in_parallel(total, parallel):
+        return [
+            parse_damage_stream(stream, player_name, encoding, errors, should_parse_in_parallel(size, parallel))
+            for stream, size in zip(streams, sizes)
+        ]
+
+    log_chunks = ((index, chunk) for index, stream in enumerate(streams) for chunk in iter_log_chunks(stream))
+    return parse_logs_parallel(log_chunks, len(streams), player_name, encoding, errors)
+
+
+def combine_parse_states(states):
+    """
+    Merge the parse states of separate logs into one session state, in the
+    given order. Each log starts a new encounter; the states are not changed.
+    """
+    combined = new_parse_state()
+    for state in states:
+        if combined["line_count"]:
+            combined["encounter_breaks"].append(combined["line_count"])
+        merge_parse_states(combined, state)
+    return combined
+
+# ----------------- Event Table Aggregation -----------------
+
+def event_frame(events, start=0, stop=None):
+    """Return event rows start to stop (the end if None) as a DataFrame of ID, damage, line and clock columns."""
+    return pd.DataFrame({
+        column: np.frombuffer(events[column], dtype=events[column].typecode)[start:stop].copy()
+        for column in EVENT_COLUMNS
+    })
+
+
+def event_table(state):
+    """
+    Return every event of a parse state as a DataFrame of line, clock,
+    encounter, source, target, attack_type and damage. Names and attack
+    types are categoricals over the state's interned values, so the table
+    stays about as compact as the typed arrays it is built from.
+    """
+    events = state["events"]
+    frame = event_frame(events)
+    frame["encounter"] = np.zeros(len(frame), dtype=np.int64)
+    if not frame.empty:
+        frame["encounter"] = assign_encounters(new_report_totals(), frame, state["encounter_breaks"])
+    for column, values in (("source", events["names"]), ("target", events["names"]),
+                           ("attack_type", events["attack_types"])):
+        frame[column] = pd.Categorical.from_codes(frame[column].to_numpy(np.int64), categories=values)
+    return frame[["line", "clock", "encounter", "source", "target", "attack_type", "damage"]]
+
+
+def group_damage(frame, keys):
+    """
+    Sum damage and count hits per key combination, in order of first appearance.
+    Returns a list of (key, damage, hits) tuples.
+    """
+    if frame.empty:
+        return []
+    grouped = frame.groupby(keys, sort=False, observed=True)
+    totals = grouped["damage"].agg(["sum", "size"])
+    return list(zip(totals.index.tolist(), totals["sum"].tolist(), totals["size"].tolist()))
+
+
+def add_totals(category, key, damage, hits, *extra):
+    """Add damage and hits to a category entry; extra values are kept from the first add."""
+    entry = category.get(key)
+    if entry is None:
+        category[key] = [damage, hits, *extra]
+    else:
+        entry[0] += damage
+        entry[1] += hits
+
+
+def fill_category(category, grouped_rows, label):
+    """Add grouped rows to a damage_data category, merging rows whose labels collide."""
+    for key, damage, hits, *extra in grouped_rows:
+        add_totals(category, label(key), damage, hits, *extra)
+
+
+def new_report_totals(top_k=None):
+    """
+    Return empty running totals of an event table: raw [damage, hits]
+    categories (PvP left empty), (source_id, target_id) pair totals for PvP,
+    running hit statistics per HIT_STATS_CATEGORIES key (see
+    new_hit_stats), how many event rows have been folded in, and the
+    (encounter, line, clock, breaks before it) of the last folded event.
+
+    With top_k, only the top_k sources and targets by damage (tracked in
+    space-saving summaries, see merge_heavy_hitters) keep their names;
+    everyone else is folded into OTHER_ENTITY, and damage_details keeps
+    the top_k pairs. The totals then stay bounded however many distinct
+    names a log has.
+    """
+    return {
+        "damage_data": new_damage_data(), "pairs": {},
+        "hit_stats": {category: {} for category in HIT_STATS_CATEGORIES}, "rows": 0, "last_event": None,
+        "top_k": top_k, "heavy_hitters": {"source": {}, "target": {}},
+    }
+
+
+def copy_report_totals(totals):
+    """Copy running totals so more rows can be folded into the copy only."""
+    return {
+        "damage_data": copy_damage_data(totals["damage_data"]),
+        "pairs": {pair: list(values) for pair, values in totals["pairs"].items()},
+        "hit_stats": {
+            category: {key: stats[:5] + [dict(stats[5])] for key, stats in entries.items()}
+            for category, entries in totals["hit_stats"].items()
+        },
+        "rows": totals["rows"],
+        "last_event": totals["last_event"],
+        "top_k": totals["top_k"],
+        "heavy_hitters": {
+            column: {entity: list(values) for entity, values in counters.items()}
+            for column, counters in totals["heavy_hitters"].items()
+        },
+    }
+
+
+def totals_names(totals, state):
+    """The entity names of a parse state, with OTHER_ENTITY at OTHER_ENTITY_ID when summarizing."""
+    names = state["events"]["names"]
+    return names + [OTHER_ENTITY] if totals["top_k"] else names
+
+
+def assign_encounters(totals, frame, encounter_breaks):
+    """
+    Number the encounter of each new event row, continuing from the last
+    folded event. An encounter starts after a "GO!!!"/"is DEAD!!" break or
+    an ENCOUNTER_GAP_LINES / ENCOUNTER_GAP_MINUTES gap between events.
+    """
+    lines = frame["line"].to_numpy(np.int64)
+    clocks = frame["clock"].to_numpy(np.int64)
+    breaks = np.searchsorted(np.frombuffer(encounter_breaks, dtype=encounter_breaks.typecode), lines)
+
+    last = totals["last_event"]
+    if last is None:
+        # The first event starts encounter 0
+        last = (-1, lines[0], clocks[0], breaks[0] - 1)
+    encounter, prev_line, prev_clock, prev_breaks = last
+
+    # Each row against the one before it (the last folded event for the first row)
+    starts = np.diff(breaks, prepend=prev_breaks) > 0
+    starts |= np.diff(lines, prepend=prev_line) > ENCOUNTER_GAP_LINES
+    starts[1:] |= (clocks[:-1] >= 0) & (np.diff(clocks) >= ENCOUNTER_GAP_MINUTES)
+    starts[0] |= prev_clock >= 0 and clocks[0] - prev_clock >= ENCOUNTER_GAP_MINUTES
+    encounters = encounter + np.cumsum(starts)
+    totals["last_event"] = (int(encounters[-1]), int(lines[-1]), int(clocks[-1]), int(breaks[-1]))
+    return encounters
+
+
+def fill_encounters(category, frame):
+    """
+    Add [damage, hits, first_line, last_line] per encounter of the frame's
+    rows. Encounters are contiguous runs of rows, so no group-by is needed.
+    """
+    encounters = frame["encounter"].to_numpy()
+    lines = frame["line"].to_numpy()
+    starts = np.flatnonzero(np.diff(encounters, prepend=-1))
+    ends = np.append(starts[1:], len(encounters)) - 1
+    damage = np.add.reduceat(frame["damage"].to_numpy(), starts)
+    rows = zip(encounters[starts].tolist(), damage.tolist(), (ends - starts + 1).tolist(),
+               lines[starts].tolist(), lines[ends].tolist())
+    for encounter, damage, hits, first, last in rows:
+        entry = category.setdefault(str(encounter), [0, 0, first, last])
+        entry[0] += damage
+        entry[1] += hits
+        entry[3] = max(entry[3], last)
+
+
+def fold_events(totals, state):
+    """
+    Fold the event rows a parse state added since the last fold into
+    totals, with vectorized group-bys over just those rows, FOLD_BATCH_ROWS
+    at a time.
+    """
+    events = state["events"]
+    rows = len(events["damage"])
+    for start in range(totals["rows"], rows, FOLD_BATCH_ROWS):
+        fold_event_batch(totals, state, event_frame(events, start, start + FOLD_BATCH_ROWS))
+    totals["rows"] = rows
+    return totals
+
+
+def fold_event_batch(totals, state, frame):
+    """Fold a batch of a parse state's event rows (see event_frame) into totals."""
+    events = state["events"]
+    names = totals_names(totals, state)
+    attack_types = events["attack_types"]
+    damage_data = totals["damage_data"]
+    frame["encounter"] = assign_encounters(totals, frame, state["encounter_breaks"])
+    if totals["top_k"]:
+        keep_heavy_hitters(totals, frame)
+
+    # The per-encounter breakdown is the finest grouping; the session
+    # categories and PvP pairs are summed from its rows, in order of first
+    # appearance, so details keep each pair's first attack type
+    breakdown = group_damage(frame, ["encounter", "source", "target", "attack_type"])
+    for (encounter, source, target, attack_type), damage, hits in breakdown:
+        source_name, target_name, attack_name = names[source], names[target], attack_types[attack_type]
+        add_totals(
+            damage_data["encounter_breakdown"], f"{encounter} -> {source_name} -> {target_name} -> {attack_name}",
+            damage, hits
+        )
+        add_totals(damage_data["damage_done"], source_name, damage, hits)
+        add_totals(damage_data["damage_taken"], target_name, damage, hits)
+        add_totals(damage_data["damage_details"], f"{source_name} -> {target_name}", damage, hits, attack_name)
+        add_totals(damage_data["damage_types"], f"{source_name} -> {attack_name}", damage, hits)
+        add_totals(totals["pairs"], (source, target), damage, hits)
+
+    fill_category(
+        damage_data["damage_timeline"], group_damage(frame, ["encounter", "clock", "source"]),
+        lambda key: f"{key[0]} -> {key[1]} -> {names[key[2]]}"
+    )
+    fill_encounters(damage_data["encounters"], frame)
+
+    fold_hit_stats(
+        totals["hit_stats"], frame, {"source": names, "target": names, "attack_type": attack_types}
+    )
+
+
+def build_report(totals, state, player_name):
+    """
+    Turn running totals into a final damage_data: resolve PvP and PvE once
+    per entity from the pair totals and calculate percentages. Costs time
+    proportional to the number of keys, not events.
+    """
+    damage_data = copy_damage_data(totals["damage_data"])
+    names = totals_names(totals, state)
+    pairs = totals["pairs"]
+
+    # PvP: both sides must be players; PvE: exactly one side is
+    known_players = known_players_from_names(state["possessive_names"], player_name)
+    entities = {source for source, _ in pairs} | {target for _, target in pairs}
+    players = {
+        entity for entity in entities
+        if entity != OTHER_ENTITY_ID and is_player_character(names[entity], player_name, known_players)
+    }
+    for (source, target), (damage, hits) in pairs.items():
+        if source in players and target in players:
+            add_totals(damage_data["pvp_damage_done"], names[source], damage, hits)
+            add_totals(damage_data["pvp_damage_taken"], names[target], damage, hits)
+        elif source in players:
+            add_totals(damage_data["pve_damage_done"], names[source], damage, hits)
+        elif target in players:
+            add_totals(damage_data["pve_damage_taken"], names[target], damage, hits)
+
+    for category, entries in totals["hit_stats"].items():
+        damage_data[category] = {key: hit_stats_row(stats) for key, stats in entries.items()}
+    if totals["top_k"]:
+        keep_top_pairs(damage_data, totals["top_k"])
+
+    # Calculate percentages and totals (like CMUD's DMSorter)
+    calculate_percentages(damage_data)
+    return damage_data
+
+
+def finish_damage_data(state, player_name, top_k=None):
+    """
+    Build the final damage_data from a parse state with vectorized group-bys
+    over its event table, summarized to the top_k heavy hitters if given.
+    The state is left untouched.
+    """
+    totals = fold_events(new_report_totals(top_k), state)
+    return build_report(totals, state, player_name)
+
+
+def report_players(damage_data):
+    """The players of a report: everyone in its PvP and PvE totals."""
+    return set().union(*(
+        damage_data.get(category, {})
+        for category in ("pvp_damage_done", "pvp_damage_taken", "pve_damage_done", "pve_damage_taken")
+    ))
+
+
+def add_pair_totals(report, source, target, attack_type, damage, hits, players):
+    """Add one source/target/attack type total to a report's categories; players decide PvP and PvE."""
+    add_totals(report["damage_done"], source, damage, hits)
+    add_totals(report["damage_taken"], target, damage, hits)
+    add_totals(report["damage_details"], f"{source} -> {target}", damage, hits, attack_type)
+    add_totals(report["damage_types"], f"{source} -> {attack_type}", damage, hits)
+    if source in players and target in players:
+        add_totals(report["pvp_damage_done"], source, damage, hits)
+        add_totals(report["pvp_damage_taken"], target, damage, hits)
+    elif source in players:
+        add_totals(report["pve_damage_done"], source, damage, hits)
+    elif target in players:
+        add_totals(report["pve_damage_taken"], target, damage, hits)
+
+
+def encounter_report(damage_data, encounter):
+    """
+    Build the damage_data of one encounter from a session report's
+    encounter_breakdown, without reparsing. The session's players
+    (report_players) decide each pair's side.
+    """
+    report = new_damage_data()
+    prefix = f"{encounter} -> "
+    players = report_players(damage_data)
+
+    for key, (damage, hits, *_) in damage_data["encounter_breakdown"].items():
+        if not key.startswith(prefix):
+            continue
+        source, target, attack_type = key[len(prefix):].split(" -> ")
+        add_pair_totals(report, source, target, attack_type, damage, hits, players)
+
+    report["damage_timeline"] = {
+        key: list(values) for key, values in damage_data["damage_timeline"].items() if key.startswith(prefix)
+    }
+    calculate_percentages(report)
+    return report
+
+# ----------------- Hit Statistics -----------------
+
+def new_hit_stats():
+    """
+    Return empty running statistics of one key's hits: [hits, mean, sum of
+    squared deviations, min, max, sketch]. The sketch maps damage values to
+    hit counts and never holds more than HIT_SKETCH_BINS values, so each
+    key takes constant memory however long the log is.
+    """
+    return [0, 0.0, 0.0, math.inf, -math.inf, {}]
+
+
+def merge_hit_batch(stats, hits, mean, squares, low, high):
+    """
+    Merge a batch of hits (count, mean, sum of squared deviations, min and
+    max) into running statistics, with the batched form of Welford's update
+    (Chan et al.) so the variance stays numerically stable.
+    """
+    count = stats[0] + hits
+    delta = mean - stats[1]
+    stats[1] += delta * hits / count
+    stats[2] += squares + delta * delta * stats[0] * hits / count
+    stats[0] = count
+    stats[3] = min(stats[3], low)
+    stats[4] = max(stats[4], high)
+
+
+def compress_sketch(sketch):
+    """Merge a sketch's closest damage values into their weighted mean until HIT_SKETCH_BINS remain."""
+    while len(sketch) > HIT_SKETCH_BINS:
+        values = sorted(sketch)
+        low, high = min(zip(values, values[1:]), key=lambda pair: pair[1] - pair[0])
+        low_hits, high_hits = sketch.pop(low), sketch.pop(high)
+        merged = (low * low_hits + high * high_hits) / (low_hits + high_hits)
+        sketch[merged] = sketch.get(merged, 0) + low_hits + high_hits
+
+
+def fold_hit_stats(hit_stats, frame, lookups=None):
+    """
+    Fold event rows into running statistics per HIT_STATS_CATEGORIES key.
+    lookups maps the frame's ID columns to their names (None if the
+    columns already hold names). Rows are sorted by key and damage once per
+    category with numpy; each key's batch count, mean, spread and extremes
+    are reduced from its runs of equal damage and merged once per key.
+    """
+    if frame.empty:
+        return
+    damage = frame["damage"].to_numpy(np.float64)
+    codes, labels = {}, {}
+    for column in ("source", "target", "attack_type"):
+        codes[column], uniques = pd.factorize(frame[column])
+        lookup = lookups[column] if lookups is not None else None
+        labels[column] = [str(value if lookup is None else lookup[value]) for value in uniques]
+
+    for category, columns in HIT_STATS_CATEGORIES.items():
+        entries = hit_stats[category]
+        key = codes[columns[0]].astype(np.int64)
+        for column in columns[1:]:
+            key = key * len(labels[column]) + codes[column]
+        # Sorted by key, then damage: each key is a run of runs of equal damage
+        order = np.lexsort((damage, key))
+        keys, values = key[order], damage[order]
+        new_value = np.ones(len(order), dtype=bool)
+        new_value[1:] = (keys[1:] != keys[:-1]) | (values[1:] != values[:-1])
+        value_starts = np.flatnonzero(new_value)
+        values = values[value_starts]
+        hits = np.diff(np.append(value_starts, len(order)))
+        starts = np.flatnonzero(np.diff(keys[value_starts], prepend=-1))
+        ends = np.append(starts[1:], len(values))
+
+        counts = np.add.reduceat(hits, starts)
+        means = np.add.reduceat(values * hits, starts) / counts
+        squares = np.add.reduceat(hits * (values - np.repeat(means, ends - starts)) ** 2, starts)
+        first_rows = order[value_starts[starts]]
+        key_labels = zip(*(np.array(labels[column], dtype=object)[codes[column][first_rows]] for column in columns))
+        values_list, hits_list = values.tolist(), hits.tolist()
+        for key_label, start, end, count, mean, square in zip(
+                key_labels, starts.tolist(), ends.tolist(), counts.tolist(), means.tolist(), squares.tolist()):
+            label = " -> ".join(key_label)
+            stats = entries.get(label)
+            if stats is None:
+                stats = entries[label] = new_hit_stats()
+            merge_hit_batch(stats, count, mean, square, values_list[start], values_list[end - 1])
+            sketch = stats[5]
+            if not sketch:
+                sketch.update(zip(values_list[start:end], hits_list[start:end]))
+            else:
+                for value, value_hits in zip(values_list[start:end], hits_list[start:end]):
+                    sketch[value] = sketch.get(value, 0) + value_hits
+            compress_sketch(sketch)
+
+
+def sketch_percentiles(sketch, percentiles=HIT_PERCENTILES):
+    """Return the nearest-rank percentiles (0-100) of the hits in a sketch."""
+    values = sorted(sketch)
+    seen = list(itertools.accumulate(map(sketch.__getitem__, values)))
+    return [
+        values[bisect.bisect_left(seen, max(1, math.ceil(percentile / 100 * seen[-1])))]
+        for percentile in percentiles
+    ]
+
+
+def hit_stats_row(stats):
+    """
+    Turn running statistics into a report entry: [hits, mean, variance,
+    min, max] followed by the HIT_PERCENTILES. The variance is the sample
+    variance (0 for a single hit); percentiles are exact while a key has
+    seen at most HIT_SKETCH_BINS distinct damage values.
+    """
+    hits, mean, squares, low, high, sketch = stats
+    variance = squares / (hits - 1) if hits > 1 else 0.0
+    return [hits, mean, variance, low, high, *sketch_percentiles(sketch)]
+
+# ----------------- Heavy Hitters -----------------
+
+def merge_heavy_hitters(counters, weights, capacity):
+    """
+    Merge one batch's exact damage per entity into a space-saving summary
+    (entity -> [damage, overestimate]) of at most capacity entities, in the
+    mergeable form of Metwally et al.'s algorithm: an entity new to a full
+    summary starts from its smallest tracked damage, which bounds the
+    overestimate, and only the capacity largest are kept.
+    """
+    floor = min(damage for damage, _ in counters.values()) if len(counters) >= capacity else 0.0
+    for entity, damage in weights.items():
+        entry = counters.get(entity)
+        if entry is None:
+            counters[entity] = [floor + damage, floor]
+        else:
+            entry[0] += damage
+    if len(counters) > capacity:
+        # Stable, so equal damage keeps the entities seen first
+        kept = heapq.nlargest(capacity, counters.items(), key=lambda item: item[1][0])
+        counters.clear()
+        counters.update(kept)
+
+
+def keep_heavy_hitters(totals, frame):
+    """
+    Update the source and target summaries with a batch of event rows and
+    replace the IDs they do not track with OTHER_ENTITY_ID, so the batch
+    adds at most top_k names per side to the totals.
+    """
+    damage = frame["damage"].to_numpy()
+    for column, counters in totals["heavy_hitters"].items():
+        ids = frame[column].to_numpy(np.int64)
+        weights = np.bincount(ids, weights=damage)
+        seen = np.flatnonzero(np.bincount(ids))
+        merge_heavy_hitters(counters, dict(zip(seen.tolist(), weights[seen].tolist())), totals["top_k"])
+        tracked = np.fromiter(counters, dtype=np.int64, count=len(counters))
+        frame[column] = np.where(np.isin(ids, tracked), ids, OTHER_ENTITY_ID)
+
+
+def keep_top_pairs(damage_data, top_k):
+    """
+    Keep the top_k damage_details pairs by damage and add the rest up in
+    one "(other) -> (other)" entry; pair_hit_stats keeps the same pairs.
+    """
+    details = damage_data["damage_details"]
+    if len(details) <= top_k:
+        return
+    other_key = f"{OTHER_ENTITY} -> {OTHER_ENTITY}"
+    kept = dict(heapq.nlargest(
+        top_k, ((key, values) for key, values in details.items() if key != other_key), key=lambda item: item[1][0]
+    ))
+    other = [0, 0, "various"]
+    for key, (damage, hits, *_) in details.items():
+        if key not in kept:
+            other[0] += damage
+            other[1] += hits
+    kept[other_key] = other
+    damage_data["damage_details"] = kept
+    damage_data["pair_hit_stats"] = {
+        key: values for key, values in damage_data["pair_hit_stats"].items() if key in kept
+    }
+
+# ----------------- Drill-Down Filters -----------------
+
+def filter_events(events, sources=None, targets=None, attack_types=None, encounters=None, clock_range=None,
+                  pvp_only=False, players=()):
+    """
+    Return the rows of a per-event table (see event_table) that pass every
+    given filter; empty filters pass everything. clock_range is an inclusive
+    (first, last) game minute, with events before the first prompt counted
+    at its time. pvp_only keeps events between two of the players.
+    """
+    mask = np.ones(len(events), dtype=bool)
+    for column, values in (("source", sources), ("target", targets), ("attack_type", attack_types),
+                           ("encounter", encounters)):
+        if values:
+            mask &= events[column].isin(values).to_numpy()
+    if clock_range is not None:
+        clock = events["clock"].to_numpy(np.int64)
+        known = clock[clock >= 0]
+        clock = np.where(clock >= 0, clock, known.min() if len(known) else 0)
+        mask &= (clock >= clock_range[0]) & (clock <= clock_range[1])
+    if pvp_only:
+        mask &= (events["source"].isin(players) & events["target"].isin(players)).to_numpy()
+    return events[mask]
+
+
+def events_report(events, players):
+    """
+    Build a damage_data from per-event rows (usually filtered) with
+    vectorized group-bys, as the session report is built from its event
+    table; players (e.g. report_players of the session) decide PvP and PvE.
+    """
+    report = new_damage_data()
+    if events.empty:
+        return report
+
+    for (encounter, source, target, attack_type), damage, hits in group_damage(
+            events, ["encounter", "source", "target", "attack_type"]):
+        add_totals(report["encounter_breakdown"], f"{encounter} -> {source} -> {target} -> {attack_type}", damage, hits)
+        add_pair_totals(report, source, target, attack_type, damage, hits, players)
+    fill_category(
+        report["damage_timeline"], group_damage(events, ["encounter", "clock", "source"]),
+        lambda key: f"{key[0]} -> {key[1]} -> {key[2]}"
+    )
+    fill_encounters(report["encounters"], events)
+
+    hit_stats = {category: {} for category in HIT_STATS_CATEGORIES}
+    fold_hit_stats(hit_stats, events)
+    for category, entries in hit_stats.items():
+        report[category] = {key: hit_stats_row(stats) for key, stats in entries.items()}
+    calculate_percentages(report)
+    return report
+
+# ----------------- DPS Timeline -----------------
+
+# One DSL tick: the prompt clock advances half an hour of game time per tick
+TICK_GAME_MINUTES = 30
+
+
+def damage_timeline(damage_data, bucket_minutes=TICK_GAME_MINUTES, window=3, top_sources=None):
+    """
+    Return (damage, rolling) DataFrames of damage per time bucket (rows,
+    in game minutes since the first prompt) and source (columns), from the
+    damage_timeline category (summed over encounters). Empty buckets count as zero damage; rolling is
+    the mean over the last window buckets. top_sources keeps the N sources
+    with the most damage. Events before the first prompt count in the first bucket.
+    """
+    timeline = damage_data.get("damage_timeline")
+    if not timeline:
+        return pd.DataFrame(), pd.DataFrame()
+
+    _, clocks, sources = zip(*(key.split(" -> ", 2) for key in timeline))
+    frame = pd.DataFrame({
+        "clock": np.array(clocks, dtype=np.int64),
+        "source": sources,
+        "damage": [values[0] for values in timeline.values()],
+    })
+    known = frame["clock"] >= 0
+    if not known.any():
+        return pd.DataFrame(), pd.DataFrame()
+    start = frame.loc[known, "clock"].min()
+    frame["bucket"] = (frame["clock"].where(known, start) - start) // bucket_minutes * bucket_minutes
+
+    damage = frame.pivot_table(index="bucket", columns="source", values="damage", aggfunc="sum", fill_value=0)
+    damage = damage.reindex(range(0, damage.index.max() + 1, bucket_minutes), fill_value=0)
+    if top_sources:
+        damage = damage[damage.sum().nlargest(top_sources).index]
+    damage.index.name = "game_minutes"
+    damage.columns.name = None
+    return damage, damage.rolling(window, min_periods=1).mean()
+
+# ----------------- Multi-Log Leaderboards -----------------
+
+# Which report category ranks players in each leaderboard
+LEADERBOARD_CATEGORIES = {"PvE": "pve_damage_done", "PvP": "pvp_damage_done"}
+
+
+def log_leaderboard(reports, category="pve_damage_done", metric="damage"):
+    """
+    Rank the players of several stored reports (log name -> damage_data) by
+    their total damage in one category, without reparsing. Returns a
+    DataFrame of Player, one column per log with that log's damage, hits or
+    average per hit (metric), then the overall Damage, Hits, Avg/Hit and the
+    number of Logs the player appears in.
+    """
+    rows = [
+        (log, name, values[0], values[1])
+        for log, report in reports.items() for name, values in report.get(category, {}).items()
+    ]
+    if not rows:
+        return pd.DataFrame()
+    frame = pd.DataFrame(rows, columns=["log", "player", "damage", "hits"])
+
+    per_log = frame.pivot_table(index="player", columns="log", values=["damage", "hits"], aggfunc="sum")
+    if metric == "avg":
+        per_log = per_log["damage"] / per_log["hits"]
+    else:
+        per_log = per_log[metric]
+    per_log = per_log.reindex(columns=[log for log in reports if log in per_log.columns])
+
+    board = frame.groupby("player").agg(Damage=("damage", "sum"), Hits=("hits", "sum"), Logs=("log", "nunique"))
+    board.insert(2, "Avg/Hit", board["Damage"] / board["Hits"])
+    board = per_log.join(board).sort_values("Damage", ascending=False, kind="stable")
+    board.index.name = "Player"
+    board.columns.name = None
+    return board.reset_index()
+
+# ----------------- Incremental Append Mode -----------------
+
+# Characters before the parsed position compared to recognize a re-pasted, grown log
+APPEND_ANCHOR_CHARS = 4096
+
+# Characters str.splitlines() breaks lines on
+LINE_BREAK_CHARS = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+
+def new_append_session(player_name, top_k=None):
+    """
+    Return the state of an append-mode analysis. Only complete lines are
+    committed; a trailing partial line is parsed provisionally and rolled
+    back on the next append, when it may have been completed. top_k keeps
+    the running totals to the heavy hitters (see new_report_totals).
+    """
+    return {
+        "player_name": player_name,
+        "state": new_parse_state(),
+        "totals": new_report_totals(top_k),
+        "consumed": 0,          # End of the last committed line in the last paste
+        "anchor": "",           # Text just before that position
+        "fragment": "",         # Trailing partial line of the last paste
+        "provisional": None,    # What to roll back once the fragment is replaced
+    }
+
+
+def rollback_provisional(session):
+    """Remove the events and names the provisional fragment parse added."""
+    provisional = session["provisional"]
+    if provisional is None:
+        return
+    state = session["state"]
+    for column in EVENT_COLUMNS:
+        del state["events"][column][provisional["rows"]:]
+    state["line_count"] = provisional["line_count"]
+    del state["encounter_breaks"][provisional["encounter_breaks"]:]
+    state["clock"] = provisional["clock"]
+    state["first_clock"] = provisional["first_clock"]
+    state["possessive_names"] = provisional["possessive_names"]
+    session["provisional"] = None
+
+
+def append_damage_text(session, text):
+    """
+    Parse only what is new in text and return the updated damage_data.
+    If text is the previous paste grown at the end (a whole log pasted
+    again), parsing resumes where the last paste's complete lines ended;
+    otherwise the whole text is appended as a new chunk of the session.
+    """
+    state = session["state"]
+    totals = session["totals"]
+    player_name = session["player_name"]
+    rollback_provisional(session)
+
+    consumed, anchor = session["consumed"], session["anchor"]
+    grown = bool(anchor) and len(text) >= consumed and text[consumed - len(anchor):consumed] == anchor
+    start, prefix = consumed, ""
+    if not grown:
+        # A new chunk: the previous fragment was a whole line after all
+        start = 0
+        if session["fragment"]:
+            prefix = session["fragment"] + "\n"
+
+    cut = max(text.rfind(char, start) for char in LINE_BREAK_CHARS) + 1
+    cut = max(cut, start)
+    parse_damage_lines(iter_log_lines(prefix + text[start:cut]), player_name, state)
+    fold_events(totals, state)
+
+    session["consumed"] = cut
+    session["anchor"] = text[max(0, cut - APPEND_ANCHOR_CHARS):cut]
+    session["fragment"] = text[cut:]
+    if not session["fragment"]:
+        return build_report(totals, state, player_name)
+
+    session["provisional"] = {
+        "rows": len(state["events"]["damage"]),
+        "line_count": state["line_count"],
+        "encounter_breaks": len(state["encounter_breaks"]),
+        "clock": state["clock"],
+        "first_clock": state["first_clock"],
+        "possessive_names": set(state["possessive_names"]),
+    }
+    parse_damage_lines(iter_log_lines(session["fragment"]), player_name, state)
+    totals = fold_events(copy_report_totals(totals), state)
+    return build_report(totals, state, player_name)
+
+# ----------------- Live Tail Mode -----------------
+
+# Most bytes of a followed log read and parsed at once, e.g. when catching up on a long file
+TAIL_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def new_tail_session(path, player_name, top_k=None, from_start=True, encoding="utf-8", errors="replace"):
+    """
+    Return the state of a live tail of a log file on disk: running parse
+    state and totals like append mode, the byte offset read up to, and
+    the file's identity, to notice a new file in its place. Without
+    from_start only lines written from now on are parsed.
+    """
+    stat = os.stat(path)
+    skip_partial = False
+    if not from_start and stat.st_size > 0:
+        # Starting mid-file, drop the line in progress, unless the last one is complete
+        with open(path, "rb") as f:
+            f.seek(stat.st_size - 1)
+            skip_partial = f.read(1) != b"\n"
+    return {
+        "path": path,
+        "player_name": player_name,
+        "top_k": top_k,
+        "encoding": encoding,
+        "errors": errors,
+        "state": new_parse_state(),
+        "totals": new_report_totals(top_k),
+        "file_id": (stat.st_dev, stat.st_ino),
+        "offset": 0 if from_start else stat.st_size,    # Bytes of the file read so far
+        "pending": b"",                                 # A partial last line, completed by a later write
+        "skip_partial": skip_partial,                   # Drop everything up to the first line break
+        "damage_data": None,                            # Report of everything parsed so far
+    }
+
+
+def tail_damage_file(session):
+    """
+    Parse only the bytes appended to a followed log since the last call and
+    return the updated damage_data, or None if the file has not grown (one
+    stat call, no reading). A truncated or replaced file, e.g. a new
+    client session, starts the report over; complete lines are parsed,
+    a partial last line waits for the rest of it.
+    """
+    try:
+        stat = os.stat(session["path"])
+    except FileNotFoundError:
+        # The client may be rotating its log; try again on the next call
+        return None
+    if (stat.st_dev, stat.st_ino) != session["file_id"] or stat.st_size < session["offset"]:
+        session.update(new_tail_session(
+            session["path"], session["player_name"], session["top_k"], True, session["encoding"], session["errors"]
+        ))
+    if stat.st_size == session["offset"] and session["damage_data"] is not None:
+        return None
+
+    state = session["state"]
+    player_name = session["player_name"]
+    with open(session["path"], "rb") as f:
+        f.seek(session["offset"])
+        while True:
+            chunk = f.read(TAIL_CHUNK_BYTES)
+            if not chunk:
+                break
+            session["offset"] += len(chunk)
+            data = session["pending"] + chunk
+            if session["skip_partial"]:
+                line_end = data.find(b"\n")
+                if line_end == -1:
+                    session["pending"] = b""
+                    continue
+                data = data[line_end + 1:]
+                session["skip_partial"] = False
+            # Cut after the last b"\n", which is a whole line break in ASCII-compatible encodings
+            cut = data.rfind(b"\n") + 1
+            session["pending"] = data[cut:]
+            if cut:
+                text = data[:cut].decode(session["encoding"], session["errors"])
+                parse_damage_lines(iter_log_lines(text), player_name, state)
+
+    fold_events(session["totals"], state)
+    session["damage_data"] = build_report(session["totals"], state, player_name)
+    return session["damage_data"]
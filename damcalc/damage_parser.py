@@ -0,0 +1,981 @@
+import re
+import io
+import os
+import bz2
+import gzip
+import json
+import time
+import codecs
+import random
+import zipfile
+import zlib
+import multiprocessing
+from array import array
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from damcalc.trigger_rules import (
+    damage_values_from_rules, load_trigger_rules, rules_digest, special_patterns_from_rules
+)
+
+# ----------------- Core Constants and Mappings -----------------
+
+# Damage verbs, decorated special patterns and skip indicators are compiled
+# from the CMUD trigger package (data/DamMon_1.3.xml): verbs in DamMon's
+# trigger numbering, special patterns in trigger priority order
+TRIGGER_RULES = load_trigger_rules()
+
+# Verb spelling -> damage value, e.g. "hits": 10.5, "DEVASTATES": 68
+DAMAGE_VALUES = damage_values_from_rules(TRIGGER_RULES)
+
+# Special formatting patterns from CMUD triggers
+# Each tuple is (prefix, verb, suffix, damage), e.g. ("***", "DEVASTATES", "***", 68)
+SPECIAL_DAMAGE_PATTERNS = special_patterns_from_rules(TRIGGER_RULES)
+
+# Skip indicators based on CMUD's DMFakeCheck function (both modes)
+SKIP_INDICATORS = TRIGGER_RULES["skip_indicators"]
+
+# Bump when a parser change alters the report of a log under the same rules
+PARSER_VERSION = 2
+# The parser and rules reports are built with; stored reports built with others are stale
+REPORT_RULES_DIGEST = f"{PARSER_VERSION}:{rules_digest(TRIGGER_RULES)}"
+
+# ----------------- Precompiled Matchers -----------------
+
+def build_verb_table(damage_values):
+    """
+    Collapse a damage-value mapping into lowercase verb -> (priority, damage).
+    Verbs are matched case-insensitively, so each takes its priority and
+    damage from one spelling: the lowercase one if there is one, else its
+    first (e.g. "devastates" 30.5 shadows "DEVASTATES" 68, whose decorated
+    form is a special pattern instead).
+    """
+    spellings = {}
+    for position, (verb, damage) in enumerate(damage_values.items()):
+        key = verb.lower()
+        if key not in spellings or verb == key:
+            spellings[key] = (position, damage)
+    verbs = sorted(spellings, key=lambda key: spellings[key][0])
+    return {verb: (priority, spellings[verb][1]) for priority, verb in enumerate(verbs)}
+
+
+def compile_verb_matchers(verb_table):
+    """
+    Compile the per-verb regexes once, in priority order.
+    Returns (token_re, matchers) where token_re finds every whitespace-delimited
+    damage verb in a single scan and group N of a match corresponds to
+    matchers[N - 1] = (verb, damage, possessive_re, regular_re).
+    """
+    verbs = sorted(verb_table, key=lambda v: verb_table[v][0])
+    token_re = re.compile(
+        r"(?<=\s)(?:" + "|".join(f"({re.escape(verb)})" for verb in verbs) + r")(?=\s)",
+        re.IGNORECASE
+    )
+    matchers = []
+    for verb in verbs:
+        matchers.append((
+            verb,
+            verb_table[verb][1],
+            re.compile(fr"(.*?)'s\s+([a-zA-Z\s]+?)\s+{re.escape(verb)}\s+(.*?)($|!|\.)", re.IGNORECASE),
+            re.compile(fr"^(.*?)\s+{re.escape(verb)}\s+(.*?)($|!|\.)", re.IGNORECASE),
+        ))
+    return token_re, matchers
+
+
+def compile_special_matchers(special_patterns):
+    """
+    Compile SPECIAL_DAMAGE_PATTERNS once. Returns (prefilter_re, matchers); the
+    prefilter rejects lines containing none of the decorated verbs in one scan.
+    """
+    matchers = []
+    for prefix, verb, suffix, damage in special_patterns:
+        pattern = fr"(.*?){re.escape(prefix)}\s*{verb}\s*{re.escape(suffix)}\s+(.*?)($|!|\.)"
+        matchers.append((verb, damage, re.compile(pattern, re.IGNORECASE)))
+    prefilter_re = re.compile(
+        "|".join(fr"{re.escape(prefix)}\s*{verb}" for prefix, verb, _, _ in special_patterns),
+        re.IGNORECASE
+    )
+    return prefilter_re, matchers
+
+
+PROMPT_RE = re.compile(r'^\[\d+/\d+hp')
+ENCOUNTER_START_MARKER = "GO!!!"
+PROMPT_TIME_RE = re.compile(r'\b(\d{1,2}):(\d{2})\s*([ap]m)\b', re.IGNORECASE)
+LOCATION_TAG_RE = re.compile(r'\[\s*[^\]]+\s*\]\s*')
+CUT_THROAT_RE = re.compile(r"(.*?)'s cut throat\s+<<<\s+([A-Z]+)\s+>>>\s+(.*?)(!|\.|$)")
+POSSESSIVE_NAME_RE = re.compile(r"\b([A-Z][a-z]+)'s\b")
+DECORATION_RE = re.compile(r'[*=<>]+')
+ARTICLE_PREFIX_RE = re.compile(r'^(a|an|the)\s+', re.IGNORECASE)
+
+# Applied in order by clean_entity_name
+NAME_TAG_PATTERNS = [
+    re.compile(r'\[.*?\]'),   # Bracketed content
+    re.compile(r'<.*?>'),     # Angle-bracketed content
+    re.compile(r'\(.*?\)'),   # Parenthesized content
+    re.compile(r'{.*?}'),     # Brace-enclosed content
+    DECORATION_RE,            # Decorative characters
+]
+
+# Lowercased damage verbs, never used as attack types
+DAMAGE_VERBS = frozenset(verb.lower() for verb in DAMAGE_VALUES)
+
+VERB_TABLE = build_verb_table(DAMAGE_VALUES)
+VERB_TOKEN_RE, VERB_MATCHERS = compile_verb_matchers(VERB_TABLE)
+SPECIAL_PREFILTER_RE, SPECIAL_MATCHERS = compile_special_matchers(SPECIAL_DAMAGE_PATTERNS)
+
+# Line classes returned by classify_line
+LINE_SKIP = "skip"
+LINE_PROMPT = "prompt"
+LINE_COMBAT = "combat"
+
+# Lowercased verbs that mark a high-damage attack type in record_damage
+HIGH_DAMAGE_VERBS = frozenset(
+    verb.lower() for verb in DAMAGE_VALUES
+    if verb.isupper() or verb in ["DEMOLISHES", "DEVASTATES", "OBLITERATES"]
+)
+
+# Entries kept per memoized normalization function
+NORMALIZATION_CACHE_SIZE = 4096
+
+# Game minutes in a day, for unwrapping the prompt clock past midnight
+MINUTES_PER_DAY = 24 * 60
+
+# Categories calculate_percentages leaves alone: raw [damage, hits, ...] sums and hit statistics
+RAW_CATEGORIES = frozenset({
+    "damage_timeline", "encounters", "encounter_breakdown", "source_hit_stats", "type_hit_stats", "pair_hit_stats",
+})
+
+# Fall-through lines kept (reservoir-sampled) by an instrumented parse
+PROFILE_SAMPLE_LINES = 50
+
+# ----------------- Log Reading -----------------
+
+# Logs at least this big are parsed in chunks across a process pool
+PARALLEL_THRESHOLD_BYTES = 8 * 1024 * 1024
+# Approximate size of each chunk handed to a worker
+PARALLEL_CHUNK_BYTES = 2 * 1024 * 1024
+
+# Uploads read through a decompressor; inside a .zip, members with a LOG_SUFFIXES name are logs
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".zip")
+LOG_SUFFIXES = (".txt", ".log")
+# What reading a corrupt or truncated compressed log raises
+DECOMPRESSION_ERRORS = (OSError, EOFError, zlib.error, zipfile.BadZipFile)
+
+# The same line boundaries str.splitlines() uses
+LINE_BREAK_RE = re.compile(r"\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
+def iter_log_lines(source, encoding="utf-8", errors="strict", chunk_size=64 * 1024):
+    """
+    Yield log lines one at a time, split exactly like str.splitlines().
+    source may be a string or a binary/text stream; bytes are decoded
+    incrementally with the given encoding and error policy
+    ("strict", "replace", "ignore", ...), so only one chunk is held at a time.
+    """
+    if isinstance(source, str):
+        pos = 0
+        for line_break in LINE_BREAK_RE.finditer(source):
+            yield source[pos:line_break.start()]
+            pos = line_break.end()
+        if pos < len(source):
+            yield source[pos:]
+        return
+
+    decoder = None
+    pending = ""
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(encoding)(errors)
+            chunk = decoder.decode(chunk)
+        pieces = (pending + chunk).splitlines(True)
+        # The last piece may be a partial line (or a "\r" whose "\n" is in the next chunk)
+        pending = pieces.pop() if pieces else ""
+        yield from "".join(pieces).splitlines()
+
+    if decoder is not None:
+        pending += decoder.decode(b"", final=True)
+    yield from pending.splitlines()
+
+
+def iter_log_chunks(source, chunk_size=PARALLEL_CHUNK_BYTES):
+    """
+    Split a string or stream into chunks of roughly chunk_size that end on a
+    line boundary, so parsing the chunks separately sees the same lines.
+    """
+    if isinstance(source, str):
+        pos = 0
+        while pos < len(source):
+            end = source.find("\n", pos + chunk_size)
+            end = len(source) if end == -1 else end + 1
+            yield source[pos:end]
+            pos = end
+        return
+
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        if not chunk.endswith(b"\n" if isinstance(chunk, bytes) else "\n"):
+            chunk += source.readline()
+        yield chunk
+
+
+def stream_size(stream):
+    """
+    Return the bytes left in a seekable stream, or None if it can't tell.
+    Decompressing streams are not measured: seeking to their end would
+    decompress all of it.
+    """
+    if isinstance(stream, (gzip.GzipFile, bz2.BZ2File, zipfile.ZipExtFile)):
+        return None
+    try:
+        pos = stream.tell()
+        end = stream.seek(0, io.SEEK_END)
+        stream.seek(pos)
+    except (AttributeError, OSError, ValueError):
+        return None
+    return end - pos
+
+def list_log_files(stream, name):
+    """
+    Return the logs in an uploaded file as (log name, member, size) tuples:
+    the file itself for a plain log, one log for a .gz or .bz2 file and one
+    per .txt/.log member of a .zip (member is its name in the archive, else
+    None). size is the uncompressed size in bytes, None if the format
+    doesn't record it.
+    """
+    lower = name.lower()
+    if lower.endswith(".zip"):
+        stream.seek(0)
+        with zipfile.ZipFile(stream) as archive:
+            return [
+                (info.filename, info.filename, info.file_size) for info in archive.infolist()
+                if not info.is_dir() and info.filename.lower().endswith(LOG_SUFFIXES)
+            ]
+    if lower.endswith(".gz"):
+        # The gzip trailer holds the size modulo 2**32, enough to pick the parsing path
+        stream.seek(-4, io.SEEK_END)
+        size = int.from_bytes(stream.read(4), "little")
+        stream.seek(0)
+        return [(name[:-3], None, size)]
+    if lower.endswith(".bz2"):
+        return [(name[:-4], None, None)]
+    stream.seek(0)
+    return [(name, None, stream_size(stream))]
+
+
+def open_log_file(stream, name, member=None):
+    """
+    Return a binary stream of one log of an uploaded file (see
+    list_log_files) from its start. Compressed logs are decompressed as the
+    stream is read, so they are never expanded in memory as a whole.
+    """
+    stream.seek(0)
+    lower = name.lower()
+    if lower.endswith(".zip"):
+        # The member stream keeps reading the upload after the archive object is gone
+        return zipfile.ZipFile(stream).open(member)
+    if lower.endswith(".gz"):
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if lower.endswith(".bz2"):
+        return bz2.BZ2File(stream, mode="rb")
+    return stream
+
+# ----------------- Core Parsing Functions -----------------
+
+def should_skip_line(line):
+    """Determine if a line should be skipped (not combat related) - based on CMUD's DMFakeCheck."""
+    # Possessive indicator check first (from CMUD code) - it rejects most room text and chat
+    if "'s " not in line and "you" not in line.lower():
+        return True
+
+    return any(map(line.__contains__, SKIP_INDICATORS))
+
+
+def classify_line(line):
+    """
+    Sort a stripped log line into LINE_SKIP, LINE_PROMPT or LINE_COMBAT.
+    Returns (kind, text); for combat lines text has its location tags removed.
+    Checks run cheapest-first since most lines are chat, room text or prompts,
+    and a line only counts as combat if a damage verb or trigger could match it.
+    """
+    if not line:
+        return LINE_SKIP, line
+    if line[0] == "[" and PROMPT_RE.match(line):
+        return LINE_PROMPT, line
+    if should_skip_line(line):
+        return LINE_SKIP, line
+
+    # Strip location tags - like CMUD DMStrip function
+    if "[" in line:
+        line = LOCATION_TAG_RE.sub('', line)
+
+    if "'s cut throat" in line or VERB_TOKEN_RE.search(line) or SPECIAL_PREFILTER_RE.search(line):
+        return LINE_COMBAT, line
+    return LINE_SKIP, line
+
+def prompt_game_minute(line):
+    """Return the game time of a prompt line as minutes after midnight, or None."""
+    match = PROMPT_TIME_RE.search(line)
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)) % 12, int(match.group(2)), match.group(3).lower()
+    return (hour + (12 if meridiem == "pm" else 0)) * 60 + minute
+
+
+def advance_clock(clock, minute_of_day):
+    """
+    Move a running game clock (minutes since the first day's midnight, -1 if
+    not started) to the next prompt's time of day. Game time only runs
+    forward, so an earlier time of day means midnight has passed.
+    """
+    if clock < 0:
+        return minute_of_day
+    day_start = clock - clock % MINUTES_PER_DAY
+    if day_start + minute_of_day < clock:
+        day_start += MINUTES_PER_DAY
+    return day_start + minute_of_day
+
+
+def normalize_combat_name(name, player_name):
+    """
+    Normalize 'You' and 'Your' in names to the player name for accurate parsing.
+    E.g., 'Your beating' → 'Charname -> beating'
+    """
+    name = name.strip()
+    if name.lower() == "you":
+        return player_name
+    if name.lower().startswith("your "):
+        return f"{player_name} -> {name[5:].strip()}"
+    return name
+
+
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def clean_entity_name(name, player_name):
+    """
+    Clean and normalize entity names - based on CMUD's DMCleaner mode 1 and 2.
+    This handles substituting 'You' with the player name and cleaning up entity references.
+    Memoized on (name, player_name): a fight repeats the same few raw names.
+    """
+    if not name:
+        return ""
+
+    name = name.strip()
+    
+    # Replace "You" with player name (case insensitive)
+    if name.lower() == "you":
+        return player_name
+    
+    # Remove tags and decorative characters
+    for pattern in NAME_TAG_PATTERNS:
+        name = pattern.sub('', name)
+    
+    # Handle possessive forms (based on CMUD DMCleaner mode 1)
+    if "'s " in name:
+        name = name.split("'s ")[0]
+    
+    # Strip punctuation based on CMUD DMCleaner mode 2
+    name = name.replace("!", "").replace(".", "").replace("things to ", "")
+    
+    # Remove common prefixes 
+    name = ARTICLE_PREFIX_RE.sub('', name)
+    
+    name = name.strip()
+    if not name or name.lower() in ["a", "an", "him", "her", "the", "the ground"]:
+        return None  # Filter out malformed names
+    
+    return name
+
+def known_players_from_names(possessive_names, player_name):
+    """Build the known-player set from capitalized possessive names seen in a log."""
+    names = {name for name in possessive_names if name.lower() != player_name.lower()}
+    names.add(player_name)
+    return names
+
+
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def extract_attack_type(source_text):
+    """
+    Extract attack type from source text - based on CMUD's DMCleaner mode 3.
+    This handles cases like "Dhavi's pierce" -> "pierce" or "Your beating" -> "beating"
+    Memoized on the raw text, which is all the result depends on.
+    """
+    # Special attack patterns
+    if "draws life from" in source_text:
+        return "life drain"
+    if "is struck by lightning" in source_text:
+        return "lightning strike"
+    if "cut throat" in source_text:
+        return "cut throat"
+    
+    # Remove location information and decorative characters
+    source_text = LOCATION_TAG_RE.sub('', source_text)
+    source_text = DECORATION_RE.sub('', source_text)
+    
+    # Extract everything after the possessive marker - CMUD's approach
+    if "'s " in source_text:
+        parts = source_text.split("'s ")
+        if len(parts) > 1:
+            attack_raw = parts[-1].strip()
+            
+            # Avoid using damage verbs as attack types
+            attack_words = attack_raw.split()
+            
+            if attack_words and attack_words[0].lower() not in DAMAGE_VERBS:
+                return attack_words[0].lower()  # Return just the first word after possessive
+    
+    # Check if source contains attack type (like "Your beating")
+    words = source_text.split()
+    if len(words) > 1 and words[0].lower() in ["your", "you"]:
+        # Return the second word as the attack type
+        return words[1].lower()
+    
+    # Default to generic attack type
+    return "attack"
+
+def normalization_cache_stats(since=None):
+    """
+    Report size and hit rate of the memoized name / attack-type normalization,
+    counting only the lookups after an earlier report passed as since.
+    """
+    stats = {}
+    for function in (clean_entity_name, extract_attack_type):
+        info = function.cache_info()
+        earlier = since[function.__name__] if since else {"hits": 0, "misses": 0}
+        hits, misses = info.hits - earlier["hits"], info.misses - earlier["misses"]
+        lookups = hits + misses
+        stats[function.__name__] = {
+            "hits": hits,
+            "misses": misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+    return stats
+
+def is_player_character(name, player_name, known_players=None):
+    """
+    Determine if a name is likely a player character.
+    Uses a list of known players extracted from the log.
+    """
+    name = name.strip()
+    if not name:
+        return False
+
+    # Always count "Your" or your character name as a player
+    if name.lower() == "your" or name.lower() == player_name.lower():
+        return True
+        
+    # In your specific combat scenario, count Tsacherus as a player
+    if name.lower() == "tsacherus":
+        return True
+
+    # Check against known players list
+    if known_players:
+        return name in known_players
+
+    # Fallback logic for other cases
+    name_lower = name.lower()
+    player_name_lower = player_name.strip().lower()
+
+    if name_lower == player_name_lower:
+        return True
+    if " " in name_lower or re.match(r'^(a|an|the)\s', name_lower):
+        return False
+    if name[0].isupper() and not name.isupper():
+        return True
+
+    return False
+
+
+def new_damage_data():
+    """
+    Return an empty damage_data aggregate. Besides the report categories
+    (the pve_ ones are damage between a player and a non-player):
+    damage_timeline is keyed "encounter -> clock -> source" by the game minute
+    of the events (-1 before any prompt), encounters maps an encounter number
+    to [damage, hits, first_line, last_line], and encounter_breakdown is keyed
+    "encounter -> source -> target -> attack_type". The *_hit_stats categories
+    hold per-hit statistics of sources, "source -> attack_type" and
+    "source -> target" keys (see hit_stats_row).
+    """
+    return {
+        "damage_done": {}, "damage_taken": {}, "damage_details": {},
+        "damage_types": {}, "pvp_damage_done": {}, "pvp_damage_taken": {},
+        "pve_damage_done": {}, "pve_damage_taken": {},
+        "damage_timeline": {}, "encounters": {}, "encounter_breakdown": {},
+        "source_hit_stats": {}, "type_hit_stats": {}, "pair_hit_stats": {}
+    }
+
+
+def copy_damage_data(damage_data):
+    """Copy a damage_data aggregate, down to its value lists."""
+    return {
+        category: {key: list(values) for key, values in entries.items()}
+        for category, entries in damage_data.items()
+    }
+
+
+def new_event_table():
+    """
+    Return an empty columnar store of damage events. Entity names and attack
+    types are interned to integer IDs, and each event is one row across the
+    typed arrays: source, target, attack_type, damage, (1-based) line and
+    clock, the game minute of the last prompt before it (-1 if none yet).
+    """
+    return {
+        "names": [], "name_ids": {},
+        "attack_types": [], "attack_type_ids": {},
+        "source": array("I"), "target": array("I"), "attack_type": array("I"),
+        "damage": array("d"), "line": array("I"), "clock": array("i"),
+    }
+
+
+def intern_id(values, ids, value):
+    """Return the integer ID of value, adding it to the interned values if new."""
+    index = ids.get(value)
+    if index is None:
+        index = ids[value] = len(values)
+        values.append(value)
+    return index
+
+
+def new_parse_state():
+    """
+    Return the running state of a damage parse:
+    events is the columnar event table, possessive_names holds capitalized
+    possessives seen on any line (for PvP), line_count the lines read so far,
+    clock the current game minute and first_clock the first one (-1 until a
+    prompt with a time is read), encounter_breaks the line numbers after
+    which a new encounter starts ("GO!!!" and "is DEAD!!" markers).
+    """
+    return {
+        "events": new_event_table(), "possessive_names": set(), "line_count": 0,
+        "clock": -1, "first_clock": -1, "encounter_breaks": array("I"),
+    }
+
+
+def should_parse_in_parallel(size, parallel=None):
+    """Decide whether a log of the given size (None if unknown) uses the process pool."""
+    if parallel is not None:
+        return parallel
+    return size is not None and size >= PARALLEL_THRESHOLD_BYTES and (os.cpu_count() or 1) > 1
+
+
+def parse_log_chunk(chunk, player_name, encoding="utf-8", errors="strict"):
+    """Parse one chunk of a log into its own parse state (process pool worker)."""
+    if isinstance(chunk, bytes):
+        chunk = chunk.decode(encoding, errors)
+    return parse_damage_lines(iter_log_lines(chunk), player_name)
+
+
+def parse_chunks_parallel(chunks, player_name, encoding="utf-8", errors="strict", workers=None):
+    """
+    Parse log chunks in a process pool and merge the partial states in log
+    order, so the result matches a serial parse exactly.
+    """
+    return parse_logs_parallel(((0, chunk) for chunk in chunks), 1, player_name, encoding, errors, workers)[0]
+
+
+def parse_logs_parallel(log_chunks, log_count, player_name, encoding="utf-8", errors="strict", workers=None):
+    """
+    Parse the chunks of log_count logs, given as (log index, chunk) in log
+    order, in one process pool and return each log's merged parse state.
+    At most two chunks per worker are in flight at once, so memory stays
+    bounded however large the logs are.
+    """
+    workers = workers or os.cpu_count() or 1
+    states = [new_parse_state() for _ in range(log_count)]
+    # spawn avoids forking the Streamlit server's threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = deque()
+        for index, chunk in log_chunks:
+            pending.append((index, pool.submit(parse_log_chunk, chunk, player_name, encoding, errors)))
+            if len(pending) >= workers * 2:
+                index, future = pending.popleft()
+                merge_parse_states(states[index], future.result())
+        while pending:
+            index, future = pending.popleft()
+            merge_parse_states(states[index], future.result())
+    return states
+
+
+def merge_parse_states(state, other):
+    """
+    Append the parse state of a later stretch of the log to state and return it.
+    The other table's IDs are re-interned and its line numbers shifted, so
+    merging chunk states in log order gives the same table as a serial parse.
+    The other state's clock started from its own first prompt, so it is moved
+    forward by whole days to continue this one's.
+    """
+    events, other_events = state["events"], other["events"]
+    name_map = [intern_id(events["names"], events["name_ids"], name) for name in other_events["names"]]
+    type_map = [
+        intern_id(events["attack_types"], events["attack_type_ids"], attack_type)
+        for attack_type in other_events["attack_types"]
+    ]
+    events["source"].extend(map(name_map.__getitem__, other_events["source"]))
+    events["target"].extend(map(name_map.__getitem__, other_events["target"]))
+    events["attack_type"].extend(map(type_map.__getitem__, other_events["attack_type"]))
+    events["damage"].extend(other_events["damage"])
+    offset = state["line_count"]
+    events["line"].extend(line_no + offset for line_no in other_events["line"])
+    state["encounter_breaks"].extend(line_no + offset for line_no in other["encounter_breaks"])
+
+    # Events before the other stretch's first prompt happened at this state's time
+    clock = state["clock"]
+    day_offset = 0
+    if clock >= 0 and other["first_clock"] >= 0:
+        day_offset = -(-(clock - other["first_clock"]) // MINUTES_PER_DAY) * MINUTES_PER_DAY
+        day_offset = max(day_offset, 0)
+    events["clock"].extend(
+        clock if event_clock < 0 else event_clock + day_offset for event_clock in other_events["clock"]
+    )
+    if state["first_clock"] < 0 and other["first_clock"] >= 0:
+        state["first_clock"] = other["first_clock"]
+    if other["clock"] >= 0:
+        state["clock"] = other["clock"] + day_offset
+
+    state["possessive_names"] |= other["possessive_names"]
+    state["line_count"] += other["line_count"]
+    return state
+
+
+def parse_damage_lines(lines, player_name, state=None, profile=None):
+    """
+    Feed an iterable of raw log lines into a parse state (a new one if not
+    given) and return it. Known players are collected in the same pass;
+    damage_analysis.finish_damage_data() builds the final report.
+    Pass a dict from new_parse_profile() as profile to count and time every
+    rule the parser tries; without one the loop does no extra work.
+    """
+    if state is None:
+        state = new_parse_state()
+    events = state["events"]
+    possessive_names = state["possessive_names"]
+    encounter_breaks = state["encounter_breaks"]
+    line_no = state["line_count"]
+    game_clock = state["clock"]
+    clock = time.perf_counter
+    start = 0.0
+    cache_start = normalization_cache_stats() if profile is not None else None
+
+    for line_no, line in enumerate(lines, line_no + 1):
+        # Known players are the capitalized possessive names on any line, combat or not
+        if "'s" in line:
+            possessive_names.update(POSSESSIVE_NAME_RE.findall(line))
+
+        if profile is not None:
+            start = clock()
+        kind, line = classify_line(line.strip())
+        if profile is not None:
+            count_rule(profile, "classify", kind == LINE_COMBAT, clock() - start)
+        if kind != LINE_COMBAT:
+            # Prompts carry the game time events are stamped with
+            if kind == LINE_PROMPT:
+                minute_of_day = prompt_game_minute(line)
+                if minute_of_day is not None:
+                    game_clock = advance_clock(game_clock, minute_of_day)
+                    if state["first_clock"] < 0:
+                        state["first_clock"] = game_clock
+            # A kill ends an encounter after its line, "GO!!!" starts one at its line
+            elif "!!" in line:
+                if "is DEAD!!" in line:
+                    encounter_breaks.append(line_no)
+                elif line.startswith(ENCOUNTER_START_MARKER):
+                    encounter_breaks.append(line_no - 1)
+            continue
+
+        # --- 1. Cut throat pattern (specific to CMUD) ---
+        if "'s cut throat" in line:
+            if profile is not None:
+                start = clock()
+            throat_match = CUT_THROAT_RE.search(line)
+            if profile is not None:
+                count_rule(profile, "cut_throat", throat_match is not None, clock() - start)
+        else:
+            throat_match = None
+        if throat_match:
+            source_raw, verb, target_raw = map(str.strip, throat_match.groups()[:3])
+            source = clean_entity_name(source_raw, player_name)
+            target = clean_entity_name(target_raw, player_name)
+            damage = VERB_TABLE.get(verb.lower(), (0, 0))[1]
+            record_damage(events, source, target, damage, "cutthroat", player_name, line_no, game_clock)
+            continue
+
+        # --- 2. Special formatting patterns (from CMUD triggers) ---
+        # Patterns are tried in list order, so only run them when the prefilter hits
+        special_pattern_matched = False
+        if profile is not None:
+            start = clock()
+        special_candidate = SPECIAL_PREFILTER_RE.search(line)
+        if profile is not None:
+            count_rule(profile, "special_prefilter", special_candidate is not None, clock() - start)
+        if special_candidate:
+            for verb, damage_val, pattern in SPECIAL_MATCHERS:
+                if profile is not None:
+                    start = clock()
+                match = pattern.search(line)
+                if profile is not None:
+                    count_rule(profile, "special", match is not None, clock() - start, verb)
+                if match:
+                    source_raw = match.group(1).strip()
+                    target_raw = match.group(2).strip()
+
+                    # Clean source and target names
+                    source = clean_entity_name(source_raw, player_name)
+                    target = clean_entity_name(target_raw, player_name)
+
+                    # Extract attack type from source if possible
+                    attack_type = extract_attack_type(source_raw)
+                    if not attack_type or attack_type == "attack":
+                        attack_type = verb.lower()  # Use the verb as fallback
+
+                    record_damage(events, source, target, damage_val, attack_type, player_name, line_no, game_clock)
+                    special_pattern_matched = True
+                    break
+        if special_pattern_matched:
+            continue
+
+        # --- 3. Standard damage verb patterns ---
+        # One scan finds every damage verb on the line; the group index is the
+        # verb's priority, so candidates are tried in trigger priority order
+        if profile is not None:
+            start = clock()
+        candidates = sorted({token.lastindex for token in VERB_TOKEN_RE.finditer(line)})
+        if profile is not None:
+            count_rule(profile, "verb_scan", bool(candidates), clock() - start)
+        for group in candidates:
+            verb, damage_val, possessive_re, regular_re = VERB_MATCHERS[group - 1]
+
+            # Try possessive pattern first: "X's Y VERB Z"
+            if profile is not None:
+                start = clock()
+            match = possessive_re.search(line)
+            if profile is not None:
+                count_rule(profile, "possessive", match is not None, clock() - start, verb)
+            if match:
+                source_raw = match.group(1).strip()
+                attack_raw = match.group(2).strip()
+                target_raw = match.group(3).strip()
+
+                # Clean names
+                source = clean_entity_name(source_raw, player_name)
+                target = clean_entity_name(target_raw, player_name)
+
+                # Get attack type from the possessive form
+                attack_type = attack_raw.strip().lower()
+
+                record_damage(events, source, target, damage_val, attack_type, player_name, line_no, game_clock)
+                break
+
+            # If no possessive match, try regular pattern: "X VERB Y"
+            if profile is not None:
+                start = clock()
+            match = regular_re.search(line)
+            if profile is not None:
+                count_rule(profile, "regular", match is not None, clock() - start, verb)
+            if match:
+                source_raw = match.group(1).strip()
+                target_raw = match.group(2).strip()
+
+                # Clean names
+                words = source_raw.split()
+
+                if len(words) > 1:
+                    # This is likely "Entity attack_type" format
+                    source_name = words[0]
+                    attack_type = " ".join(words[1:]).lower()
+                else:
+                    source_name = source_raw
+                    attack_type = "attack"  # Generic fallback
+
+                source = clean_entity_name(source_name, player_name)
+                target = clean_entity_name(target_raw, player_name)
+
+                record_damage(events, source, target, damage_val, attack_type, player_name, line_no, game_clock)
+                break
+        else:
+            # A combat-looking line no rule turned into an event
+            if profile is not None:
+                sample_fall_through(profile, line_no, line)
+
+    state["line_count"] = line_no
+    state["clock"] = game_clock
+    if profile is not None:
+        profile["normalization"] = normalization_cache_stats(cache_start)
+    return state
+
+def record_damage(events, source, target, damage_value, damage_type=None, player_name="", line_no=0, clock=-1):
+    """
+    Record one damage event in the columnar event table.
+    Based on CMUD's DMAdd function implementation.
+    """
+    # Ensure all parameters have values
+    if damage_type is None:
+        damage_type = "attack"
+    
+    # Clean and standardize 
+    damage_type = str(damage_type).strip().lower()
+    
+    # Clean entity names one final time
+    source_clean = source if source else ""
+    target_clean = target if target else ""
+    
+    # Skip invalid records
+    if not source_clean or not target_clean:
+        return
+
+    # Handle special cases where target might be shorthand
+    if target_clean.lower() in ["him", "her"]:
+        target_clean = source_clean  # CMUD uses source as target in these cases
+
+    # Fix "Your beating" to just "Your" as source
+    if source_clean.lower().startswith("your "):
+        # Extract the actual attack type if possible
+        if damage_type == "attack":
+            parts = source_clean.split()
+            if len(parts) > 1:
+                damage_type = parts[1].lower()
+        # Use player_name instead of "Your"
+        source_clean = player_name
+    
+    # Also handle just "Your" as a source (not followed by anything)
+    if source_clean.lower() == "your":
+        source_clean = player_name
+    
+    # Fix for special high-damage attacks (like "obliterates")
+    # If the damage type is a special attack from SPECIAL_DAMAGE_PATTERNS
+    # and the damage verb is one of the uppercase ones (like "OBLITERATES")
+    if damage_type.lower() in HIGH_DAMAGE_VERBS:
+        # And if the source contains "beating" or another attack type
+        if " " in source_clean and not source_clean.lower().startswith("a "):
+            parts = source_clean.split()
+            if len(parts) > 1 and parts[0].lower() != "an":
+                # Keep the first part (character name) and extract attack type
+                source_clean = parts[0]
+    
+    # --- Record the event; categories are aggregated from the table later ---
+    events["source"].append(intern_id(events["names"], events["name_ids"], source_clean))
+    events["target"].append(intern_id(events["names"], events["name_ids"], target_clean))
+    events["attack_type"].append(intern_id(events["attack_types"], events["attack_type_ids"], damage_type))
+    events["damage"].append(damage_value)
+    events["line"].append(line_no)
+    events["clock"].append(clock)
+
+
+# ----------------- Parser Instrumentation -----------------
+
+def new_parse_profile(sample_size=PROFILE_SAMPLE_LINES, seed=0):
+    """
+    Return empty instrumentation for parse_damage_lines: per rule (and per
+    verb) how often it was tried, how often it matched and the seconds it
+    took, a reservoir sample of combat lines that fell through, and the
+    normalization cache lookups of the parse (see normalization_cache_stats).
+    """
+    return {
+        "rules": {},
+        "normalization": {},
+        "fall_through": 0,
+        "fall_through_samples": [],
+        "sample_size": sample_size,
+        "random": random.Random(seed),
+    }
+
+
+def count_rule(profile, rule, matched, elapsed, verb=""):
+    """Add one attempt of a parser rule (optionally for one verb) to a profile."""
+    key = (rule, verb)
+    counts = profile["rules"].get(key)
+    if counts is None:
+        counts = profile["rules"][key] = [0, 0, 0.0]
+    counts[0] += 1
+    counts[1] += matched
+    counts[2] += elapsed
+
+
+def sample_fall_through(profile, line_no, line):
+    """Count a combat line that no rule matched, keeping a uniform sample of them."""
+    profile["fall_through"] += 1
+    samples = profile["fall_through_samples"]
+    if len(samples) < profile["sample_size"]:
+        samples.append((line_no, line))
+        return
+    slot = profile["random"].randrange(profile["fall_through"])
+    if slot < profile["sample_size"]:
+        samples[slot] = (line_no, line)
+
+
+def profile_rows(profile):
+    """Return one dict per rule and verb, slowest first, for display."""
+    rows = []
+    for (rule, verb), (tried, matched, seconds) in profile["rules"].items():
+        rows.append({
+            "rule": rule,
+            "verb": verb,
+            "tried": tried,
+            "matched": matched,
+            "match_rate": matched / tried if tried else 0.0,
+            "time_ms": seconds * 1000,
+        })
+    rows.sort(key=lambda row: row["time_ms"], reverse=True)
+    return rows
+
+
+def profile_to_json(profile):
+    """Serialize a parse profile (rules, fall-through count and samples, normalization cache) as JSON."""
+    samples = sorted(profile["fall_through_samples"])
+    return json.dumps({
+        "rules": profile_rows(profile),
+        "fall_through": profile["fall_through"],
+        "fall_through_samples": [{"line": line_no, "text": line} for line_no, line in samples],
+        "normalization": profile.get("normalization", {}),
+    }, indent=4)
+
+
+def calculate_percentages(damage_data):
+    """
+    Calculate percentage contributions for damage statistics.
+    Based on the CMUD DMSorter function.
+    """
+    # Process each category
+    for category in damage_data:
+        if not damage_data[category] or category in RAW_CATEGORIES:
+            continue
+            
+        # Calculate total damage in this category
+        total_damage = sum(data[0] for data in damage_data[category].values())
+        if total_damage == 0:
+            continue
+            
+        # Calculate percentage for each entry
+        for key in damage_data[category]:
+            if category == "damage_details":
+                # damage_details has a different structure with damage type
+                damage_type = damage_data[category][key][2]
+                percentage = (damage_data[category][key][0] / total_damage) * 100
+                
+                # Calculate average damage per hit
+                hits = damage_data[category][key][1]
+                average = damage_data[category][key][0] / hits if hits > 0 else 0
+                
+                # Update with percentage and average
+                damage_data[category][key] = [
+                    damage_data[category][key][0],  # damage
+                    hits,                          # hit count
+                    damage_type,                   # damage type
+                    percentage,                    # percentage
+                    average                        # average damage
+                ]
+            else:
+                # Other categories have a simpler structure
+                percentage = (damage_data[category][key][0] / total_damage) * 100
+                hits = damage_data[category][key][1]
+                average = damage_data[category][key][0] / hits if hits > 0 else 0
+                
+                # Add percentage and average to existing list
+                damage_data[category][key].extend([percentage, average])
+
@@ -1,8 +1,193 @@
 import streamlit as st
-import re
+import math
 import pandas as pd
-import io
+import os
+import time
 import streamlit.components.v1 as components
+from damcalc.damage_analysis import (
+    HIT_PERCENTILES, LEADERBOARD_CATEGORIES, OTHER_ENTITY, TICK_GAME_MINUTES, analyze_damage_log,
+    analyze_damage_stream, append_damage_text, damage_timeline, encounter_report, event_table, events_report,
+    filter_events, finish_damage_data, log_leaderboard, new_append_session, new_tail_session, parse_damage_log,
+    parse_damage_stream, parse_damage_streams, report_players, tail_damage_file
+)
+from damcalc.damage_parser import (
+    COMPRESSED_SUFFIXES, DECOMPRESSION_ERRORS, LOG_SUFFIXES, list_log_files, new_parse_profile, open_log_file,
+    profile_rows, profile_to_json, should_parse_in_parallel
+)
+from damcalc.report_cache import (
+    clear_report_cache, content_digest, get_cached_report, report_cache_key, report_cache_stats, store_report
+)
+from damcalc.report_export import (
+    EXCEL_MIME, PARQUET_MIME, export_damage_data, iter_markdown_export, report_table, write_event_parquet,
+    write_excel_report
+)
+from damcalc.session_history import (
+    TREND_PERIODS, delete_session, entity_trend, find_session, list_sessions, load_session_events,
+    load_session_report, save_session
+)
+from shared.virtual_table import render_virtual_table
+
+# How undecodable bytes in uploaded logs are handled ("strict" raises instead)
+UPLOAD_DECODE_ERRORS = "replace"
+# Prepared exports kept per session (one per report / options combination)
+EXPORT_CACHE_ENTRIES = 4
+# Download file name and MIME type of each export format
+EXPORT_FILES = {
+    "CSV": ("damage_report.csv", "text/csv"),
+    "Excel": ("damage_report.xlsx", EXCEL_MIME),
+    "Text": ("damage_report.txt", "text/plain"),
+    "Markdown": ("damage_report.md", "text/markdown"),
+    "Parquet (events)": ("damage_events.parquet", PARQUET_MIME),
+}
+# Stored sessions offered in the History tab, newest first
+HISTORY_LIST_LIMIT = 500
+# Only directory live tail may read logs from, e.g. the MUD client's log folder on this server;
+# unset (the default) turns live tail off, so visitors can't read the server's files
+TAIL_LOG_DIR = os.getenv("DAMCALC_TAIL_LOG_DIR")
+# Seconds between checks of a live-tailed log file
+TAIL_REFRESH_SECONDS = 2
+# Sources charted per tick in the live tail view
+TAIL_CHART_SOURCES = 6
+# Report category each trend view follows
+TREND_VIEWS = {"PvE damage done": "pve_damage_done", "PvP damage done": "pvp_damage_done",
+               "All damage done": "damage_done", "All damage taken": "damage_taken"}
+
+
+def store_damage_data(damage_data, player_name, source=None, events=None):
+    """
+    Keep a new analysis result in the session; its version keys the prepared
+    exports. source (the pasted text, upload, append or live tail session,
+    or history session ID) is kept so the per-event table can be rebuilt from it, unless
+    the analysis already produced those events.
+    """
+    st.session_state.damage_data = damage_data
+    st.session_state.char_name = player_name
+    st.session_state.damage_source = source
+    st.session_state.damage_version = st.session_state.get("damage_version", 0) + 1
+    st.session_state.damage_events = {} if events is None else {None: events}
+    st.session_state.pop("damage_logs", None)
+
+
+def store_damage_logs(damage_logs, player_name):
+    """Keep the reports of several logs (name -> damage_data, source and events) in the session."""
+    store_damage_data(None, player_name)
+    st.session_state.damage_logs = damage_logs
+    st.session_state.damage_events = {
+        name: log["events"] for name, log in damage_logs.items() if log["events"] is not None
+    }
+
+
+def report_events(log_name, source, player_name):
+    """
+    Return the per-event table of the shown report (log_name None unless
+    several logs were analyzed), rebuilding it from its source only once.
+    """
+    events = st.session_state.setdefault("damage_events", {})
+    if log_name not in events:
+        events[log_name] = source_events(source, player_name)
+    return events[log_name]
+
+
+def recall_report(digest, player_name, top_k=None):
+    """
+    Return (damage_data, origin) of a log analyzed before: from the shared
+    report cache ("cache") or the session history ("history"), else (None, None).
+    The history only holds full reports, so top_k summaries come from the cache.
+    """
+    key = report_cache_key(digest, player_name, top_k)
+    damage_data = get_cached_report(key)
+    if damage_data is not None:
+        return damage_data, "cache"
+    session_id = None if top_k else find_session(digest, player_name)
+    if session_id is None:
+        return None, None
+    damage_data = load_session_report(session_id)
+    store_report(key, damage_data)
+    return damage_data, "history"
+
+
+def remember_report(digest, player_name, name, state, save_history=True, top_k=None):
+    """
+    Build the report (summarized to top_k if given) and per-event table of
+    a parse state, cache the report and, with save_history, store both in
+    the history unless summarized. Returns (damage_data, events).
+    """
+    damage_data = finish_damage_data(state, player_name, top_k)
+    events = event_table(state)
+    store_report(report_cache_key(digest, player_name, top_k), damage_data)
+    if save_history and not top_k:
+        save_session(digest, player_name, name, damage_data, events, state["line_count"])
+    return damage_data, events
+
+
+def expand_uploads(uploaded_files):
+    """
+    Split uploaded files into their logs (see list_log_files) as dicts of
+    name, upload, member and uncompressed size. Unreadable archives are
+    reported and skipped.
+    """
+    log_files = []
+    for uploaded_file in uploaded_files:
+        try:
+            for name, member, size in list_log_files(uploaded_file, uploaded_file.name):
+                log_files.append({"name": name, "upload": uploaded_file, "member": member, "size": size})
+        except DECOMPRESSION_ERRORS:
+            st.warning(f"{uploaded_file.name} could not be read as an archive and was skipped.")
+    return log_files
+
+
+def open_upload_log(log_file):
+    """A binary stream of an uploaded log from its start, decompressed as it is read."""
+    return open_log_file(log_file["upload"], log_file["upload"].name, log_file["member"])
+
+
+def analyze_upload_log(log_file, player_name, save_history=True, top_k=None):
+    """
+    Analyze one uploaded log, streamed (and decompressed) line by line, or
+    reuse its cached or stored report. Returns (damage_data, events, origin).
+    """
+    digest = content_digest(open_upload_log(log_file))
+    damage_data, origin = recall_report(digest, player_name, top_k)
+    if damage_data is not None:
+        return damage_data, None, origin
+    state = parse_damage_stream(
+        open_upload_log(log_file), player_name, errors=UPLOAD_DECODE_ERRORS,
+        parallel=should_parse_in_parallel(log_file["size"])
+    )
+    damage_data, events = remember_report(digest, player_name, log_file["name"], state, save_history, top_k)
+    return damage_data, events, None
+
+
+def analyze_uploaded_logs(log_files, player_name, save_history=True, top_k=None):
+    """
+    Analyze several uploaded logs (see expand_uploads) into name ->
+    {"damage_data", "source", "events"}, reusing cached or stored reports
+    and parsing the rest concurrently.
+    """
+    damage_logs, digests, pending = {}, {}, []
+    for log_file in log_files:
+        if log_file["size"] == 0:
+            continue
+        name, copy = log_file["name"], 2
+        while name in damage_logs:
+            name, copy = f"{log_file['name']} ({copy})", copy + 1
+        digests[name] = content_digest(open_upload_log(log_file))
+        damage_data, _ = recall_report(digests[name], player_name, top_k)
+        damage_logs[name] = {"damage_data": damage_data, "source": log_file, "events": None}
+        if damage_data is None:
+            pending.append(name)
+
+    # Compressed logs can't be measured as streams; their sizes come from the archives
+    states = parse_damage_streams(
+        [open_upload_log(damage_logs[name]["source"]) for name in pending], player_name,
+        errors=UPLOAD_DECODE_ERRORS, sizes=[damage_logs[name]["source"]["size"] for name in pending]
+    )
+    for name, state in zip(pending, states):
+        damage_logs[name]["damage_data"], damage_logs[name]["events"] = remember_report(
+            digests[name], player_name, name, state, save_history, top_k
+        )
+    return damage_logs
+
 
 def show_damcalc_page():
     """Main page for the damage calculator interface."""
@@ -24,7 +209,7 @@ def show_damcalc_page():
     """)
     
     # Tab for data input methods
-    input_tab, options_tab = st.tabs(["📥 Input Combat Log", "⚙️ Analysis Options"])
+    input_tab, options_tab, history_tab = st.tabs(["📥 Input Combat Log", "⚙️ Analysis Options", "📚 History"])
     
     with input_tab:
         col1, col2 = st.columns(2)
@@ -38,8 +223,13 @@ def show_damcalc_page():
             )
         
         with col2:
-            # File uploader
-            uploaded_file = st.file_uploader("Or upload a log file:", type=["txt", "log"])
+            # File uploader; several logs are compared side by side
+            uploaded_files = st.file_uploader(
+                "Or upload log files:", type=[suffix[1:] for suffix in LOG_SUFFIXES + COMPRESSED_SUFFIXES],
+                accept_multiple_files=True,
+                help="Upload several logs to compare them with per-player leaderboards. Logs may be "
+                     "compressed (.gz, .bz2, or a .zip of several logs) to upload faster."
+            ) or []
             
             # Character name input
             char_name = st.text_input(
@@ -49,6 +239,33 @@ def show_damcalc_page():
             
             # Analyze button
             analyze_button = st.button("📊 Analyze Damage", type="primary", use_container_width=True)
+
+            # Append button keeps running totals and only parses newly pasted text
+            append_button = st.button(
+                "➕ Append to Report",
+                use_container_width=True,
+                help="Paste the next part of your log (or the whole log again) to update the report mid-fight."
+            )
+
+        # Live tail follows a log the MUD client is still writing, when the server allows it
+        start_tail = stop_tail = False
+        tail_refresh = TAIL_REFRESH_SECONDS
+        if TAIL_LOG_DIR:
+            with st.expander("📡 Live Tail", expanded="damage_tail" in st.session_state):
+                tail_path = st.text_input(
+                    "Log file to follow:",
+                    placeholder="e.g. dsl.log",
+                    help=f"Your client's log file in {TAIL_LOG_DIR} on the computer running this app. Only "
+                         "new lines are read on each check, so the report keeps up during a fight."
+                )
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    tail_start = st.radio("Start from:", ["Beginning of file", "New lines only"])
+                with col2:
+                    tail_refresh = st.slider("Check every (seconds):", 1, 10, TAIL_REFRESH_SECONDS)
+                with col3:
+                    start_tail = st.button("▶️ Start Live Tail", use_container_width=True)
+                    stop_tail = st.button("⏹️ Stop Live Tail", use_container_width=True)
             
     with options_tab:
         # Options similar to the original script
@@ -63,6 +280,8 @@ def show_damcalc_page():
                 "pvp_damage_taken": st.checkbox("PvP Damage Taken", value=True),
                 "damage_types": st.checkbox("Damage by Type", value=True),
                 "damage_details": st.checkbox("Damage Details", value=True),
+                "damage_timeline": st.checkbox("Damage Timeline", value=True),
+                "hit_stats": st.checkbox("Hit Statistics", value=True),
                 "hide_zero_damage": st.checkbox("Hide Zero Damage", value=True)
             }
         
@@ -70,51 +289,227 @@ def show_damcalc_page():
             st.subheader("Export Options")
             export_format = st.radio(
                 "Export Format:",
-                ["CSV", "Excel", "Text", "Markdown"],
-                index=0
+                list(EXPORT_FILES),
+                index=0,
+                help="Parquet exports every damage event (line, game time, fight, source, target, type, damage)."
             )
 
+            st.subheader("Debug")
+            instrument_parser = st.checkbox(
+                "Parser instrumentation",
+                value=False,
+                help="Count and time every parser rule on the next analysis. Slower, and skips the report cache."
+            )
+            cache = report_cache_stats()
+            st.caption(
+                f"Report cache: {cache['entries']} reports, {cache['bytes'] / (1024 * 1024):.1f} MB, "
+                f"{cache['hits']} hits, {cache['misses']} misses, {cache['evictions']} evictions"
+            )
+            if st.button("🧹 Clear Report Cache", help="Drop every cached report, so the next analyses parse again."):
+                clear_report_cache()
+                st.rerun()
+
+            st.subheader("History")
+            save_history = st.checkbox(
+                "Save analyses to history",
+                value=False,
+                help="Store every analyzed log on this server, so it reloads instantly and shows up in trends."
+            )
+            st.caption("⚠️ The history is shared: anyone using this app can load the logs saved under a "
+                       "character name by entering that name.")
+
+            st.subheader("Large Logs")
+            top_k = st.number_input(
+                "Top entities per table (0 = all):",
+                min_value=0,
+                value=0,
+                step=10,
+                help="For logs with thousands of names: keep the biggest sources, targets and pairs by damage "
+                     "and add up everyone else as (other). Summarized reports are not saved to history."
+            ) or None
+
+    with history_tab:
+        display_history(char_name)
+
     # Process and analyze log data when button is clicked
     if analyze_button:
         # Process the log and store results in session state
-        if log_text:
-            log_content = log_text
-        elif uploaded_file is not None:
-            log_content = uploaded_file.getvalue().decode("utf-8")
+        st.session_state.pop("damage_append", None)
+        st.session_state.pop("parse_profile", None)
+        player_name = char_name if char_name else "Charname"
+        log_files = [] if log_text else expand_uploads(uploaded_files)
+        log_file = log_files[0] if len(log_files) == 1 and log_files[0]["size"] != 0 else None
+        if instrument_parser and (log_text or log_file is not None):
+            # Instrumented runs always parse, so the cache is bypassed
+            profile = new_parse_profile()
+            origin = None
+            if log_text:
+                damage_data = analyze_damage_log(log_text, player_name, profile=profile, top_k=top_k)
+            else:
+                try:
+                    damage_data = analyze_damage_stream(
+                        open_upload_log(log_file), player_name, errors=UPLOAD_DECODE_ERRORS, profile=profile,
+                        top_k=top_k
+                    )
+                except DECOMPRESSION_ERRORS:
+                    damage_data = None
+                    st.error(f"{log_file['name']} is damaged or incomplete; please upload it again.")
+            if damage_data is not None:
+                store_damage_data(damage_data, player_name, log_text or log_file)
+                st.session_state.parse_profile = profile
+        elif log_text:
+            # Identical logs (re-analysis, other sessions or past visits) reuse the stored report
+            digest = content_digest(log_text)
+            damage_data, origin = recall_report(digest, player_name, top_k)
+            events = None
+            if damage_data is None:
+                state = parse_damage_log(log_text, player_name)
+                damage_data, events = remember_report(
+                    digest, player_name, "Pasted log", state, save_history, top_k
+                )
+            store_damage_data(damage_data, player_name, log_text, events)
+        elif len(log_files) > 1:
+            # Each log keeps its own report; the leaderboards are built from them
+            origin = None
+            try:
+                damage_logs = analyze_uploaded_logs(log_files, player_name, save_history, top_k)
+            except DECOMPRESSION_ERRORS:
+                st.error("One of the compressed logs is damaged or incomplete; please upload it again.")
+            else:
+                if damage_logs:
+                    store_damage_logs(damage_logs, player_name)
+                else:
+                    st.warning("The uploaded log files are empty.")
+        elif log_file is not None:
+            # Stream the upload line by line instead of decoding (or decompressing) it whole
+            try:
+                damage_data, events, origin = analyze_upload_log(log_file, player_name, save_history, top_k)
+            except DECOMPRESSION_ERRORS:
+                origin = None
+                st.error(f"{log_file['name']} is damaged or incomplete; please upload it again.")
+            else:
+                store_damage_data(damage_data, player_name, log_file, events)
         else:
-            log_content = ""
+            origin = None
+            st.warning("Please paste a combat log or upload a log file to analyze.")
+
+        if origin == "cache":
+            st.caption("⚡ This log was already analyzed - showing the cached report.")
+        elif origin == "history":
+            st.caption("📚 This log is in the history - showing the stored report.")
 
-        if log_content:
-            player_name = char_name if char_name else "Charname"
-            st.session_state.damage_data = analyze_damage_log(log_content, player_name)
-            st.session_state.char_name = player_name
+    elif append_button:
+        st.session_state.pop("parse_profile", None)
+        player_name = char_name if char_name else "Charname"
+        if log_text:
+            session = st.session_state.get("damage_append")
+            if session is None or session["player_name"] != player_name or session["totals"].get("top_k") != top_k:
+                session = st.session_state.damage_append = new_append_session(player_name, top_k)
+            store_damage_data(append_damage_text(session, log_text), player_name, session)
         else:
-            st.warning("Please paste a combat log or upload a log file to analyze.")
+            st.warning("Paste the new part of your combat log to append it to the report.")
+
+    if start_tail:
+        player_name = char_name if char_name else "Charname"
+        log_path = tail_log_path(tail_path)
+        if log_path is not None:
+            st.session_state.damage_tail = new_tail_session(
+                log_path, player_name, top_k, tail_start == "Beginning of file", errors=UPLOAD_DECODE_ERRORS
+            )
+            st.session_state.pop("damage_tail_view", None)
+        else:
+            st.error(f"Live tail only follows existing log files in {TAIL_LOG_DIR}.")
+    elif stop_tail:
+        st.session_state.pop("damage_tail", None)
+        st.session_state.pop("damage_tail_view", None)
+
+    # The live view reruns on its own; the rest of the page stays as it is
+    damage_tail = st.session_state.get("damage_tail")
+    if damage_tail is not None:
+        st.fragment(display_live_tail, run_every=tail_refresh)(damage_tail)
 
     damage_data = st.session_state.get("damage_data")
+    damage_source = st.session_state.get("damage_source")
     char_name = st.session_state.get("char_name", "")
 
+    # Several logs: leaderboards across them, then the full report of one
+    damage_logs = st.session_state.get("damage_logs")
+    log_name = None
+    if damage_logs:
+        log_name = display_log_leaderboards(damage_logs)
+        damage_data, damage_source = damage_logs[log_name]["damage_data"], damage_logs[log_name]["source"]
+
     # Display stored damage data if available
     if damage_data:
+        # Each fight's report is built from the stored breakdown, without reparsing
+        players = report_players(damage_data)
+        encounter, report = select_encounter(damage_data)
+        filters = select_filters(damage_data)
+        if filters:
+            # Drill-downs re-aggregate the kept per-event table, never the raw log
+            events = report_events(log_name, damage_source, char_name)
+            if events is None:
+                st.warning("This session was stored without its events, so it can't be filtered.")
+                filters = {}
+            else:
+                report = events_report(filtered_events(events, encounter, filters, players), players)
+        damage_data = report
         display_damage_reports(damage_data, display_options, char_name)
 
+        if display_options.get("damage_timeline", True):
+            display_damage_timeline(damage_data)
+
+        if display_options.get("hit_stats", True):
+            display_hit_stats(damage_data)
+
+        parse_profile = st.session_state.get("parse_profile")
+        if parse_profile:
+            display_parse_profile(parse_profile)
+
         # 🧾 Export Buttons at Bottom
         st.markdown("---")
         st.subheader("📤 Export Damage Report")
 
         col1, _ = st.columns([1, 1])  # Export on left only
 
-        # Get formatted data
-        exported_text = export_damage_data(damage_data, "text", display_options, char_name)
-        exported_csv = export_damage_data(damage_data, "csv", display_options, char_name)
+        # Exports are only built on request, once per report, format, options and character
+        export_key = (
+            st.session_state.get("damage_version", 0), log_name, encounter, export_format,
+            tuple(display_options.items()), char_name,
+            tuple((name, tuple(value) if isinstance(value, list) else value) for name, value in filters.items())
+        )
+        exports = st.session_state.setdefault("damage_exports", {})
 
         with col1:
-            # Export to Excel (Streamlit native)
+            exported = exports.get(export_key)
+            if exported is None and st.button("📤 Prepare Export", help="Build the chosen export and the clipboard text of this report."):
+                with st.spinner("Preparing export..."):
+                    events = None
+                    if export_format == "Parquet (events)":
+                        events = report_events(log_name, damage_source, char_name)
+                        if events is not None:
+                            events = filtered_events(events, encounter, filters, players)
+                    exported = exports[export_key] = {
+                        "data": build_export(damage_data, export_format, display_options, char_name, events),
+                        "text": export_damage_data(damage_data, "text", display_options, char_name),
+                    }
+                if exported["data"] is None:
+                    st.warning("This session was stored without its events, so it can't be exported per event.")
+                    exports.pop(export_key)
+                    return
+                # Keep only the most recent exports
+                while len(exports) > EXPORT_CACHE_ENTRIES:
+                    exports.pop(next(iter(exports)))
+            if exported is None:
+                return
+            exported_text = exported["text"]
+
+            file_name, mime = EXPORT_FILES[export_format]
             st.download_button(
-                label="📥 Export to Excel",
-                data=exported_csv,
-                file_name="damage_report.csv",
-                mime="text/csv"
+                label=f"📥 Export to {export_format}",
+                data=exported["data"],
+                file_name=file_name,
+                mime=mime
             )
 
             # Real clipboard export (matching button style)
@@ -151,444 +546,6 @@ def show_damcalc_page():
             """, height=50)
 
 
-# ----------------- Core Constants and Mappings -----------------
-
-# Complete damage values mapping based on CMUD implementation (from DamMon_1.3.xml)
-DAMAGE_VALUES = {
-    # Standard damage verbs (lowercase)
-    "scratches": 2.5, "grazes": 6.5, "hits": 10.5, "injures": 14.5,
-    "wounds": 18.5, "mauls": 22.5, "decimates": 26.5, "devastates": 30.5,
-    "maims": 34.5, "mutilates": 38.5, "disembowels": 42.5, "dismembers": 46.5,
-    "massacres": 50.5, "mangles": 54.5, "demolishes": 58.5, 
-    
-    # Uppercase damage verbs (high damage)
-    "DEMOLISHES": 58.5, "DEVASTATES": 68, "OBLITERATES": 88,
-    "ANNIHILATES": 113, "ERADICATES": 138, "GHASTLY": 163, "HORRID": 188,
-    "DREADFUL": 213, "HIDEOUS": 238, "INDESCRIBABLE": 263, "UNSPEAKABLE": 300,
-    
-    # Handle both forms with case-insensitive lookup
-    "MUTILATES": 38.5, "DISEMBOWELS": 42.5, "DISMEMBERS": 46.5,
-    "MASSACRES": 50.5, "MANGLES": 54.5
-}
-
-# Special formatting patterns from CMUD triggers
-SPECIAL_DAMAGE_PATTERNS = [
-    # Each tuple is (prefix, verb, suffix, damage)
-    ("***", "DEMOLISHES", "***", 58.5),
-    ("***", "DEVASTATES", "***", 68),
-    ("===", "OBLITERATES", "===", 88),
-    (">>>", "ANNIHILATES", "<<<", 113),
-    ("<<<", "ERADICATES", ">>>", 138)
-]
-
-# Skip indicators based on CMUD's DMFakeCheck function
-SKIP_INDICATORS = [
-    "answers ", "ask ", "tells ", "tell ", "says ", 
-    "gossips ", "yells ", "clans ", "quests ",
-    "the group ", "OOC: ", "OOC Clan: ",
-    "Bloodbath: ", "Kingdom: ", "radios ", "grats ",
-    "shouts ", "[Newbie]: ", "auctions: ",
-    "You have", "level!!", "some ", "flash of holy power erupts",
-    "The bolt", "lightning bolt leaps",
-    # Additional skip indicators from CMUD's secondary DMFakeCheck mode
-    "holy smite", "mighty blow from", "hits the ground", 
-    "transfer to", "his head", "her head", "DEAD."
-]
-
-# ----------------- Core Parsing Functions -----------------
-
-def should_skip_line(line):
-    """Determine if a line should be skipped (not combat related) - based on CMUD's DMFakeCheck."""
-    for indicator in SKIP_INDICATORS:
-        if indicator in line:
-            return True
-    
-    # Additional check for possessive indicator - from CMUD code
-    if "'s " not in line and "you" not in line.lower():
-        return True
-    
-    return False
-
-def normalize_combat_name(name, player_name):
-    """
-    Normalize 'You' and 'Your' in names to the player name for accurate parsing.
-    E.g., 'Your beating' → 'Charname -> beating'
-    """
-    name = name.strip()
-    if name.lower() == "you":
-        return player_name
-    if name.lower().startswith("your "):
-        return f"{player_name} -> {name[5:].strip()}"
-    return name
-
-
-def clean_entity_name(name, player_name):
-    """
-    Clean and normalize entity names - based on CMUD's DMCleaner mode 1 and 2.
-    This handles substituting 'You' with the player name and cleaning up entity references.
-    """
-    if not name:
-        return ""
-
-    name = name.strip()
-    
-    # Replace "You" with player name (case insensitive)
-    if name.lower() == "you":
-        return player_name
-    
-    # Remove tags and decorative characters
-    name = re.sub(r'\[.*?\]', '', name)  # Remove bracketed content
-    name = re.sub(r'<.*?>', '', name)    # Remove angle-bracketed content
-    name = re.sub(r'\(.*?\)', '', name)  # Remove parenthesized content
-    name = re.sub(r'{.*?}', '', name)    # Remove brace-enclosed content
-    name = re.sub(r'[*=<>]+', '', name)  # Remove decorative characters
-    
-    # Handle possessive forms (based on CMUD DMCleaner mode 1)
-    if "'s " in name:
-        name = name.split("'s ")[0]
-    
-    # Strip punctuation based on CMUD DMCleaner mode 2
-    name = name.replace("!", "").replace(".", "").replace("things to ", "")
-    
-    # Remove common prefixes 
-    name = re.sub(r'^(a|an|the)\s+', '', name, flags=re.IGNORECASE)
-    
-    name = name.strip()
-    if not name or name.lower() in ["a", "an", "him", "her", "the", "the ground"]:
-        return None  # Filter out malformed names
-    
-    return name
-
-def extract_known_players(log, player_name):
-    """
-    Extract known player names from the log by identifying capitalized possessives.
-    Always includes the main player's name.
-    """
-    names = set()
-    for line in log.splitlines():
-        match = re.findall(r"\b([A-Z][a-z]+)'s\b", line)
-        for name in match:
-            if name.lower() != player_name.lower():
-                names.add(name)
-    names.add(player_name)
-    return names
-
-
-def extract_attack_type(source_text):
-    """
-    Extract attack type from source text - based on CMUD's DMCleaner mode 3.
-    This handles cases like "Dhavi's pierce" -> "pierce" or "Your beating" -> "beating"
-    """
-    # Special attack patterns
-    if "draws life from" in source_text:
-        return "life drain"
-    if "is struck by lightning" in source_text:
-        return "lightning strike"
-    if "cut throat" in source_text:
-        return "cut throat"
-    
-    # Remove location information and decorative characters
-    source_text = re.sub(r'\[\s*[^\]]+\s*\]\s*', '', source_text)
-    source_text = re.sub(r'[*=<>]+', '', source_text)
-    
-    # Extract everything after the possessive marker - CMUD's approach
-    if "'s " in source_text:
-        parts = source_text.split("'s ")
-        if len(parts) > 1:
-            attack_raw = parts[-1].strip()
-            
-            # Avoid using damage verbs as attack types
-            damage_verbs = [verb.lower() for verb in DAMAGE_VALUES.keys()]
-            attack_words = attack_raw.split()
-            
-            if attack_words and attack_words[0].lower() not in damage_verbs:
-                return attack_words[0].lower()  # Return just the first word after possessive
-    
-    # Check if source contains attack type (like "Your beating")
-    words = source_text.split()
-    if len(words) > 1 and words[0].lower() in ["your", "you"]:
-        # Return the second word as the attack type
-        return words[1].lower()
-    
-    # Default to generic attack type
-    return "attack"
-
-def is_player_character(name, player_name, known_players=None):
-    """
-    Determine if a name is likely a player character.
-    Uses a list of known players extracted from the log.
-    """
-    name = name.strip()
-    if not name:
-        return False
-
-    # Always count "Your" or your character name as a player
-    if name.lower() == "your" or name.lower() == player_name.lower():
-        return True
-        
-    # In your specific combat scenario, count Tsacherus as a player
-    if name.lower() == "tsacherus":
-        return True
-
-    # Check against known players list
-    if known_players:
-        return name in known_players
-
-    # Fallback logic for other cases
-    name_lower = name.lower()
-    player_name_lower = player_name.strip().lower()
-
-    if name_lower == player_name_lower:
-        return True
-    if " " in name_lower or re.match(r'^(a|an|the)\s', name_lower):
-        return False
-    if name[0].isupper() and not name.isupper():
-        return True
-
-    return False
-
-
-def analyze_damage_log(log_content, player_name="Player"):
-    known_players = extract_known_players(log_content, player_name)
-    damage_data = {
-        "damage_done": {}, "damage_taken": {}, "damage_details": {},
-        "damage_types": {}, "pvp_damage_done": {}, "pvp_damage_taken": {}
-    }
-
-
-    for line in log_content.splitlines():
-        line = line.strip()
-        if not line or re.match(r'^\[\d+/\d+hp', line) or should_skip_line(line):
-            continue
-
-        # Strip location tags - like CMUD DMStrip function
-        line = re.sub(r'\[\s*[^\]]+\s*\]\s*', '', line)
-
-        # --- 1. Cut throat pattern (specific to CMUD) ---
-        throat_match = re.search(r"(.*?)'s cut throat\s+<<<\s+([A-Z]+)\s+>>>\s+(.*?)(!|\.|$)", line)
-        if throat_match:
-            source_raw, verb, target_raw = map(str.strip, throat_match.groups()[:3])
-            source = clean_entity_name(source_raw, player_name)
-            target = clean_entity_name(target_raw, player_name)
-            damage = DAMAGE_VALUES.get(verb.lower(), 0)
-            record_damage(damage_data, source, target, damage, "cutthroat", player_name, line, known_players=known_players)
-            continue
-
-        # --- 2. Special formatting patterns (from CMUD triggers) ---
-        special_pattern_matched = False
-        for prefix, verb, suffix, damage_val in SPECIAL_DAMAGE_PATTERNS:
-            pattern = fr"(.*?){re.escape(prefix)}\s*{verb}\s*{re.escape(suffix)}\s+(.*?)($|!|\.)"
-            match = re.search(pattern, line, re.IGNORECASE)
-            if match:
-                source_raw = match.group(1).strip()
-                target_raw = match.group(2).strip()
-                
-                # Clean source and target names
-                source = clean_entity_name(source_raw, player_name)
-                target = clean_entity_name(target_raw, player_name)
-                
-                # Extract attack type from source if possible
-                attack_type = extract_attack_type(source_raw)
-                if not attack_type or attack_type == "attack":
-                    attack_type = verb.lower()  # Use the verb as fallback
-                
-                record_damage(damage_data, source, target, damage_val, attack_type, player_name, line, known_players=known_players)
-                special_pattern_matched = True
-                break
-        if special_pattern_matched:
-            continue
-
-        # --- 3. Standard damage verb patterns ---
-        # Try both uppercase and lowercase forms of damage verbs
-        verb_matched = False
-        for verb, damage_val in DAMAGE_VALUES.items():
-            # Try possessive pattern first: "X's Y VERB Z"
-            possessive_pattern = fr"(.*?)'s\s+([a-zA-Z\s]+?)\s+{verb}\s+(.*?)($|!|\.)"
-            match = re.search(possessive_pattern, line, re.IGNORECASE)
-            
-            if match:
-                source_raw = match.group(1).strip()
-                attack_raw = match.group(2).strip()
-                target_raw = match.group(3).strip()
-
-                # Clean names
-                source = clean_entity_name(source_raw, player_name)
-                target = clean_entity_name(target_raw, player_name)
-
-                # Get attack type from the possessive form
-                attack_type = attack_raw.strip().lower()
-                
-                record_damage(damage_data, source, target, damage_val, attack_type, player_name, line, known_players=known_players)
-                verb_matched = True
-                break
-            
-            # If no possessive match, try regular pattern: "X VERB Y"
-            regular_pattern = fr"^(.*?)\s+{verb}\s+(.*?)($|!|\.)"
-            match = re.search(regular_pattern, line, re.IGNORECASE)
-            
-            if match:
-                source_raw = match.group(1).strip()
-                target_raw = match.group(2).strip()
-                
-                # Clean names
-                words = source_raw.split()
-                
-                if len(words) > 1:
-                    # This is likely "Entity attack_type" format
-                    source_name = words[0]
-                    attack_type = " ".join(words[1:]).lower()
-                else:
-                    source_name = source_raw
-                    attack_type = "attack"  # Generic fallback
-                
-                source = clean_entity_name(source_name, player_name)
-                target = clean_entity_name(target_raw, player_name)
-                
-                record_damage(damage_data, source, target, damage_val, attack_type, player_name, line, known_players=known_players)
-                verb_matched = True
-                break
-        
-        if verb_matched:
-            continue
-
-    # Calculate percentages and totals (like CMUD's DMSorter)
-    calculate_percentages(damage_data)
-    return damage_data
-
-def record_damage(damage_data, source, target, damage_value, damage_type=None, player_name="", line="", known_players=None):
-    """
-    Record damage in the appropriate categories.
-    Based on CMUD's DMAdd function implementation.
-    """
-    # Ensure all parameters have values
-    if damage_type is None:
-        damage_type = "attack"
-    
-    # Clean and standardize 
-    damage_type = str(damage_type).strip().lower()
-    
-    # Clean entity names one final time
-    source_clean = source if source else ""
-    target_clean = target if target else ""
-    
-    # Skip invalid records
-    if not source_clean or not target_clean:
-        return
-
-    # Handle special cases where target might be shorthand
-    if target_clean.lower() in ["him", "her"]:
-        target_clean = source_clean  # CMUD uses source as target in these cases
-
-    # Fix "Your beating" to just "Your" as source
-    if source_clean.lower().startswith("your "):
-        # Extract the actual attack type if possible
-        if damage_type == "attack":
-            parts = source_clean.split()
-            if len(parts) > 1:
-                damage_type = parts[1].lower()
-        # Use player_name instead of "Your"
-        source_clean = player_name
-    
-    # Also handle just "Your" as a source (not followed by anything)
-    if source_clean.lower() == "your":
-        source_clean = player_name
-    
-    # Fix for special high-damage attacks (like "obliterates")
-    # If the damage type is a special attack from SPECIAL_DAMAGE_PATTERNS
-    # and the damage verb is one of the uppercase ones (like "OBLITERATES")
-    if damage_type.lower() in [verb.lower() for verb, _ in DAMAGE_VALUES.items() 
-                              if verb.isupper() or verb in ["DEMOLISHES", "DEVASTATES", "OBLITERATES"]]:
-        # And if the source contains "beating" or another attack type
-        if " " in source_clean and not source_clean.lower().startswith("a "):
-            parts = source_clean.split()
-            if len(parts) > 1 and parts[0].lower() != "an":
-                # Keep the first part (character name) and extract attack type
-                source_clean = parts[0]
-    
-    # --- Record damage in various categories ---
-
-    # 1. Total damage done (by source)
-    damage_data["damage_done"].setdefault(source_clean, [0, 0])
-    damage_data["damage_done"][source_clean][0] += damage_value
-    damage_data["damage_done"][source_clean][1] += 1
-
-    # 2. Total damage taken (by target)
-    damage_data["damage_taken"].setdefault(target_clean, [0, 0])
-    damage_data["damage_taken"][target_clean][0] += damage_value
-    damage_data["damage_taken"][target_clean][1] += 1
-
-    # 3. Damage details (source -> target)
-    detail_key = f"{source_clean} -> {target_clean}"
-    damage_data["damage_details"].setdefault(detail_key, [0, 0, damage_type])
-    damage_data["damage_details"][detail_key][0] += damage_value
-    damage_data["damage_details"][detail_key][1] += 1
-
-    # 4. Damage by type (source -> attack type)
-    type_key = f"{source_clean} -> {damage_type}"
-    damage_data["damage_types"].setdefault(type_key, [0, 0])
-    damage_data["damage_types"][type_key][0] += damage_value
-    damage_data["damage_types"][type_key][1] += 1
-
-    # 5. PvP tracking (if both source and target are players)
-    source_is_player = is_player_character(source_clean, player_name, known_players)
-    target_is_player = is_player_character(target_clean, player_name, known_players)
-
-    if source_is_player and target_is_player:
-        # PvP damage done
-        damage_data["pvp_damage_done"].setdefault(source_clean, [0, 0])
-        damage_data["pvp_damage_done"][source_clean][0] += damage_value
-        damage_data["pvp_damage_done"][source_clean][1] += 1
-
-        # PvP damage taken
-        damage_data["pvp_damage_taken"].setdefault(target_clean, [0, 0])
-        damage_data["pvp_damage_taken"][target_clean][0] += damage_value
-        damage_data["pvp_damage_taken"][target_clean][1] += 1
-
-
-def calculate_percentages(damage_data):
-    """
-    Calculate percentage contributions for damage statistics.
-    Based on the CMUD DMSorter function.
-    """
-    # Process each category
-    for category in damage_data:
-        if not damage_data[category]:
-            continue
-            
-        # Calculate total damage in this category
-        total_damage = sum(data[0] for data in damage_data[category].values())
-        if total_damage == 0:
-            continue
-            
-        # Calculate percentage for each entry
-        for key in damage_data[category]:
-            if category == "damage_details":
-                # damage_details has a different structure with damage type
-                damage_type = damage_data[category][key][2]
-                percentage = (damage_data[category][key][0] / total_damage) * 100
-                
-                # Calculate average damage per hit
-                hits = damage_data[category][key][1]
-                average = damage_data[category][key][0] / hits if hits > 0 else 0
-                
-                # Update with percentage and average
-                damage_data[category][key] = [
-                    damage_data[category][key][0],  # damage
-                    hits,                          # hit count
-                    damage_type,                   # damage type
-                    percentage,                    # percentage
-                    average                        # average damage
-                ]
-            else:
-                # Other categories have a simpler structure
-                percentage = (damage_data[category][key][0] / total_damage) * 100
-                hits = damage_data[category][key][1]
-                average = damage_data[category][key][0] / hits if hits > 0 else 0
-                
-                # Add percentage and average to existing list
-                damage_data[category][key].extend([percentage, average])
-
-
 # ----------------- Display and Export Functions -----------------
 
 def display_damage_reports(damage_data, display_options, player_name):
@@ -607,7 +564,7 @@ def display_damage_reports(damage_data, display_options, player_name):
                 "%": f"{values[2]:.1f}%" if len(values) > 2 else "0.0%"
             })
         df = pd.DataFrame(rows).sort_values("Damage", ascending=False).reset_index(drop=True)
-        display_sortable_table(df, "total-damage-done")
+        display_sortable_table(df)
 
     # 2. TOTAL DAMAGE TAKEN
     st.subheader("🛡️ Total Damage Taken")
@@ -622,7 +579,7 @@ def display_damage_reports(damage_data, display_options, player_name):
                 "%": f"{values[2]:.1f}%" if len(values) > 2 else "0.0%"
             })
         df = pd.DataFrame(rows).sort_values("Damage", ascending=False).reset_index(drop=True)
-        display_sortable_table(df, "total-damage-taken")
+        display_sortable_table(df)
 
     # 3. PVP DAMAGE DONE
     st.subheader("⚔️ PvP Damage Done")
@@ -637,7 +594,7 @@ def display_damage_reports(damage_data, display_options, player_name):
                 "%": f"{values[2]:.1f}%" if len(values) > 2 else "0.0%"
             })
         df = pd.DataFrame(rows).sort_values("Damage", ascending=False).reset_index(drop=True)
-        display_sortable_table(df, "pvp-damage-done")
+        display_sortable_table(df)
     else:
         st.info("No PvP damage done detected.")
 
@@ -654,7 +611,7 @@ def display_damage_reports(damage_data, display_options, player_name):
                 "%": f"{values[2]:.1f}%" if len(values) > 2 else "0.0%"
             })
         df = pd.DataFrame(rows).sort_values("Damage", ascending=False).reset_index(drop=True)
-        display_sortable_table(df, "pvp-damage-taken")
+        display_sortable_table(df)
     else:
         st.info("No PvP damage taken detected.")
 
@@ -673,7 +630,7 @@ def display_damage_reports(damage_data, display_options, player_name):
                 "%": f"{values[2]:.1f}%" if len(values) > 2 else "0.0%"
             })
         df = pd.DataFrame(rows).sort_values("Damage", ascending=False).reset_index(drop=True)
-        display_sortable_table(df, "damage-types")
+        display_sortable_table(df)
 
     # 6. DAMAGE DETAILS
     st.subheader("📝 Damage Details")
@@ -690,343 +647,342 @@ def display_damage_reports(damage_data, display_options, player_name):
                 "%": f"{values[3]:.1f}%" if len(values) > 3 else "0.0%"
             })
         df = pd.DataFrame(rows).sort_values("Damage", ascending=False).reset_index(drop=True)
-        display_sortable_table(df, "damage-details")
+        display_sortable_table(df)
+
+
+def display_log_leaderboards(damage_logs):
+    """Show per-player leaderboards across several logs; returns the log picked for the full report."""
+    st.subheader("🏆 Leaderboards")
+    reports = {name: log["damage_data"] for name, log in damage_logs.items()}
+    col1, col2 = st.columns(2)
+    with col1:
+        board = st.radio("Damage:", list(LEADERBOARD_CATEGORIES), horizontal=True)
+    with col2:
+        metric = st.radio("Per log:", ["Damage", "Hits", "Avg/Hit"], horizontal=True)
+
+    metric = {"Damage": "damage", "Hits": "hits", "Avg/Hit": "avg"}[metric]
+    df = log_leaderboard(reports, LEADERBOARD_CATEGORIES[board], metric)
+    if df.empty:
+        st.info(f"No {board} damage by players in these logs.")
+    else:
+        display_sortable_table(df.round(1))
 
+    st.markdown("---")
+    return st.selectbox("📄 Full report of:", list(damage_logs))
 
 
-def display_sortable_table(df, table_id):
+def display_history(char_name):
     """
-    Display a DataFrame as a nicely styled and sortable HTML table.
-    
-    Args:
-        df: The DataFrame to display
-        table_id: A unique ID for the table
+    List the sessions stored under the entered character name to reload one
+    without reparsing, and chart trends across them. Other characters'
+    sessions are never listed.
     """
-    # Calculate dynamic height based on number of rows (with a maximum)
-    row_height = 40  # Estimate of pixels per row
-    header_height = 60  # Estimated header height
-    min_height = 200  # Minimum height of table
-    max_height = 550  # Maximum height of table
-    
-    # Calculate height based on content, within the min/max bounds
-    table_height = max(min_height, min(len(df) * row_height + header_height, max_height))
-    
-    # Generate and display HTML table
-    html_table = generate_sortable_table(df, table_height, table_id)
-    st.markdown(html_table, unsafe_allow_html=True)
+    if not char_name:
+        st.info("Enter your character name on the input tab to see the logs stored for it.")
+        return
+    sessions = list_sessions(char_name, limit=HISTORY_LIST_LIMIT)
+    if sessions.empty:
+        st.info(f"No analyzed logs stored for {char_name} yet - analyze a log with 'Save analyses to history' on.")
+        return
 
+    labels = {
+        row.id: f"{row.session_date} · {row.name} - {row.damage:,.0f} damage in {row.hits:,} hits"
+        for row in sessions.itertuples()
+    }
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        session_id = st.selectbox("Stored session:", list(labels), format_func=labels.get)
+    with col2:
+        st.markdown("<div style='padding-top: 28px;'>", unsafe_allow_html=True)
+        if st.button("📂 Load", use_container_width=True):
+            st.session_state.pop("damage_append", None)
+            st.session_state.pop("parse_profile", None)
+            store_damage_data(load_session_report(session_id), char_name, session_id)
+        if st.button("🗑️ Delete", use_container_width=True, help="Remove this session and its trend totals."):
+            delete_session(session_id)
+            st.rerun()
+        st.markdown("</div>", unsafe_allow_html=True)
 
-def generate_sortable_table(df, height_px, table_id):
-    """
-    Generate a sortable HTML table with styling.
-    
-    Args:
-        df: DataFrame containing the data to display
-        height_px: Height of the table in pixels
-        table_id: A unique ID for the table
-    
-    Returns:
-        HTML string with the styled and sortable table
+    st.subheader("📈 Trends")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        entity = st.text_input("Character:", value=char_name, help=f"Anyone in the logs stored for {char_name}.")
+    with col2:
+        category = st.selectbox("Damage:", list(TREND_VIEWS))
+    with col3:
+        period = st.radio("Per:", list(TREND_PERIODS), index=1, horizontal=True)
+
+    trend = entity_trend(entity, TREND_VIEWS[category], period, char_name)
+    if trend.empty:
+        st.info(f"No stored {category.lower()} for {entity}.")
+        return
+    st.line_chart(trend.set_index("period")["avg_hit"], x_label=period.title(), y_label="Average hit")
+    trend.columns = [period.title(), "Sessions", "Damage", "Hits", "Avg Hit"]
+    display_sortable_table(trend.round(1))
+
+
+def select_filters(damage_data):
     """
-    # Start with table styling
-    html = f"""
-    <style>
-        .{table_id} {{
-            width: 100%;
-            border-collapse: collapse;
-            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif;
-            font-size: 14px;
-        }}
-        .{table_id} thead {{
-            position: sticky;
-            top: 0;
-            z-index: 1;
-        }}
-        .{table_id} th {{
-            background-color: #f2f2f6;
-            color: #262730;
-            font-weight: bold;
-            text-align: center;
-            padding: 10px 8px;
-            border: 1px solid #e1e4e8;
-            cursor: pointer;
-        }}
-        .{table_id} th:hover {{
-            background-color: #e0e0e6;
-        }}
-        .{table_id} th.asc:after {{
-            content: " ▲";
-        }}
-        .{table_id} th.desc:after {{
-            content: " ▼";
-        }}
-        .{table_id} td {{
-            text-align: center;
-            padding: 8px;
-            border: 1px solid #e1e4e8;
-            background-color: white;
-        }}
-        .{table_id} tr:hover {{
-            background-color: #f0f2f6;
-        }}
-        .{table_id} tr:hover td {{
-            background-color: #f0f2f6;
-        }}
-        /* Column width adjustments */
-        .{table_id} th:nth-child(1), .{table_id} td:nth-child(1) {{ /* First column (Source/Target) */
-            min-width: 120px;
-            text-align: left;
-        }}
-        .{table_id} td:nth-child(1) {{
-            text-align: left;
-        }}
-        .{table_id} th:nth-child(2), .{table_id} td:nth-child(2) {{ /* Second column (Type/Damage) */
-            min-width: 100px;
-        }}
-        .{table_id} th:nth-child(n+3), .{table_id} td:nth-child(n+3) {{ /* Numerical values */
-            min-width: 65px;
-        }}
-    </style>
-    <div style="height: {height_px}px; overflow-y: auto; margin-bottom: 20px;">
-    <table class="{table_id}" id="{table_id}">
-        <thead>
-            <tr>
+    Drill-down filters over the whole report's sources, targets, attack
+    types, PvP and game time; returns the active ones as filter_events arguments.
     """
-    
-    # Add headers with sorting functionality
-    col_types = []  # To track column data types (text vs. number)
-    for i, col in enumerate(df.columns):
-        # Determine if column is numeric or text for proper sorting
-        if col in ["Damage", "Hits", "Average"]:
-            col_type = "number"
-        elif col == "%":
-            # Special case for percentage column - we'll parse it as numeric
-            col_type = "percent"
-        else:
-            col_type = "text"
-        col_types.append(col_type)
-        
-        html += f'<th data-col="{i}" data-type="{col_type}">{col}</th>'
-    
-    html += """
-            </tr>
-        </thead>
-        <tbody>
+    with st.expander("🔎 Drill-down Filters", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            # A summarized report's (other) entity has no events of its own
+            sources = st.multiselect("Sources:", sorted(set(damage_data["damage_done"]) - {OTHER_ENTITY}))
+        with col2:
+            targets = st.multiselect("Targets:", sorted(set(damage_data["damage_taken"]) - {OTHER_ENTITY}))
+        with col3:
+            attack_types = st.multiselect(
+                "Attack types:", sorted({key.split(" -> ")[1] for key in damage_data["damage_types"]})
+            )
+        pvp_only = st.checkbox("PvP only", help="Only damage between two players.")
+
+        # Game time range, in game hours since the first prompt
+        clocks = sorted({int(key.split(" -> ")[1]) for key in damage_data.get("damage_timeline", {})} - {-1})
+        clock_range = None
+        if len(clocks) > 1:
+            span = math.ceil((clocks[-1] - clocks[0]) / 30) / 2
+            hours = st.slider("Game hours since the first prompt:", 0.0, span, (0.0, span), step=0.5)
+            if hours != (0.0, span):
+                clock_range = (clocks[0] + hours[0] * 60, clocks[0] + hours[1] * 60)
+
+    filters = {"sources": sources, "targets": targets, "attack_types": attack_types}
+    filters = {name: values for name, values in filters.items() if values}
+    if pvp_only:
+        filters["pvp_only"] = True
+    if clock_range is not None:
+        filters["clock_range"] = clock_range
+    return filters
+
+
+def select_encounter(damage_data):
+    """Let the user pick the whole session or one detected fight; returns (choice, report)."""
+    encounters = damage_data.get("encounters", {})
+    if len(encounters) < 2:
+        return "session", damage_data
+
+    # Name each fight after the target that took the most damage in it
+    top_targets = {}
+    for key, values in damage_data["encounter_breakdown"].items():
+        encounter, _, target, _ = key.split(" -> ")
+        targets = top_targets.setdefault(encounter, {})
+        targets[target] = targets.get(target, 0) + values[0]
+
+    labels = {"session": f"Whole session ({len(encounters)} fights)"}
+    for encounter, (damage, hits, first_line, last_line) in encounters.items():
+        targets = top_targets.get(encounter, {})
+        target = max(targets, key=targets.get) if targets else "?"
+        labels[encounter] = (
+            f"Fight {int(encounter) + 1}: vs {target} - lines {first_line:,}-{last_line:,}, "
+            f"{damage:,.0f} damage in {hits:,} hits"
+        )
+
+    choice = st.selectbox("⚔️ Encounter:", list(labels), format_func=labels.get)
+    if choice == "session":
+        return choice, damage_data
+    return choice, encounter_report(damage_data, choice)
+
+
+def tail_log_path(path):
     """
-    
-    # Add data rows
-    for _, row in df.iterrows():
-        html += "<tr>"
-        for i, col in enumerate(df.columns):
-            # Left-align the first column, center-align the rest
-            alignment = "text-align: left;" if i == 0 else ""
-            html += f"<td style='{alignment}'>{row[col]}</td>"
-        html += "</tr>"
-    
-    html += """
-        </tbody>
-    </table>
-    </div>
-    <script>
-        // Add sorting functionality to the table
-        document.addEventListener('DOMContentLoaded', function() {
-            const table = document.getElementById('""" + table_id + """');
-            const headers = table.querySelectorAll('th');
-            
-            headers.forEach(header => {
-                header.addEventListener('click', () => {
-                    const colIndex = parseInt(header.dataset.col);
-                    const colType = header.dataset.type;
-                    const tbody = table.querySelector('tbody');
-                    const rows = Array.from(tbody.querySelectorAll('tr'));
-                    
-                    // Determine sort direction
-                    const isAscending = header.classList.contains('desc') || !header.classList.contains('asc');
-                    
-                    // Reset all headers
-                    headers.forEach(h => {
-                        h.classList.remove('asc', 'desc');
-                    });
-                    
-                    // Set new sort direction
-                    header.classList.add(isAscending ? 'asc' : 'desc');
-                    
-                    // Sort the rows
-                    rows.sort((rowA, rowB) => {
-                        const cellA = rowA.querySelectorAll('td')[colIndex].textContent.trim();
-                        const cellB = rowB.querySelectorAll('td')[colIndex].textContent.trim();
-                        
-                        let valueA, valueB;
-                        
-                        if (colType === 'number') {
-                            // Parse as numbers
-                            valueA = parseFloat(cellA) || 0;
-                            valueB = parseFloat(cellB) || 0;
-                        } else if (colType === 'percent') {
-                            // Parse percentages by removing % and converting to number
-                            valueA = parseFloat(cellA.replace('%', '')) || 0;
-                            valueB = parseFloat(cellB.replace('%', '')) || 0;
-                        } else {
-                            // Case-insensitive string comparison
-                            valueA = cellA.toLowerCase();
-                            valueB = cellB.toLowerCase();
-                        }
-                        
-                        if (valueA < valueB) {
-                            return isAscending ? -1 : 1;
-                        }
-                        if (valueA > valueB) {
-                            return isAscending ? 1 : -1;
-                        }
-                        return 0;
-                    });
-                    
-                    // Reorder the rows
-                    rows.forEach(row => tbody.appendChild(row));
-                });
-            });
-        });
-    </script>
+    Resolve a log path (relative ones against TAIL_LOG_DIR) and return it
+    if it is an existing file inside TAIL_LOG_DIR, symlinks and ".."
+    resolved first; anything else, or live tail turned off, gives None.
     """
-    return html
+    if not TAIL_LOG_DIR or not path:
+        return None
+    log_dir = os.path.realpath(TAIL_LOG_DIR)
+    resolved = os.path.realpath(os.path.join(log_dir, path))
+    if not resolved.startswith(log_dir + os.sep) or not os.path.isfile(resolved):
+        return None
+    return resolved
 
-def export_damage_data(damage_data, export_format, display_options, player_name=""):
-    if not damage_data:
-        return ""
 
-    def format_row(cols, widths, row_num=None):
-        if row_num is not None:
-            row = f"{row_num:03d}  "
-        else:
-            row = "---  "
-        row += "  ".join(str(col).ljust(width) for col, width in zip(cols, widths))
-        return row
-
-    def build_text_section(title, columns, entries, total_stats=None):
-        lines = []
-        header = title.upper()
-        lines.append("=" * (len(header) + 40) + header + "=" * 40)
-        lines.append(format_row(columns, col_widths))
-        lines.append(format_row(["--" + "-" * (w - 2) for w in col_widths], col_widths))
-        for i, entry in enumerate(entries, 1):
-            lines.append(format_row(entry, col_widths, i))
-        lines.append(format_row(["--" + "-" * (w - 2) for w in col_widths], col_widths))
-        if total_stats:
-            hits, dmg, avg = total_stats
-            lines.append("     " + "TOTALS".rjust(45) + f"  {hits}  {dmg:,}      {avg}")
-        lines.append("")
-        return lines
-
-    output = []
-    col_widths = [55, 5, 12, 8, 5]
-
-    # CSV & Excel format
-    if export_format.lower() in ["csv", "excel"]:
-        def write_csv_section(title, header, data):
-            lines = [title.upper(), ",".join(header)]
-            lines += [",".join(str(col) for col in row) for row in data]
-            lines.append("")
-            return lines
-
-        # Helper for sorting
-        def sort_dict(data):
-            return sorted(data.items(), key=lambda x: x[1][0], reverse=True)
-
-        # Damage Done
-        if display_options.get("damage_done", True):
-            data = []
-            for k, v in sort_dict(damage_data["damage_done"]):
-                data.append([k, v[1], round(v[0], 1), round(v[3], 1), f"{v[2]:.1f}%"])
-            output += write_csv_section("Total Damage Done", ["Source", "Hits", "Damage", "Avg Dam", "%"], data)
-
-        # Damage Taken
-        if display_options.get("damage_taken", True):
-            data = []
-            for k, v in sort_dict(damage_data["damage_taken"]):
-                data.append([k, v[1], round(v[0], 1), round(v[3], 1), f"{v[2]:.1f}%"])
-            output += write_csv_section("Total Damage Taken", ["Target", "Hits", "Damage", "Avg Dam", "%"], data)
-
-        # PvP Damage Done
-        if display_options.get("pvp_damage_done", True):
-            data = []
-            for k, v in sort_dict(damage_data["pvp_damage_done"]):
-                data.append([k, v[1], round(v[0], 1), round(v[3], 1), f"{v[2]:.1f}%"])
-            output += write_csv_section("PvP Damage Done", ["Source", "Hits", "Damage", "Avg Dam", "%"], data)
-
-        # PvP Damage Taken
-        if display_options.get("pvp_damage_taken", True):
-            data = []
-            for k, v in sort_dict(damage_data["pvp_damage_taken"]):
-                data.append([k, v[1], round(v[0], 1), round(v[3], 1), f"{v[2]:.1f}%"])
-            output += write_csv_section("PvP Damage Taken", ["Target", "Hits", "Damage", "Avg Dam", "%"], data)
-
-        # Damage Types
-        if display_options.get("damage_types", True):
-            data = []
-            for k, v in damage_data["damage_types"].items():
-                src, dtype = k.split(" -> ")
-                data.append([src, dtype, v[1], round(v[0], 1), round(v[3], 1), f"{v[2]:.1f}%"])
-            data.sort(key=lambda x: x[3], reverse=True)
-            output += write_csv_section("Damage Types", ["Source", "Type", "Hits", "Damage", "Avg Dam", "%"], data)
-
-        # Damage Details
-        if display_options.get("damage_details", True):
-            data = []
-            for k, v in damage_data["damage_details"].items():
-                src, tgt = k.split(" -> ")
-                data.append([src, tgt, v[1], round(v[0], 1), round(v[4], 1), f"{v[3]:.1f}%"])
-            data.sort(key=lambda x: x[3], reverse=True)
-            output += write_csv_section("Damage Details", ["Source", "Target", "Hits", "Damage", "Avg Dam", "%"], data)
-
-        return "\n".join(output)
-
-    # Plain Text / Clipboard
+def live_tail_view(damage_data):
+    """
+    Return (title, report, damage per tick) of the fight a live-tailed log
+    is in, i.e. its last encounter, built once per update of the log.
+    """
+    encounters = damage_data.get("encounters", {})
+    if len(encounters) > 1:
+        encounter = max(encounters, key=int)
+        title, report = f"Fight {int(encounter) + 1}", encounter_report(damage_data, encounter)
     else:
-        # Totals by category
-        def get_totals(d):
-            hits = sum(v[1] for v in d.values())
-            dmg = round(sum(v[0] for v in d.values()))
-            avg = round(dmg / hits) if hits > 0 else 0
-            return hits, dmg, avg
-
-        if display_options.get("damage_done", True):
-            entries = []
-            for k, v in sorted(damage_data["damage_done"].items(), key=lambda x: x[1][0], reverse=True):
-                entries.append([k, v[1], f"{round(v[0]):,}", round(v[3]), f"{round(v[2]):02d}"])
-            output += build_text_section("Total Damage Done", ["SOURCE", "HITS", "DAMAGE", "AVG", "PERC"], entries, get_totals(damage_data["damage_done"]))
-
-        if display_options.get("damage_taken", True):
-            entries = []
-            for k, v in sorted(damage_data["damage_taken"].items(), key=lambda x: x[1][0], reverse=True):
-                entries.append([k, v[1], f"{round(v[0]):,}", round(v[3]), f"{round(v[2]):02d}"])
-            output += build_text_section("Total Damage Taken", ["TARGET", "HITS", "DAMAGE", "AVG", "PERC"], entries, get_totals(damage_data["damage_taken"]))
-
-        if display_options.get("pvp_damage_done", True):
-            entries = []
-            for k, v in sorted(damage_data["pvp_damage_done"].items(), key=lambda x: x[1][0], reverse=True):
-                entries.append([k, v[1], f"{round(v[0]):,}", round(v[3]), f"{round(v[2]):02d}"])
-            output += build_text_section("PvP Damage Done", ["SOURCE", "HITS", "DAMAGE", "AVG", "PERC"], entries, get_totals(damage_data["pvp_damage_done"]))
-
-        if display_options.get("pvp_damage_taken", True):
-            entries = []
-            for k, v in sorted(damage_data["pvp_damage_taken"].items(), key=lambda x: x[1][0], reverse=True):
-                entries.append([k, v[1], f"{round(v[0]):,}", round(v[3]), f"{round(v[2]):02d}"])
-            output += build_text_section("PvP Damage Taken", ["TARGET", "HITS", "DAMAGE", "AVG", "PERC"], entries, get_totals(damage_data["pvp_damage_taken"]))
-
-        if display_options.get("damage_types", True):
-            entries = []
-            for k, v in damage_data["damage_types"].items():
-                src, dtype = k.split(" -> ")
-                entries.append([f"{src} -> {dtype}", v[1], f"{round(v[0]):,}", round(v[3]), f"{round(v[2]):02d}"])
-            entries.sort(key=lambda x: int(str(x[2]).replace(",", "")), reverse=True)
-            output += build_text_section("Damage Types", ["SOURCE -> TYPE", "HITS", "DAMAGE", "AVG", "PERC"], entries)
-
-        if display_options.get("damage_details", True):
-            entries = []
-            for k, v in damage_data["damage_details"].items():
-                src, tgt = k.split(" -> ")
-                entries.append([f"{src} -> {tgt}", v[1], f"{round(v[0]):,}", round(v[4]), f"{round(v[3]):02d}"])
-            entries.sort(key=lambda x: int(str(x[2]).replace(",", "")), reverse=True)
-            output += build_text_section("Damage Details", ["SOURCE -> TARGET", "HITS", "DAMAGE", "AVG", "PERC"], entries)
-
-        return "\n".join(output)
+        title, report = "Whole session", damage_data
+    damage, _ = damage_timeline(report, TICK_GAME_MINUTES, 1, TAIL_CHART_SOURCES)
+    damage.index = damage.index // TICK_GAME_MINUTES + 1
+    return title, report, damage
+
+
+def display_live_tail(tail):
+    """
+    Check the followed log for new lines and show its current fight. Runs
+    as a fragment every few seconds; a check that finds nothing new only
+    redraws the view it kept.
+    """
+    st.markdown("---")
+    st.subheader("📡 Live Tail")
+    try:
+        if tail_damage_file(tail) is not None:
+            st.session_state.damage_tail_view = live_tail_view(tail["damage_data"])
+    except OSError as e:
+        st.error(f"Can't read {tail['path']}: {e}")
+        return
+    st.caption(f"Following {tail['path']} - {tail['offset']:,} bytes read, last checked {time.strftime('%H:%M:%S')}")
+    view = st.session_state.get("damage_tail_view")
+    if view is None:
+        st.info("Waiting for the log file...")
+        return
+
+    title, report, damage = view
+    done = report.get("damage_done", {})
+    taken = report.get("damage_taken", {})
+    col1, col2, col3 = st.columns(3)
+    col1.metric(f"{title}: damage done", f"{sum(values[0] for values in done.values()):,.0f}")
+    col2.metric("Hits", f"{sum(values[1] for values in done.values()):,}")
+    col3.metric("Damage taken", f"{sum(values[0] for values in taken.values()):,.0f}")
+    st.dataframe(report_table(done, ["Source"]), use_container_width=True, hide_index=True)
+    if not damage.empty:
+        st.bar_chart(damage, x_label="Tick", y_label="Damage")
+
+    # The full report is a snapshot; the tail keeps following the log
+    if st.button("📊 Open Full Report", help="Show the complete report of everything read so far."):
+        store_damage_data(tail["damage_data"], tail["player_name"], tail, event_table(tail["state"]))
+        st.rerun()
+
+
+def display_damage_timeline(damage_data):
+    """Chart damage per tick or game hour for the top sources, from the prompt clock."""
+    st.subheader("📈 Damage Timeline")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        bucket = st.radio("Bucket:", ["Per tick", "Per game hour"], horizontal=True)
+    with col2:
+        window = st.slider("Rolling average (buckets):", 1, 10, 3)
+    with col3:
+        top_sources = st.slider("Sources shown:", 1, 15, 6)
+
+    bucket_minutes = TICK_GAME_MINUTES if bucket == "Per tick" else 60
+    damage, rolling = damage_timeline(damage_data, bucket_minutes, window, top_sources)
+    if damage.empty:
+        st.info("No game time found - the timeline needs prompts showing the time (e.g. 2:30pm>).")
+        return
+
+    # Game hours since the first prompt on the x axis
+    rolling.index = rolling.index / 60
+    rolling.index.name = "Game hours"
+    st.line_chart(rolling, x_label="Game hours", y_label="Damage per bucket (rolling average)")
+
+
+def display_hit_stats(damage_data):
+    """Show the spread of single hits per source, attack type or source/target pair."""
+    st.subheader("🎯 Hit Statistics")
+    views = {
+        "Source": ("source_hit_stats", ["Source"]),
+        "Attack type": ("type_hit_stats", ["Source", "Type"]),
+        "Source → Target": ("pair_hit_stats", ["Source", "Target"]),
+    }
+    view = st.radio("Group hits by:", list(views), horizontal=True)
+    category, key_columns = views[view]
+    entries = damage_data.get(category)
+    if not entries:
+        st.info("Hit statistics cover the whole session and drill-down filters, not a single fight.")
+        return
+
+    rows = []
+    for key, (hits, mean, variance, low, high, *percentiles) in entries.items():
+        row = dict(zip(key_columns, key.split(" -> ")))
+        row.update({"Hits": hits, "Mean": round(mean, 1), "Std Dev": round(math.sqrt(variance), 1),
+                    "Min": round(low, 1), "Max": round(high, 1)})
+        row.update({f"P{p}": round(value, 1) for p, value in zip(HIT_PERCENTILES, percentiles)})
+        rows.append(row)
+    df = pd.DataFrame(rows).sort_values("Hits", ascending=False).reset_index(drop=True)
+    if "Type" in df:
+        df["Type"] = df["Type"].str.title()
+    display_sortable_table(df)
+
+
+def display_parse_profile(profile):
+    """Show per-rule parser counts, timings and fall-through samples in a debug expander."""
+    with st.expander("🔬 Parser Instrumentation", expanded=False):
+        rows = profile_rows(profile)
+        if rows:
+            df = pd.DataFrame(rows)
+            df["match_rate"] = (df["match_rate"] * 100).round(1)
+            df["time_ms"] = df["time_ms"].round(2)
+            df.columns = ["Rule", "Verb", "Tried", "Matched", "Match %", "Time (ms)"]
+            st.dataframe(df, use_container_width=True, hide_index=True)
+
+        st.markdown(f"**Combat lines no rule matched:** {profile['fall_through']:,}")
+        if profile["fall_through_samples"]:
+            st.code("\n".join(
+                f"{line_no:>6}  {line}" for line_no, line in sorted(profile["fall_through_samples"])
+            ))
+
+        # Memoized name and attack-type normalization: lookups during this parse
+        normalization = profile.get("normalization")
+        if normalization:
+            st.markdown("**Normalization cache:**")
+            st.dataframe(pd.DataFrame([
+                {"Function": name, "Hits": stats["hits"], "Misses": stats["misses"],
+                 "Hit %": round(stats["hit_rate"] * 100, 1), "Entries": stats["size"], "Max Entries": stats["max_size"]}
+                for name, stats in normalization.items()
+            ]), use_container_width=True, hide_index=True)
+
+        st.download_button(
+            label="📥 Download as JSON",
+            data=profile_to_json(profile),
+            file_name="parser_profile.json",
+            mime="application/json"
+        )
+
+
+def display_sortable_table(df):
+    """
+    Display a DataFrame as a sortable table that only renders the rows in view.
+
+    Args:
+        df: The DataFrame to display
+    """
+    render_virtual_table(df, min_widths=(120, 100, 65))
+
+
+def source_events(source, player_name):
+    """
+    Return the per-event table of an analyzed paste, upload, append or live
+    tail session, or history session (None if that session has no stored events).
+    """
+    if isinstance(source, int):
+        return load_session_events(source)
+    if isinstance(source, dict) and "upload" in source:
+        # An uploaded log (see expand_uploads) is streamed again
+        return event_table(parse_damage_stream(
+            open_upload_log(source), player_name, errors=UPLOAD_DECODE_ERRORS,
+            parallel=should_parse_in_parallel(source["size"])
+        ))
+    if isinstance(source, dict):
+        # Append and live tail mode keep their parse state, so nothing is parsed again
+        return event_table(source["state"])
+    return event_table(parse_damage_log(source, player_name))
+
+
+def filtered_events(events, encounter, filters, players):
+    """The events of the selected encounter ("session" for all) that pass the drill-down filters."""
+    encounters = None if encounter == "session" else [int(encounter)]
+    return filter_events(events, encounters=encounters, players=players, **filters)
+
+
+def build_export(damage_data, export_format, display_options, player_name, events=None):
+    """
+    Return the download data of a report in one of the EXPORT_FILES formats;
+    the per-event export writes events (None if there are none to export).
+    """
+    if export_format == "Excel":
+        return write_excel_report(damage_data, display_options, player_name)
+    if export_format == "Markdown":
+        return "\n".join(iter_markdown_export(damage_data, display_options))
+    if export_format == "Parquet (events)":
+        return None if events is None else write_event_parquet(events)
+    return export_damage_data(damage_data, export_format, display_options, player_name)
@@ -0,0 +1,97 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from damcalc.damage_parser import copy_damage_data
+
+# Parsed reports are shared by every Streamlit session in this process,
+# evicting least recently used entries once this many bytes are held
+REPORT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_reports = OrderedDict()  # key -> (damage_data, size)
+_reports_bytes = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_lock = threading.Lock()
+
+
+def content_digest(source, chunk_size=1024 * 1024):
+    """
+    Return a SHA-256 hex digest of a log given as a string (hashed as UTF-8)
+    or as a binary stream (hashed from its current position, then rewound).
+    The same log pasted or uploaded gets the same digest.
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, str):
+        for start in range(0, len(source), chunk_size):
+            digest.update(source[start:start + chunk_size].encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    start = source.tell()
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+    source.seek(start)
+    return digest.hexdigest()
+
+
+def report_cache_key(digest, player_name, top_k=None):
+    """Cache key for the analysis of one log from one character's point of view, summarized to top_k if given."""
+    return (digest, player_name, top_k)
+
+
+def estimate_report_size(damage_data):
+    """Rough in-memory size of a damage_data report in bytes."""
+    size = sys.getsizeof(damage_data)
+    for entries in damage_data.values():
+        size += sys.getsizeof(entries)
+        for key, values in entries.items():
+            size += sys.getsizeof(key) + sys.getsizeof(values) + sum(map(sys.getsizeof, values))
+    return size
+
+
+def get_cached_report(key):
+    """Return a copy of the cached report for key, or None."""
+    with _lock:
+        entry = _reports.get(key)
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+        _reports.move_to_end(key)
+        _stats["hits"] += 1
+    return copy_damage_data(entry[0])
+
+
+def store_report(key, damage_data):
+    """Cache a report, evicting the least recently used ones beyond REPORT_CACHE_MAX_BYTES."""
+    global _reports_bytes
+    size = estimate_report_size(damage_data)
+    if size > REPORT_CACHE_MAX_BYTES:
+        return
+    # Copied so callers can't change the cached report
+    damage_data = copy_damage_data(damage_data)
+    with _lock:
+        previous = _reports.pop(key, None)
+        if previous is not None:
+            _reports_bytes -= previous[1]
+        _reports[key] = (damage_data, size)
+        _reports_bytes += size
+        while _reports_bytes > REPORT_CACHE_MAX_BYTES:
+            _, (_, evicted_size) = _reports.popitem(last=False)
+            _reports_bytes -= evicted_size
+            _stats["evictions"] += 1
+
+
+def report_cache_stats():
+    """Entries, bytes held and hit/miss/eviction counts of the report cache."""
+    with _lock:
+        return {"entries": len(_reports), "bytes": _reports_bytes, **_stats}
+
+
+def clear_report_cache():
+    """Drop every cached report."""
+    global _reports_bytes
+    with _lock:
+        _reports.clear()
+        _reports_bytes = 0
@@ -0,0 +1,236 @@
+import io
+import pandas as pd
+
+# The report tables exported, in order: (category, sheet title, key columns,
+# index of the percentage in its values; the average follows it)
+REPORT_TABLES = [
+    ("damage_done", "Total Damage Done", ["Source"], 2),
+    ("damage_taken", "Total Damage Taken", ["Target"], 2),
+    ("pvp_damage_done", "PvP Damage Done", ["Source"], 2),
+    ("pvp_damage_taken", "PvP Damage Taken", ["Target"], 2),
+    ("damage_types", "Damage Types", ["Source", "Type"], 2),
+    ("damage_details", "Damage Details", ["Source", "Target"], 3),  # After the first attack type
+]
+
+# MIME types of the binary exports
+EXCEL_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+PARQUET_MIME = "application/vnd.apache.parquet"
+
+# ----------------- Report Tables -----------------
+
+def report_table(entries, key_columns, percent_at=2):
+    """
+    Return one report category as a DataFrame of its key columns, Hits,
+    Damage, Avg Dam and %, sorted by damage. Keys with several parts
+    ("source -> target") are split into the key columns.
+    """
+    columns = key_columns + ["Hits", "Damage", "Avg Dam", "%"]
+    if not entries:
+        return pd.DataFrame(columns=columns)
+
+    keys = [key.split(" -> ") if len(key_columns) > 1 else [key] for key in entries]
+    values = list(entries.values())
+    df = pd.DataFrame(keys, columns=key_columns)
+    df["Hits"] = [v[1] for v in values]
+    df["Damage"] = [round(v[0], 1) for v in values]
+    df["Avg Dam"] = [round(v[percent_at + 1], 1) if len(v) > percent_at + 1 else 0 for v in values]
+    df["%"] = [round(v[percent_at], 1) if len(v) > percent_at else 0.0 for v in values]
+    return df.sort_values("Damage", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def iter_report_tables(damage_data, display_options):
+    """Yield (title, DataFrame) for every report table the display options enable."""
+    for category, title, key_columns, percent_at in REPORT_TABLES:
+        if display_options.get(category, True):
+            yield title, report_table(damage_data.get(category, {}), key_columns, percent_at)
+
+# ----------------- Export Writers -----------------
+
+def export_damage_data(damage_data, export_format, display_options, player_name=""):
+    """Build the whole export of a report as one string (see iter_damage_export)."""
+    return "\n".join(iter_damage_export(damage_data, export_format, display_options, player_name))
+
+
+def iter_damage_export(damage_data, export_format, display_options, player_name=""):
+    """Yield the lines of a CSV ("csv"/"excel") or plain text export, one section at a time."""
+    if not damage_data:
+        return
+
+    def format_row(cols, widths, row_num=None):
+        if row_num is not None:
+            row = f"{row_num:03d}  "
+        else:
+            row = "---  "
+        row += "  ".join(str(col).ljust(width) for col, width in zip(cols, widths))
+        return row
+
+    def build_text_section(title, columns, entries, total_stats=None):
+        lines = []
+        header = title.upper()
+        lines.append("=" * (len(header) + 40) + header + "=" * 40)
+        lines.append(format_row(columns, col_widths))
+        lines.append(format_row(["--" + "-" * (w - 2) for w in col_widths], col_widths))
+        for i, entry in enumerate(entries, 1):
+            lines.append(format_row(entry, col_widths, i))
+        lines.append(format_row(["--" + "-" * (w - 2) for w in col_widths], col_widths))
+        if total_stats:
+            hits, dmg, avg = total_stats
+            lines.append("     " + "TOTALS".rjust(45) + f"  {hits}  {dmg:,}      {avg}")
+        lines.append("")
+        return lines
+
+    col_widths = [55, 5, 12, 8, 5]
+
+    # CSV & Excel format
+    if export_format.lower() in ["csv", "excel"]:
+        def write_csv_section(title, header, data):
+            lines = [title.upper(), ",".join(header)]
+            lines += [",".join(str(col) for col in row) for row in data]
+            lines.append("")
+            return lines
+
+        # Helper for sorting
+        def sort_dict(data):
+            return sorted(data.items(), key=lambda x: x[1][0], reverse=True)
+
+        # Damage Done
+        if display_options.get("damage_done", True):
+            data = []
+            for k, v in sort_dict(damage_data["damage_done"]):
+                data.append([k, v[1], round(v[0], 1), round(v[3], 1), f"{v[2]:.1f}%"])
+            yield from write_csv_section("Total Damage Done", ["Source", "Hits", "Damage", "Avg Dam", "%"], data)
+
+        # Damage Taken
+        if display_options.get("damage_taken", True):
+            data = []
+            for k, v in sort_dict(damage_data["damage_taken"]):
+                data.append([k, v[1], round(v[0], 1), round(v[3], 1), f"{v[2]:.1f}%"])
+            yield from write_csv_section("Total Damage Taken", ["Target", "Hits", "Damage", "Avg Dam", "%"], data)
+
+        # PvP Damage Done
+        if display_options.get("pvp_damage_done", True):
+            data = []
+            for k, v in sort_dict(damage_data["pvp_damage_done"]):
+                data.append([k, v[1], round(v[0], 1), round(v[3], 1), f"{v[2]:.1f}%"])
+            yield from write_csv_section("PvP Damage Done", ["Source", "Hits", "Damage", "Avg Dam", "%"], data)
+
+        # PvP Damage Taken
+        if display_options.get("pvp_damage_taken", True):
+            data = []
+            for k, v in sort_dict(damage_data["pvp_damage_taken"]):
+                data.append([k, v[1], round(v[0], 1), round(v[3], 1), f"{v[2]:.1f}%"])
+            yield from write_csv_section("PvP Damage Taken", ["Target", "Hits", "Damage", "Avg Dam", "%"], data)
+
+        # Damage Types
+        if display_options.get("damage_types", True):
+            data = []
+            for k, v in damage_data["damage_types"].items():
+                src, dtype = k.split(" -> ")
+                data.append([src, dtype, v[1], round(v[0], 1), round(v[3], 1), f"{v[2]:.1f}%"])
+            data.sort(key=lambda x: x[3], reverse=True)
+            yield from write_csv_section("Damage Types", ["Source", "Type", "Hits", "Damage", "Avg Dam", "%"], data)
+
+        # Damage Details
+        if display_options.get("damage_details", True):
+            data = []
+            for k, v in damage_data["damage_details"].items():
+                src, tgt = k.split(" -> ")
+                data.append([src, tgt, v[1], round(v[0], 1), round(v[4], 1), f"{v[3]:.1f}%"])
+            data.sort(key=lambda x: x[3], reverse=True)
+            yield from write_csv_section("Damage Details", ["Source", "Target", "Hits", "Damage", "Avg Dam", "%"], data)
+
+        return
+
+    # Plain Text / Clipboard
+    else:
+        # Totals by category
+        def get_totals(d):
+            hits = sum(v[1] for v in d.values())
+            dmg = round(sum(v[0] for v in d.values()))
+            avg = round(dmg / hits) if hits > 0 else 0
+            return hits, dmg, avg
+
+        if display_options.get("damage_done", True):
+            entries = []
+            for k, v in sorted(damage_data["damage_done"].items(), key=lambda x: x[1][0], reverse=True):
+                entries.append([k, v[1], f"{round(v[0]):,}", round(v[3]), f"{round(v[2]):02d}"])
+            yield from build_text_section("Total Damage Done", ["SOURCE", "HITS", "DAMAGE", "AVG", "PERC"], entries, get_totals(damage_data["damage_done"]))
+
+        if display_options.get("damage_taken", True):
+            entries = []
+            for k, v in sorted(damage_data["damage_taken"].items(), key=lambda x: x[1][0], reverse=True):
+                entries.append([k, v[1], f"{round(v[0]):,}", round(v[3]), f"{round(v[2]):02d}"])
+            yield from build_text_section("Total Damage Taken", ["TARGET", "HITS", "DAMAGE", "AVG", "PERC"], entries, get_totals(damage_data["damage_taken"]))
+
+        if display_options.get("pvp_damage_done", True):
+            entries = []
+            for k, v in sorted(damage_data["pvp_damage_done"].items(), key=lambda x: x[1][0], reverse=True):
+                entries.append([k, v[1], f"{round(v[0]):,}", round(v[3]), f"{round(v[2]):02d}"])
+            yield from build_text_section("PvP Damage Done", ["SOURCE", "HITS", "DAMAGE", "AVG", "PERC"], entries, get_totals(damage_data["pvp_damage_done"]))
+
+        if display_options.get("pvp_damage_taken", True):
+            entries = []
+            for k, v in sorted(damage_data["pvp_damage_taken"].items(), key=lambda x: x[1][0], reverse=True):
+                entries.append([k, v[1], f"{round(v[0]):,}", round(v[3]), f"{round(v[2]):02d}"])
+            yield from build_text_section("PvP Damage Taken", ["TARGET", "HITS", "DAMAGE", "AVG", "PERC"], entries, get_totals(damage_data["pvp_damage_taken"]))
+
+        if display_options.get("damage_types", True):
+            entries = []
+            for k, v in damage_data["damage_types"].items():
+                src, dtype = k.split(" -> ")
+                entries.append([f"{src} -> {dtype}", v[1], f"{round(v[0]):,}", round(v[3]), f"{round(v[2]):02d}"])
+            entries.sort(key=lambda x: int(str(x[2]).replace(",", "")), reverse=True)
+            yield from build_text_section("Damage Types", ["SOURCE -> TYPE", "HITS", "DAMAGE", "AVG", "PERC"], entries)
+
+        if display_options.get("damage_details", True):
+            entries = []
+            for k, v in damage_data["damage_details"].items():
+                src, tgt = k.split(" -> ")
+                entries.append([f"{src} -> {tgt}", v[1], f"{round(v[0]):,}", round(v[4]), f"{round(v[3]):02d}"])
+            entries.sort(key=lambda x: int(str(x[2]).replace(",", "")), reverse=True)
+            yield from build_text_section("Damage Details", ["SOURCE -> TARGET", "HITS", "DAMAGE", "AVG", "PERC"], entries)
+
+
+def write_excel_report(damage_data, display_options, player_name=""):
+    """
+    Return an .xlsx workbook of the report with one sheet per table, each
+    written straight from its DataFrame with numeric cells.
+    """
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        tables = list(iter_report_tables(damage_data, display_options))
+        if not tables:
+            pd.DataFrame({"Character": [player_name]}).to_excel(writer, sheet_name="Report", index=False)
+        for title, df in tables:
+            df.to_excel(writer, sheet_name=title, index=False)
+            sheet = writer.sheets[title]
+            sheet.freeze_panes = "A2"
+            for column, name in zip(sheet.columns, df.columns):
+                width = max([len(str(name))] + [len(str(value)) for value in df[name]])
+                sheet.column_dimensions[column[0].column_letter].width = min(width + 2, 60)
+    return buffer.getvalue()
+
+
+def iter_markdown_export(damage_data, display_options):
+    """Yield the lines of a Markdown export, one table per section."""
+    for title, df in iter_report_tables(damage_data, display_options):
+        yield f"## {title}"
+        yield ""
+        yield "| " + " | ".join(df.columns) + " |"
+        yield "|" + "|".join("---:" if name in ("Hits", "Damage", "Avg Dam", "%") else "---"
+                             for name in df.columns) + "|"
+        for row in df.itertuples(index=False):
+            cells = [str(value).replace("|", "\\|") for value in row]
+            cells[-1] = f"{row[-1]:.1f}%"
+            yield "| " + " | ".join(cells) + " |"
+        yield ""
+
+
+def write_event_parquet(events):
+    """
+    Return a Parquet file of a per-event table (see event_table), keeping
+    names and attack types as dictionary-encoded columns.
+    """
+    buffer = io.BytesIO()
+    events.to_parquet(buffer, engine="pyarrow", index=False, compression="zstd")
+    return buffer.getvalue()
@@ -0,0 +1,210 @@
+import datetime
+import io
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+
+import pandas as pd
+
+from damcalc.damage_parser import REPORT_RULES_DIGEST
+from damcalc.report_export import write_event_parquet
+
+# Local SQLite store of every analyzed session
+HISTORY_DB_FILE = os.path.join(os.path.dirname(__file__), ".damage_history.sqlite3")
+# Bump when the schema or the stored report layout changes; older stores are rebuilt
+HISTORY_SCHEMA_VERSION = 2
+# Report categories whose per-entity totals are kept for trend queries
+TREND_CATEGORIES = (
+    "damage_done", "damage_taken", "pvp_damage_done", "pvp_damage_taken", "pve_damage_done", "pve_damage_taken",
+)
+# SQLite date formats of the trend periods
+TREND_PERIODS = {"day": "%Y-%m-%d", "week": "%Y-W%W", "month": "%Y-%m"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL,
+    character TEXT NOT NULL,
+    rules TEXT NOT NULL,
+    session_date TEXT NOT NULL,
+    analyzed_at TEXT NOT NULL,
+    name TEXT NOT NULL,
+    lines INTEGER NOT NULL,
+    events INTEGER NOT NULL,
+    damage REAL NOT NULL,
+    hits INTEGER NOT NULL,
+    report BLOB NOT NULL,
+    event_table BLOB,
+    UNIQUE (digest, character)
+);
+CREATE INDEX IF NOT EXISTS sessions_character_date ON sessions (character, session_date);
+CREATE TABLE IF NOT EXISTS entity_totals (
+    session_id INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    damage REAL NOT NULL,
+    hits INTEGER NOT NULL
+);
+-- Covers the trend queries: an entity's rows in one category, read without the table
+CREATE INDEX IF NOT EXISTS entity_totals_trend ON entity_totals (entity, category, session_id, damage, hits);
+"""
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+# ----------------- Store -----------------
+
+@contextmanager
+def history_db(db_path=HISTORY_DB_FILE):
+    """
+    Open the history store, creating or rebuilding its schema on first use,
+    and commit (or roll back) and close it afterwards. Connections are not
+    shared, so Streamlit sessions can use the store from their own threads.
+    """
+    connection = sqlite3.connect(db_path, timeout=30)
+    try:
+        connection.execute("PRAGMA foreign_keys = ON")
+        if db_path not in _initialized:
+            with _init_lock:
+                initialize_history(connection)
+                _initialized.add(db_path)
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def initialize_history(connection):
+    """Create the tables, dropping a store written with an older schema version."""
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version != HISTORY_SCHEMA_VERSION:
+        connection.executescript("DROP TABLE IF EXISTS entity_totals; DROP TABLE IF EXISTS sessions;")
+    # WAL lets sessions read while another one saves
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.executescript(_SCHEMA)
+    connection.execute(f"PRAGMA user_version = {HISTORY_SCHEMA_VERSION}")
+    connection.commit()
+
+
+def pack_report(damage_data):
+    """A report as zlib-compressed JSON."""
+    return zlib.compress(json.dumps(damage_data, separators=(",", ":")).encode("utf-8"))
+
+
+def unpack_report(blob):
+    """The report stored by pack_report."""
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+# ----------------- Sessions -----------------
+
+def save_session(digest, character, name, damage_data, events=None, line_count=0, session_date=None,
+                 rules=REPORT_RULES_DIGEST, db_path=HISTORY_DB_FILE):
+    """
+    Store an analyzed log once per (content digest, character) and return its
+    session ID; a log already stored with the same rules (the parser and
+    trigger rules digest) keeps its first entry, one stored with other
+    rules is replaced. events is the per-event table (see event_table),
+    stored as Parquet; session_date defaults to today.
+    """
+    session_date = (session_date or datetime.date.today()).isoformat()
+    done = damage_data.get("damage_done", {})
+    with history_db(db_path) as db:
+        existing = db.execute(
+            "SELECT id, rules FROM sessions WHERE digest = ? AND character = ?", (digest, character)
+        ).fetchone()
+        if existing and existing[1] == rules:
+            return existing[0]
+        if existing:
+            db.execute("DELETE FROM sessions WHERE id = ?", (existing[0],))
+
+        cursor = db.execute(
+            "INSERT INTO sessions (digest, character, rules, session_date, analyzed_at, name, lines, events, "
+            "damage, hits, report, event_table) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                digest, character, rules, session_date, datetime.datetime.now().isoformat(timespec="seconds"), name,
+                line_count, 0 if events is None else len(events),
+                sum(values[0] for values in done.values()), sum(values[1] for values in done.values()),
+                pack_report(damage_data), None if events is None else write_event_parquet(events),
+            )
+        )
+        session_id = cursor.lastrowid
+        db.executemany(
+            "INSERT INTO entity_totals (session_id, category, entity, damage, hits) VALUES (?, ?, ?, ?, ?)",
+            (
+                (session_id, category, entity, values[0], values[1])
+                for category in TREND_CATEGORIES for entity, values in damage_data.get(category, {}).items()
+            )
+        )
+    return session_id
+
+
+def find_session(digest, character, rules=REPORT_RULES_DIGEST, db_path=HISTORY_DB_FILE):
+    """
+    Return the ID of the stored session of a log and character, or None;
+    a session built with other rules (see save_session) is not returned.
+    """
+    with history_db(db_path) as db:
+        row = db.execute(
+            "SELECT id FROM sessions WHERE digest = ? AND character = ? AND rules = ?", (digest, character, rules)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def load_session_report(session_id, db_path=HISTORY_DB_FILE):
+    """Return the stored damage_data of a session, or None."""
+    with history_db(db_path) as db:
+        row = db.execute("SELECT report FROM sessions WHERE id = ?", (session_id,)).fetchone()
+    return unpack_report(row[0]) if row else None
+
+
+def load_session_events(session_id, db_path=HISTORY_DB_FILE):
+    """Return the stored per-event table of a session, or None if it has none."""
+    with history_db(db_path) as db:
+        row = db.execute("SELECT event_table FROM sessions WHERE id = ?", (session_id,)).fetchone()
+    if not row or row[0] is None:
+        return None
+    return pd.read_parquet(io.BytesIO(row[0]))
+
+
+def list_sessions(character=None, limit=500, db_path=HISTORY_DB_FILE):
+    """Return the most recent stored sessions (of one character if given) as a DataFrame, newest first."""
+    query = "SELECT id, session_date, character, name, lines, events, damage, hits FROM sessions"
+    params = []
+    if character:
+        query += " WHERE character = ?"
+        params.append(character)
+    query += " ORDER BY session_date DESC, id DESC LIMIT ?"
+    params.append(limit)
+    with history_db(db_path) as db:
+        return pd.read_sql_query(query, db, params=params)
+
+
+def delete_session(session_id, db_path=HISTORY_DB_FILE):
+    """Remove a stored session and its totals."""
+    with history_db(db_path) as db:
+        db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+# ----------------- Trends -----------------
+
+def entity_trend(entity, category="damage_done", period="week", character=None, db_path=HISTORY_DB_FILE):
+    """
+    Return an entity's damage, hits and average hit per day, week or month
+    over the stored sessions (logged by one character if given), as a
+    DataFrame ordered by period. Runs on the entity_totals index.
+    """
+    query = (
+        "SELECT strftime(?, s.session_date) AS period, COUNT(*) AS sessions, "
+        "SUM(t.damage) AS damage, SUM(t.hits) AS hits, SUM(t.damage) * 1.0 / SUM(t.hits) AS avg_hit "
+        "FROM entity_totals t JOIN sessions s ON s.id = t.session_id "
+        "WHERE t.entity = ? AND t.category = ?"
+    )
+    params = [TREND_PERIODS[period], entity, category]
+    if character:
+        query += " AND s.character = ?"
+        params.append(character)
+    query += " GROUP BY period ORDER BY period"
+    with history_db(db_path) as db:
+        return pd.read_sql_query(query, db, params=params)
@@ -0,0 +1,134 @@
+import os
+import re
+import json
+import math
+import hashlib
+import xml.etree.ElementTree as ET
+
+# The original CMUD trigger package the parser's rules are compiled from
+DAMMON_XML = os.path.join(os.path.dirname(__file__), "..", "data", "DamMon_1.3.xml")
+# Extracted rule table, reused while the XML's digest and the version match
+TRIGGER_CACHE_FILE = os.path.join(os.path.dirname(__file__), ".dammon_rules.json")
+TRIGGER_CACHE_VERSION = 1
+
+# "(*) (hit?) (*)" or "(*) GHASTLY (*)": source, damage verb, target
+CMUD_DAMAGE_PATTERN_RE = re.compile(r"^\(\*\) \(?([A-Za-z?]+)\)? \(\*\)$")
+DAMAGE_VALUE_RE = re.compile(r"^\$intVal=([\d.]+)\s*$", re.MULTILINE)
+# Decorations the trigger strips from the source (%1) and target (%2/%3) captures
+PREFIX_RE = re.compile(r'^\$str1=%replace\(%1,"([^"]*)",""\)', re.MULTILINE)
+SUFFIX_RE = re.compile(r'^\$str2=%replace\(%\d,"([^"]*)",""\)', re.MULTILINE)
+# DMFakeCheck substrings that mark a capture as chat or other non-combat text
+FAKE_CHECK_RE = re.compile(r'%pos\("([^"]+)",\$strVal\)>0')
+
+# ----------------- XML Parsing -----------------
+
+def trigger_verb(name, token):
+    """
+    Return the damage verb of a trigger named like "03_hits" whose pattern
+    token is "hit?"; CMUD's "?" matches any one character.
+    """
+    verb = name.split("_", 1)[-1]
+    if not re.fullmatch(re.escape(token).replace(r"\?", "."), verb):
+        raise ValueError(f"DamMon trigger {name!r} does not match its pattern token {token!r}")
+    return verb
+
+
+def parse_dammon_triggers(xml_text):
+    """
+    Extract the damage triggers and DMFakeCheck skip indicators of a DamMon
+    package. Triggers are returned in CMUD priority order as dicts of
+    name, priority, verb, damage and the prefix/suffix decorations
+    ("" for plain verbs).
+    """
+    root = ET.fromstring(xml_text)
+    triggers = []
+    for trigger in root.iter("trigger"):
+        pattern = CMUD_DAMAGE_PATTERN_RE.match(trigger.findtext("pattern", ""))
+        script = trigger.findtext("value", "")
+        damage = DAMAGE_VALUE_RE.search(script)
+        if not pattern or not damage:
+            continue
+        name = trigger.get("name", "")
+        prefix = PREFIX_RE.search(script)
+        suffix = SUFFIX_RE.search(script)
+        damage_value = float(damage.group(1))
+        triggers.append({
+            "name": name,
+            "priority": int(trigger.get("priority", 0)),
+            "verb": trigger_verb(name, pattern.group(1)),
+            "damage": int(damage_value) if damage_value.is_integer() else damage_value,
+            "prefix": prefix.group(1).strip() if prefix else "",
+            "suffix": suffix.group(1).strip() if suffix else "",
+        })
+    triggers.sort(key=lambda trigger: trigger["priority"])
+
+    skip_indicators = []
+    for func in root.iter("func"):
+        if func.get("name") == "DMFakeCheck":
+            for indicator in FAKE_CHECK_RE.findall(func.findtext("value", "")):
+                if indicator not in skip_indicators:
+                    skip_indicators.append(indicator)
+    if not triggers or not skip_indicators:
+        raise ValueError("No DamMon damage triggers or DMFakeCheck found")
+    return {"triggers": triggers, "skip_indicators": skip_indicators}
+
+# ----------------- Cached Loading -----------------
+
+def load_trigger_rules(xml_path=DAMMON_XML, cache_path=TRIGGER_CACHE_FILE):
+    """
+    Return the rule table of a DamMon XML, reading it from cache_path when
+    that was written for the same XML content. A cache that can't be
+    written (e.g. a read-only deploy) is skipped.
+    """
+    with open(xml_path, "rb") as f:
+        xml_text = f.read()
+    digest = hashlib.sha256(xml_text).hexdigest()
+
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("version") == TRIGGER_CACHE_VERSION and cached.get("digest") == digest:
+            return cached["rules"]
+    except (OSError, ValueError, AttributeError, KeyError):
+        pass
+
+    rules = parse_dammon_triggers(xml_text)
+    try:
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({"version": TRIGGER_CACHE_VERSION, "digest": digest, "rules": rules}, f, indent=4)
+    except OSError:
+        pass
+    return rules
+
+
+def rules_digest(rules):
+    """SHA-256 of a rule table, to tell reports built with other rules apart."""
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def trigger_number(trigger):
+    """DamMon's number of a trigger named like "09_maims", or None."""
+    number = trigger["name"].split("_", 1)[0]
+    return int(number) if number.isdigit() else None
+
+
+def damage_values_from_rules(rules):
+    """
+    Verb spelling -> damage for every trigger, in DamMon's trigger numbering
+    (01_scratches ... 25_UNSPEAKABLE), which ranks the verbs by damage tier.
+    The CMUD priorities follow it except for 09_maims, added last (28320);
+    unnumbered triggers come after, in priority order.
+    """
+    def number(trigger):
+        value = trigger_number(trigger)
+        return math.inf if value is None else value
+
+    return {trigger["verb"]: trigger["damage"] for trigger in sorted(rules["triggers"], key=number)}
+
+
+def special_patterns_from_rules(rules):
+    """(prefix, verb, suffix, damage) for every decorated trigger, in priority order."""
+    return [
+        (trigger["prefix"], trigger["verb"], trigger["suffix"], trigger["damage"])
+        for trigger in rules["triggers"] if trigger["prefix"] and trigger["suffix"]
+    ]
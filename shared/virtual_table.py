@@ -0,0 +1,191 @@
+import json
+import pandas as pd
+import streamlit.components.v1 as components
+
+# Pixel height of one rendered row; the browser only builds the rows in view
+ROW_HEIGHT = 37
+# Rows rendered above and below the visible window to keep scrolling smooth
+OVERSCAN_ROWS = 10
+
+_TABLE_TEMPLATE = """
+<style>
+    body { margin: 0; }
+    .vt-scroll {
+        height: __HEIGHT__px;
+        overflow-y: auto;
+        font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif;
+        font-size: 14px;
+    }
+    .vt-table { width: 100%; border-collapse: collapse; table-layout: auto; }
+    .vt-table thead th {
+        position: sticky;
+        top: 0;
+        z-index: 1;
+        background-color: #f2f2f6;
+        color: #262730;
+        font-weight: bold;
+        text-align: center;
+        padding: 10px 8px;
+        border: 1px solid #e1e4e8;
+        cursor: __CURSOR__;
+        white-space: nowrap;
+    }
+    .vt-table th:hover { background-color: #e0e0e6; }
+    .vt-table th.asc:after { content: " ▲"; }
+    .vt-table th.desc:after { content: " ▼"; }
+    .vt-table td {
+        height: __CELL_HEIGHT__px;
+        text-align: center;
+        padding: 8px;
+        border: 1px solid #e1e4e8;
+        background-color: white;
+        white-space: nowrap;
+    }
+    .vt-table tr:hover td { background-color: #f0f2f6; }
+    .vt-table td.vt-left, .vt-table th.vt-left { text-align: left; }
+    .vt-table tr.vt-spacer td { padding: 0; border: none; background: none; }
+__WIDTHS__
+</style>
+<div class="vt-scroll" id="vt-scroll">
+    <table class="vt-table">
+        <thead><tr id="vt-head"></tr></thead>
+        <tbody id="vt-body"></tbody>
+    </table>
+</div>
+<script>
+    const table = __DATA__;
+    const types = __TYPES__;
+    const leftColumns = __LEFT__;
+    const sortable = __SORTABLE__;
+    const rowHeight = __ROW_HEIGHT__;
+    const overscan = __OVERSCAN__;
+    const scroll = document.getElementById("vt-scroll");
+    const head = document.getElementById("vt-head");
+    const body = document.getElementById("vt-body");
+    let order = table.data.map((_, i) => i);
+
+    function sortKey(value, type) {
+        if (value === null || value === undefined) return type === "text" ? "" : -Infinity;
+        if (type === "number") return Number(value);
+        if (type === "percent") return parseFloat(String(value).replace("%", "")) || 0;
+        return String(value).toLowerCase();
+    }
+
+    function spacer(height) {
+        const row = document.createElement("tr");
+        row.className = "vt-spacer";
+        const cell = document.createElement("td");
+        cell.colSpan = table.columns.length;
+        cell.style.height = height + "px";
+        row.appendChild(cell);
+        return row;
+    }
+
+    // Rebuild only the rows that are (nearly) in view, with spacers for the rest
+    function render() {
+        const first = Math.max(0, Math.floor(scroll.scrollTop / rowHeight) - overscan);
+        const visible = Math.ceil(scroll.clientHeight / rowHeight) + 2 * overscan;
+        const last = Math.min(order.length, first + visible);
+        const fragment = document.createDocumentFragment();
+        if (first > 0) fragment.appendChild(spacer(first * rowHeight));
+        for (let i = first; i < last; i++) {
+            const values = table.data[order[i]];
+            const row = document.createElement("tr");
+            values.forEach((value, col) => {
+                const cell = document.createElement("td");
+                cell.textContent = value === null ? "" : value;
+                if (leftColumns.includes(col)) cell.className = "vt-left";
+                row.appendChild(cell);
+            });
+            fragment.appendChild(row);
+        }
+        if (last < order.length) fragment.appendChild(spacer((order.length - last) * rowHeight));
+        body.replaceChildren(fragment);
+    }
+
+    table.columns.forEach((name, col) => {
+        const header = document.createElement("th");
+        header.textContent = name;
+        if (leftColumns.includes(col)) header.className = "vt-left";
+        if (sortable) {
+            header.addEventListener("click", () => {
+                const ascending = !header.classList.contains("asc");
+                head.querySelectorAll("th").forEach(h => h.classList.remove("asc", "desc"));
+                header.classList.add(ascending ? "asc" : "desc");
+                const keys = table.data.map(values => sortKey(values[col], types[col]));
+                order.sort((a, b) => {
+                    if (keys[a] < keys[b]) return ascending ? -1 : 1;
+                    if (keys[a] > keys[b]) return ascending ? 1 : -1;
+                    return a - b;
+                });
+                render();
+            });
+        }
+        head.appendChild(header);
+    });
+
+    scroll.addEventListener("scroll", () => window.requestAnimationFrame(render));
+    render();
+</script>
+"""
+
+
+def column_sort_types(df):
+    """How the browser sorts each column: "number", "percent" (e.g. "12.5%") or "text"."""
+    types = []
+    for column in df.columns:
+        if pd.api.types.is_numeric_dtype(df[column]):
+            types.append("number")
+        elif column == "%":
+            types.append("percent")
+        else:
+            types.append("text")
+    return types
+
+
+def table_height(row_count, min_height=200, max_height=550):
+    """Pixel height for a table of row_count rows, within the min/max bounds."""
+    header_height = 60
+    return max(min_height, min(row_count * ROW_HEIGHT + header_height, max_height))
+
+
+def render_virtual_table(df, height_px=None, min_widths=(120, 100, 65), left_columns=(0,), sortable=True):
+    """
+    Show a DataFrame as a sortable table that renders only the rows in view.
+    The data is sent to the browser once as compact JSON (one vectorized
+    to_json call); sorting and scrolling happen client-side.
+
+    Args:
+        df: The DataFrame to display
+        height_px: Height of the table in pixels (sized to the rows if None)
+        min_widths: Minimum column widths in pixels; the last applies to the remaining columns
+        left_columns: Indexes of the columns aligned left
+        sortable: Whether clicking a header sorts by that column
+    """
+    if height_px is None:
+        height_px = table_height(len(df))
+
+    # "</" is escaped so cell text can't close the script tag
+    data = df.to_json(orient="split", index=False, date_format="iso").replace("</", "<\\/")
+
+    widths = []
+    for i, width in enumerate(min_widths, 1):
+        selector = f":nth-child({i})" if i < len(min_widths) else f":nth-child(n+{i})"
+        widths.append(f"    .vt-table th{selector}, .vt-table td{selector} {{ min-width: {width}px; }}")
+
+    html = _TABLE_TEMPLATE
+    for placeholder, value in (
+        ("__HEIGHT__", str(height_px)),
+        ("__CELL_HEIGHT__", str(ROW_HEIGHT - 17)),  # Minus padding and border
+        ("__CURSOR__", "pointer" if sortable else "default"),
+        ("__WIDTHS__", "\n".join(widths)),
+        ("__TYPES__", json.dumps(column_sort_types(df))),
+        ("__LEFT__", json.dumps(list(left_columns))),
+        ("__SORTABLE__", "true" if sortable else "false"),
+        ("__ROW_HEIGHT__", str(ROW_HEIGHT)),
+        ("__OVERSCAN__", str(OVERSCAN_ROWS)),
+        ("__DATA__", data),
+    ):
+        html = html.replace(placeholder, value)
+
+    components.html(html, height=height_px + 20)
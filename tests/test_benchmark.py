@@ -0,0 +1,34 @@
+from damcalc.benchmark import compare_to_baseline
+
+BASELINE = {"results": {"10": {
+    "lines_per_sec": 100_000.0,
+    "peak_memory_mb": 2.0,
+    "stages": {"parse_lines": 0.5, "aggregate": 0.02},
+}}}
+
+
+def result(lines_per_sec=100_000.0, peak_memory_mb=2.0, parse_lines=0.5, aggregate=0.02):
+    return {"10": {
+        "lines_per_sec": lines_per_sec,
+        "peak_memory_mb": peak_memory_mb,
+        "stages": {"parse_lines": parse_lines, "aggregate": aggregate},
+    }}
+
+
+def test_results_within_tolerance_pass():
+    assert compare_to_baseline(result(80_000.0, 2.1, 0.6, 0.025), BASELINE, 0.3) == []
+
+
+def test_slower_stage_fails():
+    [message] = compare_to_baseline(result(parse_lines=0.8), BASELINE, 0.3)
+    assert message.startswith("10x parse_lines: 800.0 ms")
+
+
+def test_memory_growth_fails():
+    [message] = compare_to_baseline(result(peak_memory_mb=3.0), BASELINE, 0.3)
+    assert message == "10x peak memory: 3.0 MB vs baseline 2.0 MB (+50%)"
+
+
+def test_throughput_drop_fails():
+    [message] = compare_to_baseline(result(lines_per_sec=50_000.0), BASELINE, 0.3)
+    assert message == "10x throughput: 50,000 lines/sec vs baseline 100,000 lines/sec (-50%)"
@@ -0,0 +1,98 @@
+import bz2
+import gzip
+import io
+import os
+import zipfile
+
+import pytest
+
+import damcalc.damage_analysis
+from damcalc.batch import analyze_log_file, expand_log_files, find_log_files
+from damcalc.damage_analysis import (
+    analyze_damage_log, analyze_damage_stream, finish_damage_data, parse_damage_streams
+)
+from damcalc.damage_parser import DECOMPRESSION_ERRORS, PARALLEL_THRESHOLD_BYTES, list_log_files, open_log_file
+
+SMALL_FIGHT_LOG = os.path.join(os.path.dirname(__file__), "fixtures", "small_fight.log")
+PLAYER = "Dinol"
+
+
+@pytest.fixture(scope="module")
+def log_bytes():
+    with open(SMALL_FIGHT_LOG, "rb") as f:
+        return f.read()
+
+
+def zipped(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_compressed_logs_match_the_plain_log(log_bytes):
+    expected = analyze_damage_log(log_bytes.decode("utf-8"), PLAYER, parallel=False)
+    uploads = {
+        "fight.log.gz": gzip.compress(log_bytes),
+        "fight.log.bz2": bz2.compress(log_bytes),
+        "fights.zip": zipped({"fight.log": log_bytes, "notes.csv": b"not a log"}),
+    }
+    for name, data in uploads.items():
+        upload = io.BytesIO(data)
+        [(log_name, member, _)] = list_log_files(upload, name)
+        assert log_name == "fight.log"
+        stream = open_log_file(upload, name, member)
+        assert analyze_damage_stream(stream, PLAYER, parallel=False) == expected
+
+
+def test_compressed_logs_with_known_sizes_share_the_process_pool(monkeypatch, log_bytes):
+    pooled = []
+
+    def parse_logs_parallel(*args):
+        pooled.append(args[1])
+        return parallel_parse(*args)
+
+    parallel_parse = damcalc.damage_analysis.parse_logs_parallel
+    monkeypatch.setattr(damcalc.damage_analysis, "parse_logs_parallel", parse_logs_parallel)
+    uploads = [("a.log.gz", gzip.compress(log_bytes)), ("b.log.bz2", bz2.compress(log_bytes)),
+               ("c.zip", zipped({"c.log": log_bytes}))]
+    streams, sizes = [], []
+    for name, data in uploads:
+        upload = io.BytesIO(data)
+        [(_, member, size)] = list_log_files(upload, name)
+        streams.append(open_log_file(upload, name, member))
+        sizes.append(size)
+    assert sizes == [len(log_bytes), None, len(log_bytes)]
+
+    # Pretend the logs are big on a multi-core machine: only the sizes decide, and the .bz2 one's is unknown
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    sizes = [PARALLEL_THRESHOLD_BYTES // 2 if size else None for size in sizes]
+    states = parse_damage_streams(streams, PLAYER, sizes=sizes)
+    assert pooled == [3]
+    expected = analyze_damage_log(log_bytes.decode("utf-8"), PLAYER, parallel=False)
+    assert [finish_damage_data(state, PLAYER) for state in states] == [expected] * 3
+
+
+def test_truncated_archive_raises(log_bytes):
+    upload = io.BytesIO(gzip.compress(log_bytes)[:-20])
+    with pytest.raises(DECOMPRESSION_ERRORS):
+        analyze_damage_stream(open_log_file(upload, "fight.log.gz"), PLAYER, parallel=False)
+
+
+def test_batch_reports_a_damaged_archive_by_name(tmp_path, log_bytes):
+    (tmp_path / "fight.log").write_bytes(log_bytes)
+    (tmp_path / "old.log.gz").write_bytes(gzip.compress(log_bytes)[:-20])
+    (tmp_path / "notes.csv").write_bytes(b"not a log")
+    logs = expand_log_files(find_log_files([str(tmp_path)]))
+    assert [log["name"] for log in logs] == [str(tmp_path / "fight.log"), str(tmp_path / "old.log")]
+
+    assert analyze_log_file(logs[0], PLAYER)["bytes"] == len(log_bytes)
+    with pytest.raises(OSError, match="old.log.gz is damaged or incomplete"):
+        analyze_log_file(logs[1], PLAYER)
+
+
+def test_batch_rejects_a_broken_zip(tmp_path):
+    (tmp_path / "logs.zip").write_bytes(b"not a zip")
+    with pytest.raises(OSError, match="could not be read as an archive"):
+        expand_log_files(find_log_files([str(tmp_path)]))
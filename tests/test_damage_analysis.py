@@ -0,0 +1,239 @@
+import heapq
+import io
+import itertools
+import math
+import os
+
+import numpy as np
+import pytest
+
+import damcalc.damage_analysis
+from damcalc.damage_analysis import (
+    HIT_PERCENTILES, HIT_STATS_CATEGORIES, OTHER_ENTITY, analyze_damage_log, append_damage_text, event_table,
+    events_report, filter_events, finish_damage_data, new_append_session, new_tail_session, parse_damage_log,
+    parse_damage_streams, report_players, tail_damage_file
+)
+from damcalc.damage_parser import iter_log_chunks, parse_chunks_parallel
+
+AGL_LOG = os.path.join(os.path.dirname(__file__), os.pardir, "data", "AGL 220419 Dinol Waak 1 0.txt")
+PLAYER = "Dinol"
+
+
+def approx_report(report):
+    """
+    The report, comparing its hit statistics approximately: running means
+    and variances, merged batch by batch, differ in the last bits.
+    """
+    return {
+        category: {key: pytest.approx(row) for key, row in rows.items()} if category in HIT_STATS_CATEGORIES else rows
+        for category, rows in report.items()
+    }
+
+
+@pytest.fixture(scope="module")
+def agl_text():
+    with open(AGL_LOG, encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="module")
+def serial_report(agl_text):
+    return analyze_damage_log(agl_text, PLAYER, parallel=False)
+
+
+def test_parallel_parse_matches_serial(agl_text, serial_report):
+    assert analyze_damage_log(agl_text, PLAYER, parallel=True) == serial_report
+
+
+def test_small_parallel_chunks_match_serial(agl_text, serial_report):
+    # Many chunks, so prompts, encounters and known players are carried across chunk merges
+    state = parse_chunks_parallel(iter_log_chunks(agl_text, chunk_size=16 * 1024), PLAYER)
+    assert state["line_count"] == len(agl_text.splitlines())
+    assert finish_damage_data(state, PLAYER) == serial_report
+
+
+def test_parallel_multi_log_parse_matches_serial(agl_text):
+    halves = [agl_text[:len(agl_text) // 2], agl_text[len(agl_text) // 2:]]
+    logs = [halves[0], agl_text, halves[1]]
+    streams = [io.BytesIO(log.encode("utf-8")) for log in logs]
+    states = parse_damage_streams(streams, PLAYER, parallel=True)
+    assert [finish_damage_data(state, PLAYER) for state in states] == [
+        finish_damage_data(parse_damage_log(log, PLAYER, parallel=False), PLAYER) for log in logs
+    ]
+
+
+def test_batched_fold_matches_serial(monkeypatch, agl_text, serial_report):
+    # Encounters, first-seen order and hit statistics carry across many small batches
+    monkeypatch.setattr(damcalc.damage_analysis, "FOLD_BATCH_ROWS", 100)
+    assert analyze_damage_log(agl_text, PLAYER, parallel=False) == approx_report(serial_report)
+
+
+def test_growing_paste_matches_serial(agl_text, serial_report):
+    # The whole log pasted again each time, grown by a cut that falls mid-line
+    session = new_append_session(PLAYER)
+    for end in (5000, 5001, 120_000, 200_017, len(agl_text) - 3, len(agl_text)):
+        damage_data = append_damage_text(session, agl_text[:end])
+    assert damage_data == approx_report(serial_report)
+
+
+def test_appended_pieces_match_serial(agl_text, serial_report):
+    # Separate pastes of consecutive pieces, each cut at a line break
+    lines = agl_text.splitlines(keepends=True)
+    session = new_append_session(PLAYER)
+    for start in range(0, len(lines), 1000):
+        damage_data = append_damage_text(session, "".join(lines[start:start + 1000]))
+    assert damage_data == approx_report(serial_report)
+
+
+def test_tailed_file_matches_serial(tmp_path, agl_text, serial_report):
+    # The client writes the log in bursts that end mid-line; each poll parses what is new
+    data = agl_text.encode("utf-8")
+    path = tmp_path / "live.log"
+    path.write_bytes(b"")
+    session = new_tail_session(str(path), PLAYER)
+    assert tail_damage_file(session) is not None
+    written = 0
+    for end in (7, 4096, 150_001, len(data) - 1, len(data)):
+        with open(path, "ab") as f:
+            f.write(data[written:end])
+        written = end
+        damage_data = tail_damage_file(session)
+    assert tail_damage_file(session) is None
+    assert damage_data == approx_report(serial_report)
+
+
+@pytest.mark.parametrize("header", [b"Welcome to the game.\n", b"Welcome to the game."])
+def test_tail_of_new_lines_only(tmp_path, agl_text, header):
+    # Lines already in the file are skipped; a line still being written is dropped, a complete one is not
+    lines = agl_text.encode("utf-8").splitlines(keepends=True)[1000:1400]
+    path = tmp_path / "live.log"
+    path.write_bytes(header)
+    session = new_tail_session(str(path), PLAYER, from_start=False)
+    with open(path, "ab") as f:
+        f.write(b"".join(lines))
+    expected = lines if header.endswith(b"\n") else lines[1:]
+    assert tail_damage_file(session) == approx_report(
+        analyze_damage_log(b"".join(expected).decode("utf-8"), PLAYER, parallel=False)
+    )
+
+
+def test_tail_restarts_on_a_replaced_file(tmp_path, agl_text, serial_report):
+    path = tmp_path / "live.log"
+    path.write_text("Waak's chop hits the orc.\n", encoding="utf-8")
+    session = new_tail_session(str(path), PLAYER)
+    tail_damage_file(session)
+    # A new client session's log renamed over the old one
+    new_log = tmp_path / "next.log"
+    new_log.write_text(agl_text, encoding="utf-8")
+    new_log.replace(path)
+    assert tail_damage_file(session) == approx_report(serial_report)
+
+
+def numpy_hit_stats(state):
+    """Every HIT_STATS_CATEGORIES key's report row, computed with numpy from the state's event table."""
+    events = event_table(state)
+    expected = {}
+    for category, columns in HIT_STATS_CATEGORIES.items():
+        expected[category] = {}
+        for key, group in events.groupby(columns, observed=True):
+            damage = group["damage"].to_numpy(np.float64)
+            label = " -> ".join(map(str, key if isinstance(key, tuple) else (key,)))
+            expected[category][label] = [
+                len(damage), damage.mean(), damage.var(ddof=1) if len(damage) > 1 else 0.0, damage.min(),
+                damage.max(), *np.percentile(damage, HIT_PERCENTILES, method="inverted_cdf"),
+            ]
+    return expected
+
+
+def test_hit_stats_match_numpy(agl_text, serial_report):
+    state = parse_damage_log(agl_text, PLAYER, parallel=False)
+    assert {category: serial_report[category] for category in HIT_STATS_CATEGORIES} == {
+        category: {key: pytest.approx(row) for key, row in rows.items()}
+        for category, rows in numpy_hit_stats(state).items()
+    }
+
+
+def test_merged_hit_stats_match_numpy(agl_text, serial_report):
+    # Per-chunk statistics merged by the process pool, and running ones merged paste by paste
+    state = parse_chunks_parallel(iter_log_chunks(agl_text, chunk_size=16 * 1024), PLAYER)
+    session = new_append_session(PLAYER)
+    for end in (30_000, 30_001, 200_000, len(agl_text)):
+        appended = append_damage_text(session, agl_text[:end])
+    expected = numpy_hit_stats(state)
+    for report in (finish_damage_data(state, PLAYER), appended):
+        assert {category: report[category] for category in HIT_STATS_CATEGORIES} == {
+            category: {key: pytest.approx(row) for key, row in rows.items()} for category, rows in expected.items()
+        }
+
+
+def high_cardinality_log():
+    """Five heavy hitters hitting Dinol throughout, between 400 one-hit attackers Dinol strikes back."""
+    heavy = ["Warlord", "Shaman", "Brute", "Reaver", "Hexer"]
+    verbs = ["mauls", "decimates", "hits"]
+    lines = []
+    for index, letters in enumerate(itertools.islice(itertools.product("abcdefghij", repeat=3), 400)):
+        name = "Kob" + "".join(letters)
+        lines.append(f"{name}'s bite scratches Dinol.")
+        lines.append(f"Dinol's pierce grazes {name}.")
+        lines.append(f"{heavy[index % 5]}'s cleave {verbs[index * 7 % 3]} Dinol.")
+    return "\n".join(lines) + "\n"
+
+
+def column_totals(rows):
+    return [sum(row[0] for row in rows.values()), sum(row[1] for row in rows.values())]
+
+
+@pytest.mark.parametrize("pastes", [1, 40])
+def test_top_k_keeps_the_heavy_hitters_and_all_damage(pastes):
+    text = high_cardinality_log()
+    full = analyze_damage_log(text, PLAYER, parallel=False)
+    lines = text.splitlines(keepends=True)
+    session = new_append_session(PLAYER, top_k=5)
+    size = math.ceil(len(lines) / pastes)
+    for start in range(0, len(lines), size):
+        top = append_damage_text(session, "".join(lines[start:start + size]))
+
+    for category in ("damage_done", "damage_taken", "damage_details"):
+        assert column_totals(top[category]) == pytest.approx(column_totals(full[category]))
+    true_top = heapq.nlargest(5, full["damage_done"], key=lambda source: full["damage_done"][source][0])
+    if pastes == 1:
+        assert set(top["damage_done"]) == {*true_top, OTHER_ENTITY}
+        for source in true_top:
+            assert top["damage_done"][source][:2] == full["damage_done"][source][:2]
+        rest = {source: row for source, row in full["damage_done"].items() if source not in true_top}
+        assert top["damage_done"][OTHER_ENTITY][:2] == pytest.approx(column_totals(rest))
+    else:
+        # A name's rows from before it was tracked went to (other), and names tracked for a while keep
+        # what was folded under them then; each paste adds at most top_k names
+        assert set(true_top) < set(top["damage_done"])
+        for source, (damage, hits, *_) in top["damage_done"].items():
+            if source != OTHER_ENTITY:
+                assert damage <= full["damage_done"][source][0] and hits <= full["damage_done"][source][1]
+        assert len(top["damage_done"]) <= 5 * pastes + 1
+
+
+@pytest.mark.parametrize("filters", [
+    {"sources": ["Dinol", "Waak"], "targets": ["Dinol", "Waak"]},
+    {"targets": ["Dinol"], "attack_types": ["slash", "divine power"]},
+    {"sources": ["Dinol", "Waak"], "targets": ["Dinol", "Waak"], "attack_types": ["pierce", "divine power"]},
+    {"sources": ["Dinol"], "targets": ["Silversand general"], "attack_types": ["shocking bite"]},
+])
+def test_filtered_report_matches_a_parse_of_the_filtered_lines(agl_text, serial_report, filters):
+    state = parse_damage_log(agl_text, PLAYER, parallel=False)
+    events = filter_events(event_table(state), **filters)
+    assert len(events)
+    report = events_report(events, report_players(serial_report))
+
+    lines = agl_text.splitlines()
+    expected = analyze_damage_log("".join(lines[line - 1] + "\n" for line in events["line"]), PLAYER, parallel=False)
+    # Without the prompts and encounter breaks in between, only the clock and encounter categories differ
+    for category in ("damage_timeline", "encounters", "encounter_breakdown"):
+        del report[category], expected[category]
+    assert report == expected
+
+
+def test_encounter_filter_matches_the_session_report(agl_text, serial_report):
+    events = event_table(parse_damage_log(agl_text, PLAYER, parallel=False))
+    for encounter, totals in serial_report["encounters"].items():
+        report = events_report(filter_events(events, encounters=[int(encounter)]), report_players(serial_report))
+        assert report["encounters"] == {encounter: totals}
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from damcalc.damage_analysis import analyze_damage_log
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+# Two prompts apart (2:30pm and 2:31pm): a PvE exchange, then a PvP one, with
+# misses, item procs, room echoes and chat lines that must not count
+SMALL_FIGHT_LOG = os.path.join(FIXTURES, "small_fight.log")
+TOTAL_DAMAGE = 141.5
+
+
+def share(damage):
+    return pytest.approx(damage / TOTAL_DAMAGE * 100)
+
+
+@pytest.fixture(scope="module")
+def small_fight_report():
+    with open(SMALL_FIGHT_LOG, encoding="utf-8") as f:
+        return analyze_damage_log(f.read(), "Dinol", parallel=False)
+
+
+def test_small_fight_damage_done(small_fight_report):
+    assert small_fight_report["damage_done"] == {
+        "Dinol": [110.0, 4, share(110.0), 27.5],
+        "Silversand general": [6.5, 1, share(6.5), 6.5],
+        "Waak": [25.0, 2, share(25.0), 12.5],
+    }
+    assert small_fight_report["damage_taken"] == {
+        "Dinol": [31.5, 3, share(31.5), 10.5],
+        "Silversand general": [61.0, 2, share(61.0), 30.5],
+        "Waak": [49.0, 2, share(49.0), 24.5],
+    }
+
+
+def test_small_fight_splits_pvp_from_pve(small_fight_report):
+    assert small_fight_report["pvp_damage_done"] == {
+        "Dinol": [49.0, 2, pytest.approx(49.0 / 74.0 * 100), 24.5],
+        "Waak": [25.0, 2, pytest.approx(25.0 / 74.0 * 100), 12.5],
+    }
+    assert small_fight_report["pve_damage_done"] == {"Dinol": [61.0, 2, 100.0, 30.5]}
+
+
+def test_small_fight_attack_types(small_fight_report):
+    assert small_fight_report["damage_types"] == {
+        "Dinol -> pierce": [57.0, 2, share(57.0), 28.5],
+        "Dinol -> shocking bite": [53.0, 2, share(53.0), 26.5],
+        "Silversand general -> slash": [6.5, 1, share(6.5), 6.5],
+        "Waak -> divine power": [25.0, 2, share(25.0), 12.5],
+    }
+    assert {pair: row[:3] for pair, row in small_fight_report["damage_details"].items()} == {
+        "Dinol -> Silversand general": [61.0, 2, "pierce"],
+        "Dinol -> Waak": [49.0, 2, "pierce"],
+        "Silversand general -> Dinol": [6.5, 1, "slash"],
+        "Waak -> Dinol": [25.0, 2, "divine power"],
+    }
+
+
+def test_small_fight_is_one_encounter(small_fight_report):
+    assert small_fight_report["encounters"] == {"0": [TOTAL_DAMAGE, 7, 3, 17]}
@@ -0,0 +1,84 @@
+import copy
+import datetime
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from damcalc.damage_analysis import analyze_damage_log, event_table, parse_damage_log
+from damcalc.damage_parser import PARSER_VERSION, REPORT_RULES_DIGEST, TRIGGER_RULES
+from damcalc.session_history import (
+    HISTORY_SCHEMA_VERSION, entity_trend, find_session, list_sessions, load_session_events, load_session_report,
+    save_session
+)
+from damcalc.trigger_rules import rules_digest
+
+LOG = "[1559/1711hp] (652) 2:30pm>\nDinol's pierce maims a Silversand general!\nWaak's divine power hits Dinol.\n"
+DIGEST = "log-digest"
+DATE = datetime.date(2026, 10, 1)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "history.sqlite3")
+
+
+def save(db_path, rules=REPORT_RULES_DIGEST, log=LOG):
+    state = parse_damage_log(log, "Dinol", parallel=False)
+    damage_data = analyze_damage_log(log, "Dinol", parallel=False)
+    session_id = save_session(
+        DIGEST, "Dinol", "arena", damage_data, event_table(state), state["line_count"], DATE, rules, db_path
+    )
+    return session_id, damage_data, event_table(state)
+
+
+def test_saved_session_loads_back(db_path):
+    session_id, damage_data, events = save(db_path)
+    assert find_session(DIGEST, "Dinol", db_path=db_path) == session_id
+    assert find_session(DIGEST, "Waak", db_path=db_path) is None
+    assert load_session_report(session_id, db_path) == damage_data
+    pd.testing.assert_frame_equal(load_session_events(session_id, db_path), events, check_categorical=False)
+    assert list_sessions("Dinol", db_path=db_path)[["id", "name", "lines", "events"]].values.tolist() == [
+        [session_id, "arena", 3, 2]
+    ]
+    assert list_sessions("Waak", db_path=db_path).empty
+
+
+def test_saving_the_same_log_again_keeps_the_first_entry(db_path):
+    session_id, *_ = save(db_path)
+    assert save(db_path)[0] == session_id
+    assert len(list_sessions(db_path=db_path)) == 1
+
+
+def test_session_of_other_rules_is_stale_and_replaced(db_path):
+    old_id, *_ = save(db_path, rules="1:old-rules", log=LOG + "Dinol's pierce hits Waak.\n")
+    assert find_session(DIGEST, "Dinol", db_path=db_path) is None
+    assert find_session(DIGEST, "Dinol", rules="1:old-rules", db_path=db_path) == old_id
+
+    session_id, damage_data, _ = save(db_path)
+    assert find_session(DIGEST, "Dinol", db_path=db_path) == session_id
+    assert load_session_report(session_id, db_path) == damage_data
+    assert list_sessions(db_path=db_path)["id"].tolist() == [session_id]
+    # The replaced session's trend totals went with it
+    assert entity_trend("Dinol", period="month", db_path=db_path)[["sessions", "damage", "hits"]].values.tolist() == [
+        [1, 34.5, 1]
+    ]
+
+
+def test_rules_digest_follows_the_parser_version_and_trigger_rules():
+    assert REPORT_RULES_DIGEST == f"{PARSER_VERSION}:{rules_digest(TRIGGER_RULES)}"
+    changed = copy.deepcopy(TRIGGER_RULES)
+    changed["skip_indicators"].append("is struck by lightning")
+    assert rules_digest(changed) != rules_digest(TRIGGER_RULES)
+
+
+def test_store_of_an_older_schema_is_rebuilt(db_path):
+    with sqlite3.connect(db_path) as connection:
+        connection.execute("CREATE TABLE sessions (id INTEGER PRIMARY KEY, digest TEXT, character TEXT)")
+        connection.execute("INSERT INTO sessions (digest, character) VALUES (?, ?)", (DIGEST, "Dinol"))
+        connection.execute("PRAGMA user_version = 1")
+    assert find_session(DIGEST, "Dinol", db_path=db_path) is None
+    session_id, *_ = save(db_path)
+    assert find_session(DIGEST, "Dinol", db_path=db_path) == session_id
+    with sqlite3.connect(db_path) as connection:
+        assert connection.execute("PRAGMA user_version").fetchone()[0] == HISTORY_SCHEMA_VERSION
@@ -0,0 +1,30 @@
+from damcalc.damage_analysis import analyze_damage_log
+from damcalc.damage_parser import VERB_TABLE, build_verb_table
+
+# The verb table hard-coded in damage_parser before it was compiled from DamMon_1.3.xml,
+# in priority order: (verb, damage)
+HARD_CODED_VERBS = [
+    ("scratches", 2.5), ("grazes", 6.5), ("hits", 10.5), ("injures", 14.5), ("wounds", 18.5),
+    ("mauls", 22.5), ("decimates", 26.5), ("devastates", 30.5), ("maims", 34.5), ("mutilates", 38.5),
+    ("disembowels", 42.5), ("dismembers", 46.5), ("massacres", 50.5), ("mangles", 54.5),
+    ("demolishes", 58.5), ("obliterates", 88), ("annihilates", 113), ("eradicates", 138),
+    ("ghastly", 163), ("horrid", 188), ("dreadful", 213), ("hideous", 238), ("indescribable", 263),
+    ("unspeakable", 300),
+]
+
+
+def test_compiled_verbs_keep_the_hard_coded_order():
+    compiled = sorted(VERB_TABLE.items(), key=lambda item: item[1][0])
+    assert [(verb, damage) for verb, (_, damage) in compiled] == HARD_CODED_VERBS
+
+
+def test_priority_comes_from_the_spelling_that_supplies_the_damage():
+    table = build_verb_table({"DEVASTATES": 68, "hits": 10.5, "devastates": 30.5, "MANGLES": 54.5})
+    assert table == {"hits": (0, 10.5), "devastates": (1, 30.5), "mangles": (2, 54.5)}
+
+
+def test_higher_priority_verb_wins_on_a_line_with_two_verbs():
+    damage_data = analyze_damage_log("Waak's chop hits the orc and the orc devastates Dinol.\n", "Dinol",
+                                     parallel=False)
+    assert damage_data["damage_done"]["Waak"][:2] == [10.5, 1]
+    assert list(damage_data["damage_types"]) == ["Waak -> chop"]